@@ -0,0 +1,287 @@
+"""SQL SAGE - headless HTTP API for the NL to SQL pipeline
+
+Usage: python api.py [--host 127.0.0.1] [--port 8000] [--workers 16] [--max-pending 64]
+
+All endpoints take and return JSON:
+    POST /generate  {"question", "dialect"?, "schema"?}
+    POST /validate  {"sql"}
+    POST /optimize  {"sql", "schema"?}
+    POST /convert   {"sql", "dialect"}
+    POST /execute   {"sql", "dialect"?, "limit"?}
+    POST /export    {"sql", "dialect"?, "format"?}  -> the full result as a CSV/Parquet/Excel file
+    GET  /health
+Requests are served by a fixed worker pool. Once max-pending requests are
+in flight or queued, new ones get 503 with Retry-After instead of piling up.
+"""
+import os
+import json
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, Callable, Union
+from utils.sql_validator import validate_sql_query
+from utils.sql_dialects import SQLDialectConverter
+from utils.eden_ai_client import EDEN_AI_API_KEY, get_llm_stats
+from utils.error_handler import SQLErrorHandler
+from utils.query_playground import QueryPlayground
+from utils.result_export import EXPORT_FORMATS, ExportResult
+from utils import services
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class APIError(Exception):
+    """Error with an HTTP status, reported to the client as JSON"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _require(payload: Dict[str, Any], key: str) -> Any:
+    value = payload.get(key)
+    if not value:
+        raise APIError(400, f"Missing required field: {key}")
+    return value
+
+
+def _dialect(payload: Dict[str, Any], default: str = 'postgresql') -> str:
+    dialect = payload.get("dialect") or default
+    if dialect not in SQLDialectConverter.SUPPORTED_DIALECTS:
+        raise APIError(400, f"Unsupported dialect: {dialect}")
+    return dialect
+
+
+def _positive_int(payload: Dict[str, Any], key: str, default: int) -> int:
+    value = payload.get(key, default)
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise APIError(400, f"{key} must be an integer, got {value!r}")
+    if number < 1:
+        raise APIError(400, f"{key} must be at least 1")
+    return number
+
+
+def handle_generate(payload: Dict[str, Any]) -> Dict[str, Any]:
+    question = _require(payload, "question")
+    dialect = _dialect(payload)
+    if not EDEN_AI_API_KEY:
+        raise APIError(503, "SQL generation is not configured: set EDEN_AI_API_KEY")
+    # No fallback to another client's schema: the request carries its own (or none)
+    schema = payload.get("schema")
+
+    result = services.get_generation_pipeline().run(question, schema=schema, dialect=dialect)
+    if not result.valid:
+        return {"valid": False, "sql": result.sql, "suggestions": []}
+    return {"valid": True, "sql": result.final_query, "dialect": dialect,
+            "suggestions": result.suggestions, "variants": result.conversions,
+            "explain": result.explain.to_dict() if result.explain else None}
+
+
+def handle_validate(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {"valid": bool(validate_sql_query(_require(payload, "sql")))}
+
+
+def handle_optimize(payload: Dict[str, Any]) -> Dict[str, Any]:
+    optimized_query, suggestions = services.get_query_optimizer().optimize_query(
+        _require(payload, "sql"),
+        payload.get("schema")
+    )
+    return {"sql": optimized_query, "suggestions": suggestions}
+
+
+def handle_convert(payload: Dict[str, Any]) -> Dict[str, Any]:
+    _require(payload, "dialect")
+    dialect = _dialect(payload)
+    return {"sql": services.get_dialect_converter().convert_query(_require(payload, "sql"), dialect),
+            "dialect": dialect}
+
+
+def handle_execute(payload: Dict[str, Any]) -> Dict[str, Any]:
+    playground = services.registry.get("playground", lambda: QueryPlayground(
+        db=services.get_database(),
+        dialect_converter=services.get_dialect_converter(),
+        query_optimizer=services.get_query_optimizer(),
+        corrector=services.get_query_corrector(),
+        schema_cache=services.get_schema_cache(),
+        cost_guard=services.get_cost_guard()
+    ))
+    results, error, suggestions = playground.execute_test_query(
+        _require(payload, "sql"),
+        _dialect(payload),
+        _positive_int(payload, "limit", 100)
+    )
+    if error:
+        return {"error": error, "suggestions": suggestions}
+    return {
+        "columns": list(results.columns),
+        # to_json knows the frame's numpy/nullable dtypes; to_dict would leave numpy scalars
+        "rows": json.loads(results.to_json(orient="records", date_format="iso")),
+        "suggestions": suggestions
+    }
+
+
+def handle_export(payload: Dict[str, Any]) -> ExportResult:
+    export_format = payload.get("format") or "CSV"
+    if export_format not in EXPORT_FORMATS:
+        raise APIError(400, f"Unsupported format: {export_format}")
+    query = _require(payload, "sql")
+    dialect = _dialect(payload)
+    if dialect != 'postgresql':
+        query = services.get_dialect_converter().convert_query(query, 'postgresql')
+    return services.get_result_exporter().export(query, export_format)
+
+
+ROUTES: Dict[str, Callable[[Dict[str, Any]], Union[Dict[str, Any], ExportResult]]] = {
+    "/generate": handle_generate,
+    "/validate": handle_validate,
+    "/optimize": handle_optimize,
+    "/convert": handle_convert,
+    "/execute": handle_execute,
+    "/export": handle_export,
+}
+
+
+class SQLSageRequestHandler(BaseHTTPRequestHandler):
+    server_version = "SQLSage/1.0"
+    # Socket timeout so slow clients cannot hold a worker forever
+    timeout = 30
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_export(self, result: ExportResult) -> None:
+        """Stream an export file to the client in chunks, then delete it"""
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", result.mime_type)
+            self.send_header("Content-Length", str(result.bytes))
+            self.send_header("Content-Disposition", f'attachment; filename="{result.file_name}"')
+            self.send_header("X-Row-Count", str(result.rows))
+            self.end_headers()
+            with open(result.path, "rb") as f:
+                while True:
+                    chunk = f.read(256 * 1024)
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+        finally:
+            os.remove(result.path)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", **self.server.stats(), "llm": get_llm_stats()})
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        handler = ROUTES.get(self.path)
+        try:
+            if handler is None:
+                raise APIError(404, f"Unknown endpoint: {self.path}")
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                raise APIError(413, "Request body too large")
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError as e:
+                raise APIError(400, f"Invalid JSON: {str(e)}")
+            if not isinstance(payload, dict):
+                raise APIError(400, "Request body must be a JSON object")
+            body = handler(payload)
+            if isinstance(body, ExportResult):
+                self._send_export(body)
+            else:
+                self._send_json(200, body)
+        except APIError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            error_msg, color, suggestion = SQLErrorHandler.format_error(e)
+            self._send_json(500, {"error": error_msg, "suggestion": suggestion})
+
+
+class SQLSageAPIServer(HTTPServer):
+    """HTTP server that dispatches connections to a bounded worker pool"""
+
+    def __init__(self, address, max_workers: int = 16, max_pending: int = 64):
+        super().__init__(address, SQLSageRequestHandler)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sqlsage-api")
+        self.max_pending = max_pending
+        self._pending = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending,
+                    "rejected": self._rejected}
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            accepted = self._pending < self.max_pending
+            if accepted:
+                self._pending += 1
+            else:
+                self._rejected += 1
+        if not accepted:
+            self._reject(request)
+            return
+        self.executor.submit(self._process_in_worker, request, client_address)
+
+    def _process_in_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._lock:
+                self._pending -= 1
+
+    def _reject(self, request):
+        """Answer 503 straight from the accept loop without reading the request"""
+        body = b'{"error": "Server busy, retry later"}'
+        try:
+            request.sendall(
+                b"HTTP/1.0 503 Service Unavailable\r\n"
+                b"Content-Type: application/json\r\n"
+                b"Retry-After: 1\r\n"
+                b"Connection: close\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+            )
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQL SAGE headless API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--max-pending", type=int, default=64)
+    args = parser.parse_args()
+
+    server = SQLSageAPIServer((args.host, args.port), args.workers, args.max_pending)
+    print(f"SQL SAGE API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
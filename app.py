@@ -1,19 +1,24 @@
 """SQL SAGE - AI-Powered SQL Query Generator"""
-import streamlit as st
-import json
-import pandas as pd
-from datetime import datetime
 import time
-from utils.sql_validator import validate_sql_query
-from utils.schema_validator import validate_schema
-from utils.eden_ai_client import generate_sql_query
+_rerun_started = time.perf_counter()
+
+import os
+import functools
+from datetime import datetime
+import streamlit as st
+# Heavy modules (pandas, plotly, networkx) are imported inside the features
+# that need them; see utils/startup_report.py for import timings
+from utils.schema_loader import load_schema_stream
+from utils.schema_validator import schema_hash
 from utils.sql_dialects import SQLDialectConverter
-from utils.query_optimizer import QueryOptimizer
-from utils.query_history import QueryHistory
-from utils.schema_visualizer import SchemaVisualizer
 from utils.error_handler import SQLErrorHandler
+from utils.database import DatabaseError
 from utils.query_playground import QueryPlayground
-from utils.user_preferences import UserPreferences
+from utils.result_export import EXPORT_TTL_SECONDS, INLINE_DOWNLOAD_MAX_BYTES
+from utils.blog_content import BLOG_POSTS, FAQS
+from utils.startup_report import timed_import, IMPORT_TIMES
+from utils import services
+from utils.profiler import RequestProfiler
 
 # Page config
 st.set_page_config(
@@ -23,34 +28,110 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Each tab body runs as a fragment, so interacting with one tab reruns only
+# that tab (falls back to plain functions on Streamlit versions without fragments)
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda f: f)
+
+# Playground target that uses the PG* environment connection
+DEFAULT_TARGET = "Default (environment)"
+
+if 'render_times' not in st.session_state:
+    st.session_state.render_times = {}
+
+
+def timed_section(name):
+    """Record how long a section took to render in this session"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                st.session_state.render_times[name] = time.perf_counter() - start
+        return wrapper
+    return decorator
+
+
 # Load custom CSS
-def local_css(file_name):
+@st.cache_data
+def read_text_asset(file_name):
     with open(file_name) as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+        return f.read()
+
+def local_css(file_name):
+    st.markdown(f'<style>{read_text_asset(file_name)}</style>', unsafe_allow_html=True)
 
 local_css("assets/custom.css")
 
 # Initialize components
+# Heavy components are process-wide singletons; sessions only hold references
 if 'query_history' not in st.session_state:
-    st.session_state.query_history = QueryHistory()
+    st.session_state.query_history = services.get_query_history()
 if 'schema' not in st.session_state:
+    # Each session works with the schema it uploaded (nothing until then)
     st.session_state.schema = None
 if 'sql_query' not in st.session_state:
     st.session_state.sql_query = None
 if 'selected_dialect' not in st.session_state:
     st.session_state.selected_dialect = 'mysql'
 if 'playground' not in st.session_state:
-    st.session_state.playground = QueryPlayground()
+    st.session_state.playground = QueryPlayground(
+        db=services.get_database(),
+        dialect_converter=services.get_dialect_converter(),
+        query_optimizer=services.get_query_optimizer(),
+        corrector=services.get_query_corrector(),
+        schema_cache=services.get_schema_cache(),
+        cost_guard=services.get_cost_guard()
+    )
 if 'user_preferences' not in st.session_state:
-    st.session_state.user_preferences = UserPreferences()
+    # Keyed by the signed-in user when authentication is configured, else per session
+    st.session_state.user_preferences = services.get_user_preferences(
+        st.user.get("email") if st.user.get("is_logged_in") else None
+    )
 if 'example_query' not in st.session_state:
     st.session_state.example_query = ""
 if 'active_tab' not in st.session_state:
     st.session_state.active_tab = "Query Generator"
+if 'profiler' not in st.session_state:
+    # Its flags stay in this session; they are never saved to preferences
+    st.session_state.profiler = RequestProfiler()
 
 # Initialize utilities
-dialect_converter = SQLDialectConverter()
-query_optimizer = QueryOptimizer()
+dialect_converter = services.get_dialect_converter()
+
+def show_profile_capture(record, key_prefix=""):
+    """Summarise a profiling capture with download links"""
+    if record and record.get("skipped"):
+        st.caption(f"Profile: {record['label']} not captured ({record['skipped']})")
+    if not record or "hotspots" not in record or not os.path.exists(record["prof_file"]):
+        return  # disabled, skipped, or its files were pruned since
+    pd = timed_import("pandas")
+    with st.expander(f"⏱️ Profile: {record['label']} ({record['total_time']:.3f}s)"):
+        st.dataframe(pd.DataFrame(record["hotspots"]))
+        if record.get("memory_hotspots"):
+            st.markdown("**Top allocations**")
+            st.dataframe(pd.DataFrame(record["memory_hotspots"]))
+        with open(record["prof_file"], "rb") as f:
+            st.download_button(
+                "Download .prof",
+                f.read(),
+                file_name=os.path.basename(record["prof_file"]),
+                key=f"{key_prefix}prof_{record['id']}"
+            )
+        if record.get("snapshot_file"):
+            with open(record["snapshot_file"], "rb") as f:
+                st.download_button(
+                    "Download tracemalloc snapshot",
+                    f.read(),
+                    file_name=os.path.basename(record["snapshot_file"]),
+                    key=f"{key_prefix}snap_{record['id']}"
+                )
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_table_preview(_playground, _db, target_name, table_name):
+    """Table previews are shared by all sessions and refreshed every minute"""
+    return _playground.get_table_preview(table_name, db=_db)
 
 # Landing Page
 with st.container():
@@ -103,7 +184,120 @@ tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
     "Settings"
 ])
 
-with tab1:
+def page_selector(total, page_size, key):
+    """Page number input shown once there is more than one page; returns the page (from 1)"""
+    page_count = max(1, -(-total // page_size))
+    if page_count == 1:
+        return 1
+    return st.number_input(f"Page (of {page_count:,})", min_value=1, max_value=page_count, value=1, key=key)
+
+
+def render_result_window(results, key):
+    """Show one page of a result frame; only that window is sent to the browser"""
+    from utils.result_frame import PAGE_SIZE, frame_memory, frame_window, format_bytes
+    memory = frame_memory(results)
+    page = page_selector(len(results), PAGE_SIZE, f"{key}_page")
+    window = frame_window(results, page)
+    first_row = (page - 1) * PAGE_SIZE + 1 if len(window) else 0
+    st.dataframe(window)
+    st.caption(f"Rows {first_row:,}-{first_row + len(window) - 1 if len(window) else 0:,} "
+               f"of {len(results):,} · {format_bytes(memory['bytes'])} in memory")
+    with st.expander("🧮 Memory by column"):
+        st.dataframe(
+            [{"column": name, "dtype": memory["dtypes"][name], "size": format_bytes(size)}
+             for name, size in sorted(memory["columns"].items(), key=lambda item: -item[1])],
+            hide_index=True
+        )
+
+def render_result_export():
+    """Stream the full result of the generated query to a downloadable file"""
+    with st.expander("📥 Export full results"):
+        result_format = st.selectbox(
+            "Result Format",
+            options=["CSV", "Parquet", "Excel"],
+            help="Rows are streamed from the database to a file, so large results are fine"
+        )
+        if st.button("Export Results"):
+            status = st.empty()
+
+            def report_progress(rows, size):
+                written = f"{rows:,} rows" if rows is not None else "streaming"
+                status.info(f"⏳ Exporting... {written}, {size / 1024 / 1024:.1f} MB written")
+
+            query = st.session_state.sql_query
+            if st.session_state.selected_dialect != 'postgresql':
+                query = dialect_converter.convert_query(query, 'postgresql')
+            # Export from the database selected in the Playground
+            profiles = {p['name']: p for p in st.session_state.user_preferences.get_connection_profiles()}
+            target_db = services.get_profile_database(profiles.get(st.session_state.get("playground_target")))
+            try:
+                with st.spinner("Exporting results..."):
+                    result = services.get_result_exporter(target_db).export(query, result_format, report_progress)
+                status.success(f"✅ Exported {result.rows:,} rows ({result.bytes / 1024 / 1024:.1f} MB)")
+            except Exception as e:
+                error_msg, color, suggestion = SQLErrorHandler.format_error(e)
+                status.error(f"Error exporting results: {error_msg}")
+                return
+
+            # Offered on this run only: the file is read into memory once and then deleted
+            if result.bytes <= INLINE_DOWNLOAD_MAX_BYTES:
+                with open(result.path, "rb") as f:
+                    data = f.read()
+                os.remove(result.path)
+                st.download_button(
+                    f"Download {result.file_name}",
+                    data=data,
+                    file_name=result.file_name,
+                    mime=result.mime_type,
+                    on_click="ignore"
+                )
+            else:
+                st.info(f"Too large to download in the browser; saved on the server as {result.path} "
+                        f"for the next {EXPORT_TTL_SECONDS // 60} minutes")
+
+
+def generation_progress():
+    """on_stage callback that shows each Generate stage as soon as it finishes"""
+    stage_log = st.empty()
+    sql_preview = st.empty()
+    lines = []
+    converted = []
+
+    def on_stage(stage, value):
+        if stage == "context":
+            lines.append("✅ Schema context ready")
+        elif stage == "stream":
+            sql_preview.code(value + " ▌", language="sql")  # tokens as the model writes them
+        elif stage == "generate":
+            lines.append("✅ SQL generated")
+            sql_preview.code(value, language="sql")
+        elif stage == "validate":
+            lines.append("✅ Valid SQL" if value else "❌ Generated SQL is not valid")
+        elif stage == "optimize":
+            lines.append(f"✅ Optimized ({len(value[1])} suggestions)")
+        elif stage == "explain" and value is not None:
+            cached = " (cached)" if value.cached else ""
+            if value.valid:
+                lines.append(f"✅ Database accepts the query plan{cached}: estimated cost "
+                             f"{value.estimated_cost:,.0f}, ~{value.estimated_rows:,} rows")
+            elif value.valid is False:
+                lines.append(f"❌ Database rejected the query{cached}")
+            else:
+                lines.append("⚠️ Couldn't check the query plan in time")
+        elif stage.startswith("convert:") and value is not None:
+            converted.append(SQLDialectConverter.SUPPORTED_DIALECTS[stage.split(":", 1)[1]])
+            lines[:] = [line for line in lines if not line.startswith("✅ Converted")]
+            lines.append(f"✅ Converted to {', '.join(converted)}")
+        stage_log.markdown("  \n".join(lines))
+        if stage.startswith("convert:") and len(converted) == len(SQLDialectConverter.SUPPORTED_DIALECTS):
+            sql_preview.empty()  # the final query is shown below
+
+    return on_stage
+
+
+@fragment
+@timed_section("Query Generator")
+def render_query_generator():
     # Use the title only if not already shown in landing page
     if 'active_tab' in st.session_state and st.session_state.active_tab == "Query Generator":
         st.title("🔮 SQL SAGE by AiVERSE")
@@ -125,42 +319,47 @@ with tab1:
     with col1:
         if st.button("Generate SQL Query", type="primary"):
             if nl_query:
-                try:
-                    start_time = time.time()
-                    with st.spinner("🎭 Analyzing your query..."):
-                        sql_query = generate_sql_query(
-                            nl_query,
-                            schema=st.session_state.schema
-                        )
-
-                        if validate_sql_query(sql_query):
-                            optimized_query, suggestions = query_optimizer.optimize_query(
-                                sql_query,
-                                st.session_state.schema
-                            )
-
-                            final_query = dialect_converter.convert_query(
-                                optimized_query,
-                                st.session_state.selected_dialect
+                with st.session_state.profiler.capture("Generate") as profile_record:
+                    try:
+                        with st.spinner("🎭 Analyzing your query..."):
+                            result = services.get_generation_pipeline().run(
+                                nl_query,
+                                schema=st.session_state.schema,
+                                dialect=st.session_state.selected_dialect,
+                                on_stage=generation_progress(),
+                                schema_fingerprint=st.session_state.get('schema_fingerprint')
                             )
 
-                            execution_time = time.time() - start_time
+                        if result.valid:
                             st.session_state.user_preferences.update_performance_metrics(
-                                execution_time,
+                                result.elapsed,
                                 True
                             )
 
                             st.session_state.query_history.add_query(
                                 nl_query,
-                                final_query,
+                                result.final_query,
                                 st.session_state.selected_dialect
                             )
 
-                            st.session_state.sql_query = final_query
-
-                            if suggestions:
+                            st.session_state.sql_query = result.final_query
+                            st.session_state.sql_variants = result.conversions
+                            first_chunk = (f", first tokens after {result.time_to_first_chunk:.2f}s"
+                                           if result.time_to_first_chunk is not None else "")
+                            st.caption(f"⏱️ {result.elapsed:.2f}s with stages overlapped "
+                                       f"({result.serial_time:.2f}s back to back){first_chunk}")
+
+                            if result.explain_ok is False:
+                                # Caught before anyone runs it
+                                error_msg, color, suggestion = SQLErrorHandler.format_error(
+                                    DatabaseError(result.explain.error, sqlstate=result.explain.sqlstate)
+                                )
+                                st.warning(f"⚠️ The database rejects this query: {error_msg}")
+                                st.info(f"💡 Suggestion: {suggestion}")
+
+                            if result.suggestions:
                                 with st.expander("📊 Query Optimization Suggestions"):
-                                    for suggestion in suggestions:
+                                    for suggestion in result.suggestions:
                                         st.info(suggestion)
                         else:
                             error_msg, color, suggestion = SQLErrorHandler.format_error(
@@ -169,14 +368,15 @@ with tab1:
                             st.error(error_msg)
                             st.info(f"💡 Suggestion: {suggestion}")
                             st.session_state.user_preferences.update_performance_metrics(
-                                time.time() - start_time,
+                                result.elapsed,
                                 False
                             )
 
-                except Exception as e:
-                    error_msg, color, suggestion = SQLErrorHandler.format_error(str(e))
-                    st.error(error_msg)
-                    st.info(f"💡 Suggestion: {suggestion}")
+                    except Exception as e:
+                        error_msg, color, suggestion = SQLErrorHandler.format_error(str(e))
+                        st.error(error_msg)
+                        st.info(f"💡 Suggestion: {suggestion}")
+                show_profile_capture(profile_record)
             else:
                 st.warning("Please enter a query first")
 
@@ -193,7 +393,9 @@ with tab1:
             st.session_state.selected_dialect = selected_dialect
             st.session_state.user_preferences.update_preference("dialect", selected_dialect)
             if st.session_state.sql_query:
-                st.session_state.sql_query = dialect_converter.convert_query(
+                # Generate already converted to every dialect; fall back for older queries
+                variants = st.session_state.get('sql_variants') or {}
+                st.session_state.sql_query = variants.get(selected_dialect) or dialect_converter.convert_query(
                     st.session_state.sql_query,
                     selected_dialect
                 )
@@ -212,6 +414,7 @@ with tab1:
 
             if st.button("Export Query"):
                 try:
+                    pd = timed_import("pandas")
                     data = pd.DataFrame({
                         "query": [st.session_state.sql_query],
                         "dialect": [st.session_state.selected_dialect],
@@ -227,6 +430,8 @@ with tab1:
                 except Exception as e:
                     st.error(f"Error exporting query: {str(e)}")
 
+            render_result_export()
+
         with col2:
             # Share query
             if st.button("Share Query"):
@@ -241,7 +446,46 @@ with tab1:
                     })
                     st.success("Query shared successfully!")
 
-with tab2:
+
+def run_fan_out(query, targets):
+    """Execute a query on several connection profiles at once and compare them"""
+    with st.session_state.profiler.capture("Fan-out execute") as profile_record:
+        start_time = time.time()
+        with st.spinner(f"🔍 Executing on {len(targets)} databases..."):
+            try:
+                merged, comparison, suggestions = st.session_state.playground.execute_fan_out(
+                    query,
+                    targets,
+                    st.session_state.selected_dialect
+                )
+            except Exception as e:
+                error_msg, color, suggestion = SQLErrorHandler.format_error(e)
+                st.error(error_msg)
+                st.info(f"💡 Suggestion: {suggestion}")
+                return
+        all_succeeded = bool((comparison["status"] == "ok").all())
+        st.session_state.user_preferences.update_performance_metrics(
+            time.time() - start_time,
+            all_succeeded
+        )
+
+        st.markdown("#### Per-target results")
+        st.dataframe(comparison, hide_index=True)
+        if comparison["matches_first"].eq(False).any():
+            st.warning("⚠️ Some targets returned different rows")
+        if not merged.empty:
+            st.markdown("#### Merged results")
+            st.dataframe(merged)
+        if suggestions:
+            with st.expander("📊 Query Optimization Suggestions"):
+                for suggestion in suggestions:
+                    st.info(suggestion)
+    show_profile_capture(profile_record)
+
+
+@fragment
+@timed_section("Query Playground")
+def render_query_playground():
     st.title("🎮 Interactive Query Playground")
     test_query = st.text_area(
         "Enter your SQL query",
@@ -249,81 +493,158 @@ with tab2:
         help="Write your SQL query here to test it against the database"
     )
 
+    profiles = {p['name']: p for p in st.session_state.user_preferences.get_connection_profiles()}
+    target_col, fan_out_col = st.columns(2)
+    with target_col:
+        target_name = st.selectbox(
+            "Target database",
+            options=[DEFAULT_TARGET] + list(profiles),
+            help="Connection profiles are managed in the Settings tab",
+            key="playground_target"
+        )
+    with fan_out_col:
+        fan_out_names = st.multiselect(
+            "Fan out to profiles",
+            options=list(profiles),
+            help="Run the query on every selected profile at once and compare the results"
+        )
+    target_db = services.get_profile_database(profiles.get(target_name))
+
     col1, col2 = st.columns([2, 1])
     with col1:
         if st.button("Execute Query", type="primary"):
-            if test_query:
-                start_time = time.time()
-                with st.spinner("🔍 Executing query..."):
-                    results, error, suggestions = st.session_state.playground.execute_test_query(
-                        test_query,
-                        st.session_state.selected_dialect
-                    )
-                    execution_time = time.time() - start_time
-
-                    if error:
-                        st.error(error)
-                        if suggestions:
-                            # Check if first suggestion is about correction
-                            if suggestions and "Attempted corrections:" in suggestions[0]:
-                                st.warning("⚠️ " + suggestions[0])
-                                if len(suggestions) > 1:
-                                    st.info("💡 " + suggestions[1])
-                            else:
-                                st.info("💡 " + suggestions[0])
-                        st.session_state.user_preferences.update_performance_metrics(
-                            execution_time,
-                            False
+            if test_query and fan_out_names:
+                st.session_state.playground_result = None
+                run_fan_out(test_query, {name: services.get_profile_database(profiles[name])
+                                         for name in fan_out_names})
+            elif test_query:
+                with st.session_state.profiler.capture("Execute") as profile_record:
+                    start_time = time.time()
+                    with st.spinner("🔍 Executing query..."):
+                        results, error, suggestions = st.session_state.playground.execute_test_query(
+                            test_query,
+                            st.session_state.selected_dialect,
+                            schema=st.session_state.schema,
+                            db=target_db
                         )
-                    elif results is not None:
-                        # Check if query was corrected
-                        was_corrected = False
-                        if suggestions and "Query was automatically corrected:" in suggestions[0]:
-                            was_corrected = True
-                            st.success("✅ " + suggestions[0])
-                            suggestions = suggestions[1:]  # Remove correction message from suggestions
-                        
-                        st.dataframe(results)
+                        execution_time = time.time() - start_time
+
+                        if error:
+                            st.session_state.playground_result = None
+                            st.error(error)
+                            if suggestions:
+                                # Check if first suggestion is about correction
+                                if suggestions and "Attempted corrections:" in suggestions[0]:
+                                    st.warning("⚠️ " + suggestions[0])
+                                    if len(suggestions) > 1:
+                                        st.info("💡 " + suggestions[1])
+                                else:
+                                    st.info("💡 " + suggestions[0])
+                            st.session_state.user_preferences.update_performance_metrics(
+                                execution_time,
+                                False,
+                                query=test_query
+                            )
+                        elif results is not None:
+                            # Check if query was corrected
+                            if suggestions and "Query was automatically corrected:" in suggestions[0]:
+                                st.success("✅ " + suggestions[0])
+                                suggestions = suggestions[1:]  # Remove correction message from suggestions
+                            if suggestions and suggestions[0].startswith("Planner estimate:"):
+                                st.caption("🧮 " + suggestions[0])
+                                suggestions = suggestions[1:]
+
+                            # Kept in the session so paging through it doesn't re-run the query
+                            st.session_state.playground_result = results
+                            st.session_state.pop('playground_result_page', None)
                         
-                        if suggestions:
-                            with st.expander("📊 Query Optimization Suggestions"):
-                                for suggestion in suggestions:
-                                    st.info(suggestion)
-                        st.session_state.user_preferences.update_performance_metrics(
-                            execution_time,
-                            True
-                        )
+                            if suggestions:
+                                with st.expander("📊 Query Optimization Suggestions"):
+                                    for suggestion in suggestions:
+                                        st.info(suggestion)
+                            st.session_state.user_preferences.update_performance_metrics(
+                                execution_time,
+                                True,
+                                query=test_query
+                            )
+                show_profile_capture(profile_record)
             else:
                 st.warning("Please enter a query to execute")
+        if st.session_state.get('playground_result') is not None:
+            render_result_window(st.session_state.playground_result, "playground_result")
 
     with col2:
         with st.expander("📋 Available Tables"):
-            tables = st.session_state.playground.db.get_table_schema().keys()
+            # Only the names are listed up front; tables are introspected a page at a time
+            page_size = 20
+            table_search = st.text_input("Filter tables", key="available_tables_search")
+            try:
+                schema_cache = services.get_schema_cache()
+                names, total = schema_cache.table_names(target_db, search=table_search)
+                page = page_selector(total, page_size, "available_tables_page")
+                tables = names[(page - 1) * page_size:page * page_size]
+                table_schema = schema_cache.get_tables(target_db, tables)
+                st.caption(f"{total:,} tables")
+            except Exception as e:
+                st.error(str(e))
+                tables, table_schema = [], {}
             for table in tables:
                 st.markdown(f"**{table}**")
-                preview = st.session_state.playground.get_table_preview(table)
+                columns = (table_schema.get(table) or {}).get('columns') or {}
+                if columns:
+                    st.caption(", ".join(columns))
+                preview = load_table_preview(st.session_state.playground, target_db, target_name, table)
                 if preview is not None:
                     st.dataframe(preview, height=150)
 
-with tab3:
+
+@fragment
+@timed_section("Schema Explorer")
+def render_schema_explorer():
     st.title("📊 Schema Explorer")
     st.subheader("Database Schema")
     schema_file = st.file_uploader("Upload Schema (JSON)", type=['json'])
     if schema_file:
         try:
-            schema_content = json.load(schema_file)
-            if validate_schema(schema_content):
-                st.session_state.schema = schema_content
-                if st.session_state.schema:
-                    visualizer = SchemaVisualizer(st.session_state.schema)
-                    st.plotly_chart(visualizer.get_plotly_figure(), use_container_width=True)
+            # Parse each upload once; reruns reuse the loaded result
+            upload_id = getattr(schema_file, "file_id", schema_file.name)
+            if st.session_state.get("schema_upload_id") != upload_id:
+                load_result = load_schema_stream(schema_file)
+                st.session_state.schema_upload_id = upload_id
+                st.session_state.schema_errors = (load_result.errors, load_result.truncated)
+                if load_result.is_valid:
+                    # Hashed once here; caches downstream are keyed by the fingerprint
+                    st.session_state.schema = load_result.schema
+                    st.session_state.schema_fingerprint = schema_hash(load_result.schema)
+
+            errors, truncated = st.session_state.schema_errors
+            if not errors:
                 st.success("Schema uploaded successfully!")
             else:
-                st.error("Invalid schema format")
+                st.error(f"Invalid schema format ({len(errors)} problems found"
+                         f"{', showing the first ones' if truncated else ''})")
+                with st.expander("Schema errors"):
+                    for error in errors:
+                        st.markdown(f"- `{error['path']}`: {error['message']}")
         except Exception as e:
             st.error(f"Error parsing schema: {str(e)}")
+    elif st.session_state.schema:
+        st.info("Using the schema uploaded earlier in this session")
 
-with tab4:
+    if st.session_state.schema:
+        expanded_tables = st.multiselect(
+            "Show columns for tables",
+            options=sorted(st.session_state.schema['tables'].keys())
+        )
+        SchemaVisualizer = timed_import("utils.schema_visualizer").SchemaVisualizer
+        visualizer = SchemaVisualizer(st.session_state.schema, expanded_tables,
+                                      schema_fingerprint=st.session_state.get('schema_fingerprint'))
+        st.plotly_chart(visualizer.get_plotly_figure(), use_container_width=True)
+
+
+@fragment
+@timed_section("Performance Metrics")
+def render_performance_metrics():
     st.title("📈 Performance Metrics")
     metrics = st.session_state.user_preferences.get_preference("performance_metrics")
 
@@ -337,23 +658,68 @@ with tab4:
     with col3:
         st.metric("Avg. Execution Time", f"{metrics['average_execution_time']:.3f}s")
 
+    shapes = st.session_state.user_preferences.get_query_shape_metrics()
+    if shapes:
+        st.subheader("Query Shapes")
+        st.caption("Playground executions grouped by normalised query (literals replaced by ?)")
+        pd = timed_import("pandas")
+        st.dataframe(pd.DataFrame(shapes)[
+            ["query", "count", "errors", "avg_time", "max_time", "total_time"]
+        ], hide_index=True)
+
+    st.subheader("Prepared Statements")
+    prepared = services.get_database().get_prepared_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Cached", prepared["cached"])
+    with col2:
+        st.metric("Plan Reuses", prepared["reused"])
+    with col3:
+        st.metric("Reuse Rate", f"{prepared['reuse_ratio'] * 100:.1f}%")
+    with col4:
+        st.metric("Evicted", prepared["evicted"])
+
+    st.subheader("LLM Requests")
+    from utils.eden_ai_client import get_llm_stats
+    llm = get_llm_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Provider Calls", llm["single_flight"]["calls"])
+    with col2:
+        st.metric("Coalesced", llm["single_flight"]["coalesced"],
+                  help="Requests that shared an identical call already in flight")
+    with col3:
+        st.metric("Queue Depth", llm["rate_limiter"]["queue_depth"],
+                  help=f"Waiting for the rate limiter now (peak {llm['rate_limiter']['max_queue_depth']})")
+    with col4:
+        st.metric("Throttled", llm["rate_limiter"]["waited"],
+                  help=f"Calls that waited for a rate limit token ({llm['rate_limiter']['wait_time']:.1f}s in total)")
+
     st.subheader("Recent Shared Queries")
-    shared_queries = st.session_state.user_preferences.get_shared_queries()
+    page_size = 20
+    page = page_selector(st.session_state.user_preferences.shared_queries.count(), page_size, "shared_queries_page")
+    shared_queries, total = st.session_state.user_preferences.get_shared_queries(page, page_size)
     for query in shared_queries:
         with st.expander(f"Query shared on {query['shared_at']}"):
-            st.text(query['natural_query'])
-            st.code(query['sql_query'], language="sql")
-            if query['annotation']:
+            st.text(query.get('natural_query', ''))
+            st.code(query.get('sql_query') or query.get('query', ''), language="sql")
+            if query.get('annotation'):
                 st.info(f"📝 Note: {query['annotation']}")
 
-with tab5:
+
+@fragment
+@timed_section("Query Corrections")
+def render_query_corrections():
     st.title("🔄 Query Corrections")
     
     if hasattr(st.session_state.playground, 'corrector'):
-        corrections = st.session_state.playground.corrector.get_recent_corrections()
+        corrector = st.session_state.playground.corrector
+        page_size = 20
+        page = page_selector(corrector.log.count(), page_size, "corrections_page")
+        corrections, total = corrector.get_corrections_page(page, page_size)
         
         if corrections:
-            st.write(f"Found {len(corrections)} query corrections")
+            st.write(f"Found {total} query corrections")
             
             for correction in corrections:
                 with st.expander(f"Correction at {correction['timestamp']}"):
@@ -370,174 +736,19 @@ with tab5:
     else:
         st.error("Query corrector not initialized properly.")
 
-with tab6:
+
+@fragment
+@timed_section("Blog & FAQs")
+def render_blog_and_faqs():
     st.title("📚 Blog & FAQs")
     
-    # Create a dictionary of blog posts
-    blog_posts = {
-        "Understanding SQL Basics": {
-            "date": "March 5, 2025",
-            "author": "Data Team @ AiVERSE",
-            "content": """
-            ## SQL Fundamentals Every Data Analyst Should Know
-            
-            SQL (Structured Query Language) is the standard language for interacting with relational databases. 
-            Whether you're just starting out or looking to refresh your knowledge, understanding these core 
-            concepts will help you write more effective queries.
-            
-            ### SELECT Statements
-            
-            The `SELECT` statement is the most common command in SQL, used to retrieve data from one or more tables:
-            
-            ```sql
-            SELECT column1, column2 FROM table_name WHERE condition;
-            ```
-            
-            ### JOIN Operations
-            
-            Joins allow you to combine rows from two or more tables based on a related column:
-            
-            ```sql
-            SELECT orders.order_id, customers.customer_name
-            FROM orders
-            JOIN customers ON orders.customer_id = customers.customer_id;
-            ```
-            
-            ### Aggregate Functions
-            
-            Functions like COUNT, SUM, AVG, MAX, and MIN perform calculations on a set of values:
-            
-            ```sql
-            SELECT COUNT(*) as total_orders, SUM(amount) as revenue
-            FROM orders
-            WHERE order_date BETWEEN '2023-01-01' AND '2023-12-31';
-            ```
-            
-            ### GROUP BY Clauses
-            
-            The GROUP BY clause groups rows that have the same values into summary rows:
-            
-            ```sql
-            SELECT category, COUNT(*) as product_count
-            FROM products
-            GROUP BY category;
-            ```
-            
-            Stay tuned for more SQL tips and tutorials!
-            """
-        },
-        "AI and SQL: The Perfect Match": {
-            "date": "February 28, 2025",
-            "author": "AI Research Team @ AiVERSE",
-            "content": """
-            ## How AI is Revolutionizing Database Interactions
-            
-            Artificial Intelligence is transforming how we interact with databases. Natural Language Processing 
-            (NLP) models can now understand human language and convert it into structured query language (SQL), 
-            making databases accessible to non-technical users.
-            
-            ### The Evolution of Database Interfaces
-            
-            1. **Command Line Interfaces**: Required memorizing complex syntax
-            2. **GUI Tools**: Made databases more accessible but still required technical knowledge
-            3. **Natural Language Interfaces**: Allow querying in plain human language
-            
-            ### Benefits of AI-Powered SQL Generation
-            
-            - **Democratization of Data**: Everyone in an organization can access insights without technical skills
-            - **Increased Productivity**: Developers and analysts can focus on more complex tasks
-            - **Reduced Errors**: AI can suggest corrections for common mistakes
-            - **Faster Development**: Rapid prototyping of database queries
-            
-            ### The Technology Behind SQL SAGE
-            
-            SQL SAGE uses a combination of:
-            
-            - Large Language Models trained on SQL syntax and patterns
-            - Context-aware prompting that considers your database schema
-            - Error detection and correction mechanisms
-            - Query optimization techniques
-            
-            The future of database interaction is conversational, and tools like SQL SAGE are leading the way.
-            """
-        },
-        "Query Optimization Tips": {
-            "date": "February 15, 2025",
-            "author": "Performance Team @ AiVERSE",
-            "content": """
-            ## 5 Ways to Make Your SQL Queries Faster
-            
-            Optimizing your SQL queries can dramatically improve application performance. Here are five 
-            techniques to help you write more efficient queries:
-            
-            ### 1. Use Specific Column Names Instead of SELECT *
-            
-            Selecting only the columns you need reduces the amount of data transferred:
-            
-            ```sql
-            -- Instead of this
-            SELECT * FROM customers;
-            
-            -- Do this
-            SELECT customer_id, name, email FROM customers;
-            ```
-            
-            ### 2. Create Appropriate Indexes
-            
-            Indexes speed up search operations at the cost of slower writes:
-            
-            ```sql
-            CREATE INDEX idx_customer_email ON customers(email);
-            ```
-            
-            ### 3. Avoid Using Functions in WHERE Clauses
-            
-            Functions in WHERE clauses prevent the use of indexes:
-            
-            ```sql
-            -- Slower query
-            SELECT * FROM customers WHERE YEAR(registration_date) = 2023;
-            
-            -- Faster query
-            SELECT * FROM customers WHERE registration_date BETWEEN '2023-01-01' AND '2023-12-31';
-            ```
-            
-            ### 4. Use JOIN Instead of Subqueries
-            
-            Joins are often more efficient than subqueries:
-            
-            ```sql
-            -- Instead of this
-            SELECT name FROM customers 
-            WHERE customer_id IN (SELECT customer_id FROM orders WHERE amount > 1000);
-            
-            -- Do this
-            SELECT DISTINCT c.name 
-            FROM customers c
-            JOIN orders o ON c.customer_id = o.customer_id
-            WHERE o.amount > 1000;
-            ```
-            
-            ### 5. Limit Results When Possible
-            
-            Only retrieve the data you need, especially with large tables:
-            
-            ```sql
-            SELECT * FROM orders ORDER BY order_date DESC LIMIT 100;
-            ```
-            
-            Keep these tips in mind when writing queries or reviewing SQL generated by SQL SAGE!
-            """
-        }
-    }
-    
     # Blog Section
     st.header("Latest Blog Posts")
     
-    blog_titles = list(blog_posts.keys())
+    blog_titles = list(BLOG_POSTS.keys())
     selected_blog = st.selectbox("Select a blog post to read", blog_titles)
     
-    blog = blog_posts[selected_blog]
+    blog = BLOG_POSTS[selected_blog]
     st.markdown(f"**{selected_blog}**")
     st.markdown(f"*Published on {blog['date']} by {blog['author']}*")
     st.markdown(blog['content'])
@@ -545,38 +756,7 @@ with tab6:
     # FAQ Section
     st.header("Frequently Asked Questions")
     
-    faqs = [
-        {
-            "question": "What is SQL SAGE?",
-            "answer": "SQL SAGE is an AI-powered tool that converts natural language questions into SQL queries. It helps users who may not be familiar with SQL syntax to interact with databases using plain English."
-        },
-        {
-            "question": "How accurate are the generated SQL queries?",
-            "answer": "SQL SAGE uses advanced language models to generate highly accurate queries. However, as with any AI tool, you should always review the generated code before executing it on production databases. The accuracy improves over time as you provide more context about your database schema."
-        },
-        {
-            "question": "Which SQL dialects are supported?",
-            "answer": "SQL SAGE supports multiple SQL dialects including MySQL, PostgreSQL, SQLite, SQL Server, and Oracle. You can select your preferred dialect from the dropdown menu."
-        },
-        {
-            "question": "How do I improve the accuracy of generated queries?",
-            "answer": "To get better results, try to be specific in your natural language query and upload your database schema. The more context the AI has about your database structure, the more accurate the generated queries will be."
-        },
-        {
-            "question": "Can SQL SAGE optimize my existing queries?",
-            "answer": "Yes! The Query Optimizer feature can analyze your existing SQL queries and suggest performance improvements. This can help you identify missing indexes, inefficient joins, or other optimization opportunities."
-        },
-        {
-            "question": "Is my data secure when using SQL SAGE?",
-            "answer": "SQL SAGE is designed with privacy in mind. Your database connection details are stored locally, and queries are processed on your own machine. The application doesn't persistently store your data or send it to external servers beyond what's needed for AI processing."
-        },
-        {
-            "question": "How does the Query Correction feature work?",
-            "answer": "The Query Correction feature automatically identifies and fixes common SQL syntax errors. It analyses the query structure and applies corrections based on the selected SQL dialect. This helps especially when you're dealing with complex queries or learning SQL."
-        }
-    ]
-    
-    for i, faq in enumerate(faqs):
+    for i, faq in enumerate(FAQS):
         with st.expander(f"Q: {faq['question']}"):
             st.markdown(f"**A:** {faq['answer']}")
     
@@ -590,7 +770,10 @@ with tab6:
     - 📧 Contact us: support@aiverse.io
     """)
 
-with tab7:
+
+@fragment
+@timed_section("Settings")
+def render_settings():
     st.title("⚙️ Settings")
     
     # Theme settings
@@ -626,6 +809,37 @@ with tab7:
     if auto_complete != st.session_state.user_preferences.get_preference("auto_complete"):
         st.session_state.user_preferences.update_preference("auto_complete", auto_complete)
 
+    # Profiling
+    st.subheader("Profiling")
+    profiler = st.session_state.profiler
+    profiling_enabled = st.checkbox(
+        "Profile Generate and Execute requests (cProfile)",
+        value=profiler.enabled,
+        help="Can also be enabled with the SQLSAGE_PROFILE environment variable"
+    )
+    profile_memory = st.checkbox(
+        "Also trace memory allocations (tracemalloc)",
+        value=profiler.trace_memory,
+        disabled=not profiling_enabled,
+        help="Can also be enabled with the SQLSAGE_PROFILE_MEMORY environment variable"
+    )
+    profiler.enabled = profiling_enabled
+    profiler.trace_memory = profile_memory
+
+    for record in profiler.get_recent_captures(5):
+        show_profile_capture(record, key_prefix="settings_")
+
+    # Import and rerun timings
+    with st.expander("⏱️ Import and rerun timings"):
+        st.markdown("**Last render time per section (this session)**")
+        for name, seconds in st.session_state.render_times.items():
+            st.text(f"{name}: {seconds * 1000:.1f} ms")
+        if IMPORT_TIMES:
+            st.markdown("**Lazy imports (this process)**")
+            for module_name, seconds in IMPORT_TIMES.items():
+                st.text(f"{module_name}: {seconds * 1000:.1f} ms")
+        st.caption("Run `python -m utils.startup_report` for cold import times of every dependency")
+
     # Connection profiles
     st.subheader("Connection Profiles")
     if st.button("Add New Connection Profile"):
@@ -656,6 +870,28 @@ with tab7:
             st.text(f"Database: {profile['database']}")
             st.text(f"Username: {profile['username']}")
 
+
+with tab1:
+    render_query_generator()
+
+with tab2:
+    render_query_playground()
+
+with tab3:
+    render_schema_explorer()
+
+with tab4:
+    render_performance_metrics()
+
+with tab5:
+    render_query_corrections()
+
+with tab6:
+    render_blog_and_faqs()
+
+with tab7:
+    render_settings()
+
 # Usage instructions
 with st.expander("How to use SQL SAGE"):
     st.markdown("""
@@ -677,4 +913,6 @@ with st.expander("How to use SQL SAGE"):
     - Include relevant table names if known
     - Upload your schema for context-aware generation
     - Check the optimization suggestions for better performance
-    """)
\ No newline at end of file
+    """)
+
+st.session_state.render_times["Full rerun"] = time.perf_counter() - _rerun_started
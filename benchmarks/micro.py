@@ -0,0 +1,248 @@
+"""Micro-benchmarks for the hot paths in utils, with baseline regression checks
+
+Usage:
+    python -m benchmarks.micro                      # run, compare with the baseline if one exists
+    python -m benchmarks.micro --save-baseline      # run and record the baseline
+    python -m benchmarks.micro --quick -k convert   # fewer sizes/repeats, only matching names
+
+Every benchmark reports seconds per operation (best and median of several
+repeats). A benchmark whose best time is more than --threshold percent slower
+than the baseline counts as a regression and the run exits with status 1.
+A baseline entry may carry its own "threshold" to override the default.
+Baselines are machine specific; record one on the machine you compare on.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from utils.sql_validator import validate_sql_query
+from utils.sql_dialects import SQLDialectConverter
+from utils.query_optimizer import QueryOptimizer
+from utils.error_handler import SQLErrorHandler
+from utils.database import DatabaseError
+from utils.query_history import QueryHistory
+from .synthetic import synthetic_schema, synthetic_queries, synthetic_errors, synthetic_history
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLD = 25.0
+QUERY_BATCH = 200
+
+
+class BenchmarkCase:
+    """One timed operation: func runs ops operations, setup runs untimed before each repeat"""
+
+    def __init__(self,
+                 name: str,
+                 func: Callable[[], Any],
+                 ops: int = 1,
+                 setup: Optional[Callable[[], Any]] = None,
+                 repeat: Optional[int] = None):
+        self.name = name
+        self.func = func
+        self.ops = ops
+        self.setup = setup
+        self.repeat = repeat
+
+    def run(self, repeat: int) -> Dict[str, Any]:
+        repeat = self.repeat or repeat
+        if self.setup:
+            self.setup()
+        self.func()  # warm-up: imports, caches, first-call costs
+        timings = []
+        for _ in range(repeat):
+            if self.setup:
+                self.setup()
+            start = time.perf_counter()
+            self.func()
+            timings.append((time.perf_counter() - start) / self.ops)
+        return {"min": min(timings), "median": statistics.median(timings),
+                "ops": self.ops, "repeat": repeat}
+
+
+def _query_cases(queries: List[str], schema: Dict[str, Any]) -> List[BenchmarkCase]:
+    converter = SQLDialectConverter()
+    optimizer = QueryOptimizer()
+    errors = synthetic_errors(QUERY_BATCH)
+    database_errors = [DatabaseError(message, sqlstate="42P01", position=15, hint="Check the table name")
+                       for message in errors]
+    cases = [
+        BenchmarkCase("validate_sql_query",
+                      lambda: [validate_sql_query(q) for q in queries], len(queries)),
+        BenchmarkCase("optimize_query",
+                      lambda: [optimizer.optimize_query(q, schema) for q in queries], len(queries)),
+        BenchmarkCase("format_error",
+                      lambda: [SQLErrorHandler.format_error(e) for e in errors], len(errors)),
+        BenchmarkCase("format_error[DatabaseError]",
+                      lambda: [SQLErrorHandler.format_error(e) for e in database_errors], len(database_errors)),
+    ]
+    for dialect in SQLDialectConverter.SUPPORTED_DIALECTS:
+        cases.append(BenchmarkCase(
+            f"convert_query[{dialect}]",
+            lambda dialect=dialect: [converter.convert_query(q, dialect) for q in queries],
+            len(queries)
+        ))
+    return cases
+
+
+def _history_cases(sizes: List[int], workdir: str) -> List[BenchmarkCase]:
+    cases = []
+    for size in sizes:
+        path = os.path.join(workdir, f"history_{size}.json")
+        with open(path, "w") as f:
+            json.dump(synthetic_history(size), f)
+        history = QueryHistory(path)
+        pristine = list(history.history)
+        pristine_shapes = dict(history._by_shape)
+
+        def reset(history=history, pristine=pristine, pristine_shapes=pristine_shapes):
+            # Both the records and the shape index, or later rounds take the dedup path
+            history.history = list(pristine)
+            history._by_shape = dict(pristine_shapes)
+
+        cases.append(BenchmarkCase(
+            f"history.add_query[{size}]",
+            lambda history=history: history.add_query("new question", "SELECT 1 FROM new_table;", "postgresql"),
+            setup=reset,
+            repeat=3 if size >= 100000 else None
+        ))
+        cases.append(BenchmarkCase(
+            f"history.search_queries[{size}]",
+            lambda history=history: history.search_queries("orders", "postgresql")
+        ))
+    return cases
+
+
+def _visualizer_cases(sizes: List[int]) -> List[BenchmarkCase]:
+    from utils import schema_visualizer
+    cases = []
+    for size in sizes:
+        schema = synthetic_schema(size, seed=size)
+        cases.append(BenchmarkCase(
+            f"SchemaVisualizer.__init__[{size}]",
+            lambda schema=schema: schema_visualizer.SchemaVisualizer(schema)
+        ))
+        visualizer = schema_visualizer.SchemaVisualizer(schema)
+        cases.append(BenchmarkCase(
+            f"SchemaVisualizer.get_layout[{size}]",
+            visualizer.get_layout,
+            # Measure the layout itself, not the process-wide cache
+            setup=schema_visualizer._layout_cache.clear,
+            repeat=3 if size >= 500 else None
+        ))
+    return cases
+
+
+def build_cases(workdir: str, quick: bool = False) -> List[BenchmarkCase]:
+    schema = synthetic_schema(50)
+    queries = synthetic_queries(QUERY_BATCH, schema)
+    history_sizes = [1000, 10000] if quick else [1000, 10000, 100000]
+    visualizer_sizes = [10, 100] if quick else [10, 100, 500]
+    return (_query_cases(queries, schema)
+            + _history_cases(history_sizes, workdir)
+            + _visualizer_cases(visualizer_sizes))
+
+
+def run_benchmarks(name_filter: str = "", quick: bool = False, repeat: int = 5) -> Dict[str, Any]:
+    """Run every benchmark whose name contains name_filter"""
+    workdir = tempfile.mkdtemp(prefix="sqlsage-bench-")
+    try:
+        results = {}
+        for case in build_cases(workdir, quick):
+            if name_filter and name_filter not in case.name:
+                continue
+            results[case.name] = case.run(3 if quick else repeat)
+            print(f"{case.name:<40} {_format_seconds(results[case.name]['min']):>12}/op", flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "created_at": datetime.now().isoformat(),
+        },
+        "results": results,
+    }
+
+
+def find_regressions(run: Dict[str, Any],
+                     baseline: Dict[str, Any],
+                     threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """Benchmarks whose best time got worse than the baseline by more than the threshold"""
+    regressions = []
+    for name, result in run["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base["min"]:
+            continue
+        allowed = base.get("threshold", threshold)
+        change = (result["min"] - base["min"]) / base["min"] * 100.0
+        if change > allowed:
+            regressions.append({"name": name, "baseline": base["min"], "current": result["min"],
+                                "change_pct": change, "threshold_pct": allowed})
+    return regressions
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.3f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f} ms"
+    return f"{seconds * 1e6:.2f} us"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="SQL SAGE micro-benchmarks")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and fewer repeats")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="percent slowdown that counts as a regression")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    run = run_benchmarks(args.filter, args.quick, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {"meta": run["meta"], "results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        for name, result in run["results"].items():
+            # Keep hand-tuned per-benchmark thresholds
+            threshold = baseline["results"].get(name, {}).get("threshold")
+            baseline["results"][name] = {**result, **({"threshold": threshold} if threshold else {})}
+        baseline["meta"] = run["meta"]
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = find_regressions(run, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression['name']}: {_format_seconds(regression['baseline'])} -> "
+              f"{_format_seconds(regression['current'])} "
+              f"({regression['change_pct']:+.1f}%, allowed {regression['threshold_pct']:.0f}%)")
+    if not regressions:
+        print(f"No regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
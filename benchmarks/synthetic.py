@@ -0,0 +1,89 @@
+"""Deterministic synthetic inputs for the benchmarks"""
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+_ADJECTIVES = ["active", "recent", "top", "late", "big", "new", "regional", "monthly"]
+_NOUNS = ["customers", "orders", "products", "invoices", "shipments", "payments", "users", "events"]
+_TYPES = ["integer", "text", "varchar", "numeric", "timestamp", "boolean", "date"]
+
+
+def synthetic_schema(table_count: int, columns_per_table: int = 8, seed: int = 0) -> Dict[str, Any]:
+    """{'tables': {...}} schema where most tables reference one or two earlier tables"""
+    rng = random.Random(seed)
+    tables: Dict[str, Any] = {}
+    for t in range(table_count):
+        name = f"{_NOUNS[t % len(_NOUNS)]}_{t}"
+        columns = {"id": {"type": "integer", "nullable": False, "is_primary": True}}
+        for c in range(columns_per_table - 1):
+            columns[f"col_{c}"] = {"type": rng.choice(_TYPES), "nullable": rng.random() < 0.3}
+        relationships = []
+        if t:
+            for ref in rng.sample(range(t), min(t, rng.choice([1, 1, 2]))):
+                ref_name = f"{_NOUNS[ref % len(_NOUNS)]}_{ref}"
+                column = f"{ref_name}_id"
+                columns[column] = {"type": "integer", "nullable": True}
+                relationships.append({"column": column, "references_table": ref_name,
+                                      "references_column": "id"})
+        tables[name] = {"columns": columns, "relationships": relationships}
+    return {"tables": tables}
+
+
+def synthetic_queries(count: int, schema: Dict[str, Any], seed: int = 0) -> List[str]:
+    """A mix of simple, filtered, joined, aggregated and dialect-specific queries"""
+    rng = random.Random(seed)
+    tables = schema["tables"]
+    names = list(tables)
+    queries = []
+    for i in range(count):
+        table = rng.choice(names)
+        columns = [c for c in tables[table]["columns"] if c != "id"]
+        picked = ", ".join(rng.sample(columns, min(3, len(columns))))
+        kind = i % 6
+        if kind == 0:
+            query = f"SELECT * FROM {table}"
+        elif kind == 1:
+            query = f"SELECT {picked} FROM {table} WHERE {columns[0]} = {rng.randint(1, 1000)} LIMIT 50"
+        elif kind == 2 and tables[table]["relationships"]:
+            rel = rng.choice(tables[table]["relationships"])
+            query = (f"SELECT a.id, b.id FROM {table} a JOIN {rel['references_table']} b "
+                     f"ON a.{rel['column']} = b.id WHERE a.{columns[0]} IS NOT NULL")
+        elif kind == 3:
+            query = (f"SELECT {columns[0]}, COUNT(*) FROM {table} "
+                     f"WHERE {columns[-1]} IN ({', '.join(str(rng.randint(1, 99)) for _ in range(5))}) "
+                     f"GROUP BY {columns[0]} ORDER BY 2 DESC")
+        elif kind == 4:
+            query = f"SELECT IFNULL({columns[0]}, 0), NOW() FROM {table} WHERE id > {rng.randint(1, 10**6)}"
+        else:
+            query = (f"SELECT DISTINCT {picked} FROM {table} "
+                     f"WHERE {columns[0]} LIKE '%{rng.choice(_ADJECTIVES)}%' LIMIT 10")
+        queries.append(query + ";")
+    return queries
+
+
+def synthetic_errors(count: int, seed: int = 0) -> List[str]:
+    """Database error messages of the kinds SQLErrorHandler classifies"""
+    rng = random.Random(seed)
+    templates = [
+        'syntax error at or near "{word}"',
+        'relation "{word}" does not exist',
+        'column "{word}" does not exist',
+        'column reference "{word}" is ambiguous',
+        'operator does not exist: integer = text',
+        'deadlock detected',
+    ]
+    return [rng.choice(templates).format(word=rng.choice(_NOUNS)) for _ in range(count)]
+
+
+def synthetic_history(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """QueryHistory records with distinct query shapes"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    return [{
+        "timestamp": (start + timedelta(seconds=i)).isoformat(),
+        "natural_query": f"show {rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} number {i}",
+        "sql_query": f"SELECT col_{i % 50} FROM {rng.choice(_NOUNS)}_{i} WHERE id = {i};",
+        "dialect": rng.choice(["postgresql", "mysql"]),
+        "tags": [],
+        "favorite": False,
+    } for i in range(count)]
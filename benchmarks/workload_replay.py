@@ -0,0 +1,327 @@
+"""Replay recorded SQL traffic against a database and compare runs
+
+Queries come from a query history JSON file (or a text file with one query
+per line) and are replayed by concurrent workers, either through the full
+QueryPlayground path (dialect conversion, optimization, correction) or
+straight through Database.execute_query. Each run reports throughput,
+latency percentiles, error rate and the slowest query shapes, and can be
+saved and compared with another run, e.g. before and after an index change.
+Playground replays use the shared cost guard and a corrector that doesn't
+write to the correction log, so a replay leaves no trace in the app's data.
+
+Usage:
+    python -m benchmarks.workload_replay run INPUT [--concurrency 4] [--duration 60]
+        [--think-time 0] [--mode playground|database] [--output run.json]
+    python -m benchmarks.workload_replay compare BASELINE.json CANDIDATE.json [--threshold 10]
+"""
+import sys
+import json
+import time
+import argparse
+import itertools
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from utils import services
+from utils.database import Database
+from utils.query_corrector import QueryCorrector
+from utils.query_playground import QueryPlayground
+from utils.sql_validator import validate_sql_query
+from utils.query_fingerprint import fingerprint, normalize
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def load_workload(path: str) -> List[Dict[str, str]]:
+    """
+    Read {"sql", "dialect"} items from a query history JSON file or a
+    one-query-per-line text file (PostgreSQL). Entries that aren't valid SQL
+    are dropped.
+    """
+    with open(path) as f:
+        if path.endswith(".json"):
+            items = [{"sql": record["sql_query"], "dialect": record.get("dialect", "postgresql")}
+                     for record in json.load(f)]
+        else:
+            items = [{"sql": line.strip(), "dialect": "postgresql"} for line in f if line.strip()]
+    return [item for item in items if validate_sql_query(item["sql"])]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _latency_summary(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    summary = {f"p{pct}": percentile(ordered, pct) for pct in PERCENTILES}
+    summary["mean"] = sum(ordered) / len(ordered) if ordered else 0.0
+    summary["max"] = ordered[-1] if ordered else 0.0
+    return summary
+
+
+class WorkloadReplayer:
+    """Replays a workload with a fixed number of concurrent workers"""
+
+    def __init__(self,
+                 playground: Optional[QueryPlayground] = None,
+                 db: Optional[Database] = None,
+                 mode: str = "playground",
+                 limit_rows: int = 100):
+        if mode not in ("playground", "database"):
+            raise Exception(f"Unknown replay mode: {mode}")
+        self.db = db or (playground.db if playground else Database())
+        self.playground = playground or QueryPlayground(
+            db=self.db,
+            corrector=QueryCorrector(log_file=None, legacy_log_file=None),
+            cost_guard=services.get_cost_guard()
+        )
+        self.mode = mode
+        self.limit_rows = limit_rows
+
+    def _execute(self, item: Dict[str, str]) -> Optional[str]:
+        """Run one query; returns the error message, or None on success"""
+        try:
+            if self.mode == "database":
+                self.db.execute_query(item["sql"])
+                return None
+            _, error, _ = self.playground.execute_test_query(
+                item["sql"], item["dialect"], self.limit_rows
+            )
+            return error or None
+        except Exception as e:
+            return str(e)
+
+    def run(self,
+            workload: List[Dict[str, str]],
+            concurrency: int = 4,
+            duration: Optional[float] = 60.0,
+            iterations: Optional[int] = None,
+            think_time: float = 0.0,
+            label: str = "") -> Dict[str, Any]:
+        """
+        Replay the workload until duration seconds have passed or it has been
+        played iterations times, whichever comes first
+        Returns: the run report (see summarize)
+        """
+        if not workload:
+            raise Exception("Workload is empty")
+        if duration is None and iterations is None:
+            iterations = 1
+
+        total = len(workload) * iterations if iterations else None
+        queue = itertools.islice(itertools.cycle(workload), total)
+        queue_lock = threading.Lock()
+        samples: List[Dict[str, Any]] = []
+        samples_lock = threading.Lock()
+        started = time.perf_counter()
+        deadline = started + duration if duration else None
+
+        def worker():
+            while deadline is None or time.perf_counter() < deadline:
+                with queue_lock:
+                    item = next(queue, None)
+                if item is None:
+                    return
+                query_start = time.perf_counter()
+                error = self._execute(item)
+                latency = time.perf_counter() - query_start
+                with samples_lock:
+                    samples.append({"sql": item["sql"], "latency": latency, "error": error})
+                if think_time:
+                    time.sleep(think_time)
+
+        threads = [threading.Thread(target=worker, name=f"replay-{i}", daemon=True)
+                   for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return summarize(samples, elapsed, {
+            "label": label,
+            "mode": self.mode,
+            "concurrency": concurrency,
+            "think_time": think_time,
+            "duration": duration,
+            "iterations": iterations,
+            "workload_size": len(workload),
+        })
+
+
+def summarize(samples: List[Dict[str, Any]],
+              elapsed: float,
+              config: Dict[str, Any],
+              top_shapes: int = 10) -> Dict[str, Any]:
+    """Aggregate raw samples into a run report"""
+    shapes: Dict[str, Dict[str, Any]] = {}
+    for sample in samples:
+        shape = shapes.setdefault(fingerprint(sample["sql"]), {
+            "query": normalize(sample["sql"]), "latencies": [], "errors": 0
+        })
+        shape["latencies"].append(sample["latency"])
+        if sample["error"]:
+            shape["errors"] += 1
+            shape["last_error"] = sample["error"]
+
+    shape_reports = {}
+    for key, shape in shapes.items():
+        shape_reports[key] = {
+            "query": shape["query"],
+            "count": len(shape["latencies"]),
+            "errors": shape["errors"],
+            **_latency_summary(shape["latencies"]),
+        }
+        if "last_error" in shape:
+            shape_reports[key]["last_error"] = shape["last_error"]
+
+    errors = sum(1 for sample in samples if sample["error"])
+    return {
+        "config": config,
+        "finished_at": datetime.now().isoformat(),
+        "elapsed": elapsed,
+        "queries": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "throughput": len(samples) / elapsed if elapsed else 0.0,
+        "latency": _latency_summary([sample["latency"] for sample in samples]),
+        "slowest_shapes": sorted(
+            ({"fingerprint": key, **report} for key, report in shape_reports.items()),
+            key=lambda report: report["p95"],
+            reverse=True
+        )[:top_shapes],
+        "shapes": shape_reports,
+    }
+
+
+def compare_runs(baseline: Dict[str, Any],
+                 candidate: Dict[str, Any],
+                 threshold: float = 10.0) -> Dict[str, Any]:
+    """
+    Compare two run reports. Changes are candidate relative to baseline in
+    percent; a latency or throughput change worse than threshold percent
+    counts as a regression.
+    """
+    def change(old: float, new: float) -> Optional[float]:
+        return (new - old) / old * 100.0 if old else None
+
+    latency = {name: {"baseline": baseline["latency"][name],
+                      "candidate": candidate["latency"][name],
+                      "change_pct": change(baseline["latency"][name], candidate["latency"][name])}
+               for name in baseline["latency"]}
+    regressions = [f"latency {name} +{values['change_pct']:.1f}%"
+                   for name, values in latency.items()
+                   if values["change_pct"] is not None and values["change_pct"] > threshold]
+
+    throughput_change = change(baseline["throughput"], candidate["throughput"])
+    if throughput_change is not None and throughput_change < -threshold:
+        regressions.append(f"throughput {throughput_change:.1f}%")
+    if candidate["error_rate"] > baseline["error_rate"]:
+        regressions.append(
+            f"error rate {baseline['error_rate'] * 100:.1f}% -> {candidate['error_rate'] * 100:.1f}%"
+        )
+
+    shapes = []
+    for key, old in baseline["shapes"].items():
+        new = candidate["shapes"].get(key)
+        if new is None:
+            continue
+        shape_change = change(old["p50"], new["p50"])
+        shapes.append({"fingerprint": key, "query": old["query"],
+                       "baseline_p50": old["p50"], "candidate_p50": new["p50"],
+                       "change_pct": shape_change})
+        if shape_change is not None and shape_change > threshold:
+            regressions.append(f"shape {key} p50 +{shape_change:.1f}%")
+    shapes.sort(key=lambda shape: shape["change_pct"] or 0.0, reverse=True)
+
+    return {
+        "threshold_pct": threshold,
+        "throughput": {"baseline": baseline["throughput"], "candidate": candidate["throughput"],
+                       "change_pct": throughput_change},
+        "error_rate": {"baseline": baseline["error_rate"], "candidate": candidate["error_rate"]},
+        "latency": latency,
+        "shapes": shapes,
+        "regressions": regressions,
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    latency = report["latency"]
+    print(f"{report['queries']} queries in {report['elapsed']:.1f}s "
+          f"({report['throughput']:.1f}/s), errors {report['error_rate'] * 100:.1f}%")
+    print("latency ms: " + ", ".join(f"{name} {value * 1000:.1f}" for name, value in latency.items()))
+    print("slowest shapes (p95):")
+    for shape in report["slowest_shapes"]:
+        print(f"  {shape['p95'] * 1000:9.1f} ms  x{shape['count']:<5} {shape['query'][:100]}")
+
+
+def _print_comparison(comparison: Dict[str, Any]) -> None:
+    throughput = comparison["throughput"]
+    print(f"throughput {throughput['baseline']:.1f}/s -> {throughput['candidate']:.1f}/s")
+    for name, values in comparison["latency"].items():
+        change = values["change_pct"]
+        change_text = f"{change:+.1f}%" if change is not None else "n/a"
+        print(f"latency {name}: {values['baseline'] * 1000:.1f} -> "
+              f"{values['candidate'] * 1000:.1f} ms ({change_text})")
+    if comparison["regressions"]:
+        print(f"REGRESSIONS (> {comparison['threshold_pct']}%):")
+        for regression in comparison["regressions"]:
+            print(f"  {regression}")
+    else:
+        print("no regressions")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded SQL traffic")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="replay a workload")
+    run_parser.add_argument("input", help="query history JSON or one query per line")
+    run_parser.add_argument("--concurrency", type=int, default=4)
+    run_parser.add_argument("--duration", type=float, default=60.0,
+                            help="seconds to run for (0: play the workload --iterations times)")
+    run_parser.add_argument("--iterations", type=int)
+    run_parser.add_argument("--think-time", type=float, default=0.0,
+                            help="seconds each worker waits between queries")
+    run_parser.add_argument("--mode", choices=["playground", "database"], default="playground")
+    run_parser.add_argument("--label", default="")
+    run_parser.add_argument("--output", help="save the report as JSON")
+
+    compare_parser = commands.add_parser("compare", help="compare two saved reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=10.0,
+                                help="percent change that counts as a regression")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.candidate) as f:
+            candidate = json.load(f)
+        comparison = compare_runs(baseline, candidate, args.threshold)
+        _print_comparison(comparison)
+        return 1 if comparison["regressions"] else 0
+
+    workload = load_workload(args.input)
+    report = WorkloadReplayer(mode=args.mode).run(
+        workload,
+        concurrency=args.concurrency,
+        duration=args.duration or None,
+        iterations=args.iterations,
+        think_time=args.think_time,
+        label=args.label or args.input
+    )
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+import pytest
+from utils.cost_guard import CostGuard, QueryRefused, plan_estimate
+
+
+class PlanDatabase:
+    """Answers EXPLAIN with a fixed plan"""
+
+    def __init__(self, plan):
+        self.plan = plan
+
+    def get_query_explain_plan(self, query, timeout_ms=2000):
+        return [{"QUERY PLAN": [{"Plan": self.plan}]}]
+
+
+def limit_plan(limit_cost, limit_rows, input_cost, input_rows, input_node="Seq Scan"):
+    return {"Node Type": "Limit", "Total Cost": limit_cost, "Plan Rows": limit_rows,
+            "Plans": [{"Node Type": input_node, "Total Cost": input_cost, "Plan Rows": input_rows}]}
+
+
+def test_limit_over_seq_scan_runs():
+    # SELECT * FROM big_table LIMIT 100: the scan stops after 100 rows
+    db = PlanDatabase(limit_plan(1.5, 100, 15000000.0, 500000000))
+    guard = CostGuard(max_cost=1000000, max_rows=10000000, action='refuse')
+    decision = guard.check("SELECT * FROM big_table LIMIT 100", db)
+    assert decision.action == 'run'
+    assert (decision.cost, decision.rows) == (1.5, 100)
+
+
+def test_limit_over_expensive_sort_is_judged_by_its_input():
+    plan = limit_plan(2e9, 100, 2e9, 1e12, input_node="Sort")
+    assert plan_estimate(plan, 1000000) == (2e9, 1e12)
+    guard = CostGuard(max_cost=1000000, max_rows=10000000, action='refuse')
+    with pytest.raises(QueryRefused):
+        guard.check("SELECT * FROM a, b ORDER BY 1 LIMIT 100", PlanDatabase(plan))
+
+
+def test_plan_without_limit_uses_its_own_estimate():
+    assert plan_estimate({"Node Type": "Seq Scan", "Total Cost": 10.0, "Plan Rows": 5}) == (10.0, 5)
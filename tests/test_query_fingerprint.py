@@ -0,0 +1,19 @@
+from utils.query_fingerprint import parameterize
+
+
+def test_plain_strings_and_numbers_are_bound():
+    statement, values = parameterize("SELECT * FROM t WHERE a = 'it''s' AND b > 10.5")
+    assert statement == "SELECT * FROM t WHERE a = $1 AND b > $2::numeric"
+    assert values == ("it's", "10.5")
+
+
+def test_escape_strings_stay_inline():
+    query = "SELECT * FROM t WHERE a = E'a\\'b'"
+    assert parameterize(query) == (query, ())
+
+
+def test_other_string_forms_stay_inline():
+    for query in ("SELECT * FROM t WHERE a = $$x'y$$",
+                  "SELECT * FROM t WHERE a = 'a\\' AND b = 'c'",
+                  "SELECT * FROM t WHERE a = U&'d\\0061'"):
+        assert parameterize(query) == (query, ())
@@ -0,0 +1,11 @@
+from utils.query_playground import with_limit
+
+
+def test_limit_is_not_commented_out():
+    assert with_limit("SELECT * FROM t -- all rows", 100) == "SELECT * FROM t LIMIT 100"
+    assert with_limit("SELECT * FROM t; /* done */\n", 100) == "SELECT * FROM t LIMIT 100"
+
+
+def test_only_a_top_level_limit_counts():
+    assert with_limit("SELECT * FROM (SELECT * FROM t LIMIT 5) s", 100).endswith(") s LIMIT 100")
+    assert with_limit("SELECT * FROM t LIMIT 3 -- c", 100) == "SELECT * FROM t LIMIT 3 -- c"
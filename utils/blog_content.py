@@ -0,0 +1,189 @@
+"""Static Blog & FAQs tab content"""
+
+BLOG_POSTS = {
+    "Understanding SQL Basics": {
+        "date": "March 5, 2025",
+        "author": "Data Team @ AiVERSE",
+        "content": """
+        ## SQL Fundamentals Every Data Analyst Should Know
+        
+        SQL (Structured Query Language) is the standard language for interacting with relational databases. 
+        Whether you're just starting out or looking to refresh your knowledge, understanding these core 
+        concepts will help you write more effective queries.
+        
+        ### SELECT Statements
+        
+        The `SELECT` statement is the most common command in SQL, used to retrieve data from one or more tables:
+        
+        ```sql
+        SELECT column1, column2 FROM table_name WHERE condition;
+        ```
+        
+        ### JOIN Operations
+        
+        Joins allow you to combine rows from two or more tables based on a related column:
+        
+        ```sql
+        SELECT orders.order_id, customers.customer_name
+        FROM orders
+        JOIN customers ON orders.customer_id = customers.customer_id;
+        ```
+        
+        ### Aggregate Functions
+        
+        Functions like COUNT, SUM, AVG, MAX, and MIN perform calculations on a set of values:
+        
+        ```sql
+        SELECT COUNT(*) as total_orders, SUM(amount) as revenue
+        FROM orders
+        WHERE order_date BETWEEN '2023-01-01' AND '2023-12-31';
+        ```
+        
+        ### GROUP BY Clauses
+        
+        The GROUP BY clause groups rows that have the same values into summary rows:
+        
+        ```sql
+        SELECT category, COUNT(*) as product_count
+        FROM products
+        GROUP BY category;
+        ```
+        
+        Stay tuned for more SQL tips and tutorials!
+        """
+    },
+    "AI and SQL: The Perfect Match": {
+        "date": "February 28, 2025",
+        "author": "AI Research Team @ AiVERSE",
+        "content": """
+        ## How AI is Revolutionizing Database Interactions
+        
+        Artificial Intelligence is transforming how we interact with databases. Natural Language Processing 
+        (NLP) models can now understand human language and convert it into structured query language (SQL), 
+        making databases accessible to non-technical users.
+        
+        ### The Evolution of Database Interfaces
+        
+        1. **Command Line Interfaces**: Required memorizing complex syntax
+        2. **GUI Tools**: Made databases more accessible but still required technical knowledge
+        3. **Natural Language Interfaces**: Allow querying in plain human language
+        
+        ### Benefits of AI-Powered SQL Generation
+        
+        - **Democratization of Data**: Everyone in an organization can access insights without technical skills
+        - **Increased Productivity**: Developers and analysts can focus on more complex tasks
+        - **Reduced Errors**: AI can suggest corrections for common mistakes
+        - **Faster Development**: Rapid prototyping of database queries
+        
+        ### The Technology Behind SQL SAGE
+        
+        SQL SAGE uses a combination of:
+        
+        - Large Language Models trained on SQL syntax and patterns
+        - Context-aware prompting that considers your database schema
+        - Error detection and correction mechanisms
+        - Query optimization techniques
+        
+        The future of database interaction is conversational, and tools like SQL SAGE are leading the way.
+        """
+    },
+    "Query Optimization Tips": {
+        "date": "February 15, 2025",
+        "author": "Performance Team @ AiVERSE",
+        "content": """
+        ## 5 Ways to Make Your SQL Queries Faster
+        
+        Optimizing your SQL queries can dramatically improve application performance. Here are five 
+        techniques to help you write more efficient queries:
+        
+        ### 1. Use Specific Column Names Instead of SELECT *
+        
+        Selecting only the columns you need reduces the amount of data transferred:
+        
+        ```sql
+        -- Instead of this
+        SELECT * FROM customers;
+        
+        -- Do this
+        SELECT customer_id, name, email FROM customers;
+        ```
+        
+        ### 2. Create Appropriate Indexes
+        
+        Indexes speed up search operations at the cost of slower writes:
+        
+        ```sql
+        CREATE INDEX idx_customer_email ON customers(email);
+        ```
+        
+        ### 3. Avoid Using Functions in WHERE Clauses
+        
+        Functions in WHERE clauses prevent the use of indexes:
+        
+        ```sql
+        -- Slower query
+        SELECT * FROM customers WHERE YEAR(registration_date) = 2023;
+        
+        -- Faster query
+        SELECT * FROM customers WHERE registration_date BETWEEN '2023-01-01' AND '2023-12-31';
+        ```
+        
+        ### 4. Use JOIN Instead of Subqueries
+        
+        Joins are often more efficient than subqueries:
+        
+        ```sql
+        -- Instead of this
+        SELECT name FROM customers 
+        WHERE customer_id IN (SELECT customer_id FROM orders WHERE amount > 1000);
+        
+        -- Do this
+        SELECT DISTINCT c.name 
+        FROM customers c
+        JOIN orders o ON c.customer_id = o.customer_id
+        WHERE o.amount > 1000;
+        ```
+        
+        ### 5. Limit Results When Possible
+        
+        Only retrieve the data you need, especially with large tables:
+        
+        ```sql
+        SELECT * FROM orders ORDER BY order_date DESC LIMIT 100;
+        ```
+        
+        Keep these tips in mind when writing queries or reviewing SQL generated by SQL SAGE!
+        """
+    }
+}
+
+FAQS = [
+    {
+        "question": "What is SQL SAGE?",
+        "answer": "SQL SAGE is an AI-powered tool that converts natural language questions into SQL queries. It helps users who may not be familiar with SQL syntax to interact with databases using plain English."
+    },
+    {
+        "question": "How accurate are the generated SQL queries?",
+        "answer": "SQL SAGE uses advanced language models to generate highly accurate queries. However, as with any AI tool, you should always review the generated code before executing it on production databases. The accuracy improves over time as you provide more context about your database schema."
+    },
+    {
+        "question": "Which SQL dialects are supported?",
+        "answer": "SQL SAGE supports multiple SQL dialects including MySQL, PostgreSQL, SQLite, SQL Server, and Oracle. You can select your preferred dialect from the dropdown menu."
+    },
+    {
+        "question": "How do I improve the accuracy of generated queries?",
+        "answer": "To get better results, try to be specific in your natural language query and upload your database schema. The more context the AI has about your database structure, the more accurate the generated queries will be."
+    },
+    {
+        "question": "Can SQL SAGE optimize my existing queries?",
+        "answer": "Yes! The Query Optimizer feature can analyze your existing SQL queries and suggest performance improvements. This can help you identify missing indexes, inefficient joins, or other optimization opportunities."
+    },
+    {
+        "question": "Is my data secure when using SQL SAGE?",
+        "answer": "SQL SAGE is designed with privacy in mind. Your database connection details are stored locally, and queries are processed on your own machine. The application doesn't persistently store your data or send it to external servers beyond what's needed for AI processing."
+    },
+    {
+        "question": "How does the Query Correction feature work?",
+        "answer": "The Query Correction feature automatically identifies and fixes common SQL syntax errors. It analyses the query structure and applies corrections based on the selected SQL dialect. This helps especially when you're dealing with complex queries or learning SQL."
+    }
+]
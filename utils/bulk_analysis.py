@@ -0,0 +1,155 @@
+"""Process-pool execution for bulk SQL validation, optimization and conversion
+
+sqlparse and the optimizer rules are pure Python, so large batches (the whole
+query history, a dialect conversion of an archive, batch imports) are split
+into chunks and fanned out over worker processes. Results always come back in
+input order, one (result, error) tuple per query.
+
+Usage: python -m utils.bulk_analysis {validate,optimize,convert} INPUT [--dialect D] [--output FILE]
+INPUT is a query history JSON file or a text file with one query per line.
+"""
+import os
+import sys
+import json
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .sql_validator import validate_sql_query
+from .query_optimizer import QueryOptimizer
+from .sql_dialects import SQLDialectConverter
+from .schema_validator import schema_hash
+
+# Batches smaller than this run in-process; the pool start-up isn't worth it
+MIN_PARALLEL_ITEMS = 2000
+DEFAULT_CHUNK_SIZE = 500
+
+BulkResult = Tuple[Any, Optional[str]]
+
+# Per-process state, set up once by _init_worker
+_optimizer: Optional[QueryOptimizer] = None
+_converter: Optional[SQLDialectConverter] = None
+_schema: Optional[Dict] = None
+_schema_fingerprint: Optional[str] = None
+
+
+def _init_worker(schema: Optional[Dict]) -> None:
+    global _optimizer, _converter, _schema, _schema_fingerprint
+    _optimizer = QueryOptimizer()
+    _converter = SQLDialectConverter()
+    _schema = schema
+    # Hashed once per worker rather than once per query
+    _schema_fingerprint = schema_hash(schema) if schema else None
+
+
+def _validate_one(query: str) -> Any:
+    return bool(validate_sql_query(query))
+
+
+def _optimize_one(query: str) -> Any:
+    return _optimizer.optimize_query(query, _schema, _schema_fingerprint)
+
+
+def _run_chunk(task: Callable[[str], Any], chunk: List[str], *args) -> List[BulkResult]:
+    results = []
+    for query in chunk:
+        try:
+            results.append((task(query, *args), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+def _validate_chunk(chunk: List[str]) -> List[BulkResult]:
+    return _run_chunk(_validate_one, chunk)
+
+
+def _optimize_chunk(chunk: List[str]) -> List[BulkResult]:
+    return _run_chunk(_optimize_one, chunk)
+
+
+def _convert_chunk(chunk: List[str], target_dialect: str) -> List[BulkResult]:
+    return _run_chunk(lambda query: _converter.convert_query(query, target_dialect), chunk)
+
+
+def _run_bulk(chunk_task: Callable[..., List[BulkResult]],
+              queries: List[str],
+              extra_args: Tuple = (),
+              schema: Optional[Dict] = None,
+              workers: Optional[int] = None,
+              chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[BulkResult]:
+    if len(queries) < MIN_PARALLEL_ITEMS or (workers is not None and workers <= 1):
+        _init_worker(schema)
+        return chunk_task(queries, *extra_args)
+
+    chunks = [queries[i:i + chunk_size] for i in range(0, len(queries), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    # spawn rather than fork: the Streamlit server process is multi-threaded
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(schema,)) as executor:
+        # executor.map yields chunk results in submission order
+        chunk_results = executor.map(
+            chunk_task,
+            chunks,
+            *[[arg] * len(chunks) for arg in extra_args]
+        )
+        return [result for chunk in chunk_results for result in chunk]
+
+
+def bulk_validate(queries: List[str], **options) -> List[BulkResult]:
+    """validate_sql_query over many queries: [(is_valid, error), ...]"""
+    return _run_bulk(_validate_chunk, queries, **options)
+
+
+def bulk_optimize(queries: List[str], schema: Optional[Dict] = None, **options) -> List[BulkResult]:
+    """QueryOptimizer.optimize_query over many queries: [((optimized, suggestions), error), ...]"""
+    return _run_bulk(_optimize_chunk, queries, schema=schema, **options)
+
+
+def bulk_convert(queries: List[str], target_dialect: str, **options) -> List[BulkResult]:
+    """SQLDialectConverter.convert_query over many queries: [(converted, error), ...]"""
+    return _run_bulk(_convert_chunk, queries, extra_args=(target_dialect,), **options)
+
+
+def load_queries(path: str) -> List[str]:
+    """Read queries from a query history JSON file or a one-query-per-line text file"""
+    with open(path) as f:
+        if path.endswith(".json"):
+            return [record["sql_query"] for record in json.load(f)]
+        return [line.strip() for line in f if line.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Bulk SQL analysis over a process pool")
+    parser.add_argument("operation", choices=["validate", "optimize", "convert"])
+    parser.add_argument("input")
+    parser.add_argument("--dialect", default="postgresql")
+    parser.add_argument("--output")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    queries = load_queries(args.input)
+    options = {"workers": args.workers, "chunk_size": args.chunk_size}
+    if args.operation == "validate":
+        results = bulk_validate(queries, **options)
+    elif args.operation == "optimize":
+        results = bulk_optimize(queries, **options)
+    else:
+        results = bulk_convert(queries, args.dialect, **options)
+
+    records = [{"query": query, "result": result, "error": error}
+               for query, (result, error) in zip(queries, results)]
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        json.dump(records, output, indent=2, default=str)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Check the planner's estimate before the playground runs a query
+
+A LIMIT only caps what comes back; a sort or aggregate over an accidental
+cross join still does all of its work first. The guard plans the query
+(EXPLAIN, never executed) and compares the estimated total cost and rows
+with configurable thresholds. Over the threshold the query is run on a
+TABLESAMPLE of its tables, run under a tighter statement timeout, or
+refused outright; far over it, it is always refused.
+"""
+import os
+from typing import Any, Dict, Optional
+import sqlparse
+from sqlparse import tokens as T
+from .database import Database
+
+# Planner cost units and estimated rows (before any LIMIT) above which a query is guarded
+COST_GUARD_MAX_COST = float(os.getenv("COST_GUARD_MAX_COST", "1000000"))
+COST_GUARD_MAX_ROWS = float(os.getenv("COST_GUARD_MAX_ROWS", "10000000"))
+# What to do with a query over the thresholds: sample, timeout or refuse
+COST_GUARD_ACTION = os.getenv("COST_GUARD_ACTION", "sample")
+COST_GUARD_SAMPLE_PERCENT = float(os.getenv("COST_GUARD_SAMPLE_PERCENT", "1"))
+COST_GUARD_TIMEOUT_MS = int(os.getenv("COST_GUARD_TIMEOUT_MS", "5000"))
+# Queries this many times over a threshold are refused whatever the action
+COST_GUARD_REFUSE_FACTOR = float(os.getenv("COST_GUARD_REFUSE_FACTOR", "100"))
+
+ACTIONS = ('sample', 'timeout', 'refuse')
+
+
+class QueryRefused(Exception):
+    """The planner's estimate was too high to run the query at all"""
+
+    def __init__(self, message: str, suggestion: str):
+        super().__init__(message)
+        self.suggestion = suggestion
+
+
+class CostDecision:
+    """How (and whether) to run a query, given its plan estimate"""
+
+    def __init__(self,
+                 action: str,
+                 query: str,
+                 cost: Optional[float] = None,
+                 rows: Optional[float] = None,
+                 timeout_ms: Optional[int] = None,
+                 note: Optional[str] = None):
+        # run, sample, timeout or refuse
+        self.action = action
+        # What to execute (the sampled rewrite for sample)
+        self.query = query
+        self.cost = cost
+        self.rows = rows
+        self.timeout_ms = timeout_ms
+        self.note = note
+
+    @property
+    def message(self) -> Optional[str]:
+        """Estimate to show the user; None when there is none"""
+        if self.cost is None:
+            return None
+        message = f"Planner estimate: cost {self.cost:,.0f}, ~{self.rows:,.0f} rows"
+        return f"{message} ({self.note})" if self.note else message
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"action": self.action, "estimated_cost": self.cost,
+                "estimated_rows": self.rows, "timeout_ms": self.timeout_ms}
+
+
+def plan_estimate(plan: Dict[str, Any], max_cost: Optional[float] = None):
+    """
+    (total cost, rows) of a plan's top node. A Limit's own estimate already
+    accounts for stopping early, so it is used as is, unless the Limit costs
+    more than max_cost: then its input's rows are reported, as the work the
+    Limit doesn't bound (a sort or aggregate over a cross join, say).
+    """
+    cost, rows = plan.get("Total Cost"), plan.get("Plan Rows")
+    if (plan.get("Node Type") == "Limit" and plan.get("Plans")
+            and max_cost is not None and cost is not None and cost > max_cost):
+        rows = plan["Plans"][0].get("Plan Rows", rows)
+    return cost, rows
+
+
+def sample_tables(query: str, percent: float) -> Optional[str]:
+    """
+    Add TABLESAMPLE SYSTEM (percent) to every table in a plain SELECT's FROM
+    and JOIN clauses. None when the query isn't one that can be rewritten
+    safely (CTEs, subqueries, set-returning functions, several statements).
+    """
+    statements = [s for s in sqlparse.parse(query) if s.value.strip().strip(';')]
+    if len(statements) != 1 or statements[0].get_type() != 'SELECT':
+        return None
+    tokens = list(statements[0].flatten())
+    if sum(1 for t in tokens if t.ttype is T.DML and t.normalized == 'SELECT') != 1:
+        return None
+
+    sample = f" TABLESAMPLE SYSTEM ({percent:g})"
+    out = []
+    depth = 0
+    # expect: where we are in a FROM/JOIN table reference
+    #   table -> a table name; name -> more of a dotted name, AS or an alias;
+    #   alias -> the alias after AS; after -> sampled, waiting for , or the clause end
+    expect = None
+    in_from = False
+    # Where the sample goes if the reference ends without an alias
+    reference_end = 0
+    for token in tokens:
+        if token.is_whitespace or token.ttype in T.Comment:
+            out.append(token.value)
+            continue
+        value = token.value
+        keyword = token.normalized if token.is_keyword else None
+
+        if expect in ('name', 'alias'):
+            if expect == 'name' and value == '.':
+                expect = 'dot'
+                out.append(value)
+                continue
+            if expect == 'name' and keyword == 'AS':
+                expect = 'alias'
+                out.append(value)
+                continue
+            if token.ttype in T.Name or (expect == 'name' and token.ttype in T.Literal.String.Symbol):
+                out.append(value)
+                out.append(sample)
+                expect = 'after'
+                continue
+            if expect == 'alias' or value == '(':
+                return None  # function in FROM, or something we don't understand
+            out.insert(reference_end, sample)
+            expect = 'after'
+        elif expect in ('table', 'dot'):
+            if token.ttype in T.Name or token.ttype in T.Literal.String.Symbol:
+                out.append(value)
+                reference_end = len(out)
+                expect = 'name'
+                continue
+            return None  # subquery, LATERAL, ONLY, VALUES, ...
+
+        if value == '(':
+            depth += 1
+        elif value == ')':
+            depth -= 1
+        elif depth == 0 and keyword == 'FROM':
+            in_from, expect = True, 'table'
+        elif depth == 0 and keyword and keyword.endswith('JOIN'):
+            in_from, expect = False, 'table'
+        elif depth == 0 and value == ',' and in_from:
+            expect = 'table'
+        elif depth == 0 and keyword and keyword not in ('ON', 'USING', 'AS'):
+            in_from = False
+        out.append(value)
+
+    if expect in ('table', 'dot', 'alias'):
+        return None
+    if expect == 'name':
+        out.insert(reference_end, sample)
+    return "".join(out)
+
+
+class CostGuard:
+    """Decides how to run a playground query from its EXPLAIN estimate"""
+
+    def __init__(self,
+                 max_cost: float = COST_GUARD_MAX_COST,
+                 max_rows: float = COST_GUARD_MAX_ROWS,
+                 action: str = COST_GUARD_ACTION,
+                 sample_percent: float = COST_GUARD_SAMPLE_PERCENT,
+                 timeout_ms: int = COST_GUARD_TIMEOUT_MS,
+                 refuse_factor: float = COST_GUARD_REFUSE_FACTOR):
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown cost guard action: {action} (expected one of {', '.join(ACTIONS)})")
+        self.max_cost = max_cost
+        self.max_rows = max_rows
+        self.action = action
+        self.sample_percent = sample_percent
+        self.timeout_ms = timeout_ms
+        self.refuse_factor = refuse_factor
+
+    def check(self, query: str, db: Database) -> CostDecision:
+        """
+        Plan query on db and decide how to run it
+        Raises: QueryRefused when the estimate is over the thresholds and the
+        action is refuse, or over them by refuse_factor
+        """
+        try:
+            plan = db.get_query_explain_plan(query)[0]["QUERY PLAN"][0]["Plan"]
+        except Exception:
+            # Can't plan it (yet): let the execution report whatever is wrong
+            return CostDecision('run', query)
+        cost, rows = plan_estimate(plan, self.max_cost)
+        if cost is None:
+            return CostDecision('run', query)
+        rows = rows or 0
+
+        over = max(cost / self.max_cost, rows / self.max_rows)
+        if over <= 1:
+            return CostDecision('run', query, cost, rows)
+
+        if self.action == 'refuse' or over > self.refuse_factor:
+            raise QueryRefused(
+                f"Query refused: the planner estimates cost {cost:,.0f} and ~{rows:,.0f} rows, "
+                f"over the playground limit (cost {self.max_cost:,.0f}, {self.max_rows:,.0f} rows)",
+                "Check the joins: a missing join condition makes a cross join of the tables. "
+                "Add filters or join conditions to narrow the query down."
+            )
+
+        if self.action == 'sample':
+            sampled = sample_tables(query, self.sample_percent)
+            if sampled is not None:
+                return CostDecision('sample', sampled, cost, rows,
+                                    note=f"ran on a {self.sample_percent:g}% sample of each table")
+        return CostDecision('timeout', query, cost, rows, self.timeout_ms,
+                            note=f"ran with a {self.timeout_ms / 1000:g}s timeout")
@@ -1,49 +1,435 @@
 """Database utility functions"""
 import os
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 from psycopg2.extras import RealDictCursor
-from typing import Optional, List, Dict, Any, Union
+from .query_fingerprint import parameterize
+from typing import Optional, List, Dict, Any, Iterator, Tuple, IO, Callable
 
 # Load environment variables from .env file
 load_dotenv()
 
+# SQLSTATEs after which the whole transaction can simply be run again
+RETRYABLE_SQLSTATES = {
+    '40001',  # serialization_failure
+    '40P01',  # deadlock_detected
+    '57P01',  # admin_shutdown
+    '57P02',  # crash_shutdown
+    '57P03',  # cannot_connect_now
+    '08001',  # sqlclient_unable_to_establish_sqlconnection
+    '08004',  # sqlserver_rejected_establishment_of_sqlconnection
+}
+# Connection lost mid-statement: only safe to replay statements that don't write
+CONNECTION_LOST_SQLSTATES = {'08000', '08003', '08006'}
+READ_ONLY_PREFIXES = ('SELECT', 'WITH', 'EXPLAIN', 'SHOW', 'VALUES', 'TABLE')
+# Statements PREPARE accepts
+PREPARABLE_PREFIXES = ('SELECT', 'WITH', 'VALUES', 'INSERT', 'UPDATE', 'DELETE')
+
+
+class DatabaseError(Exception):
+    """Database failure carrying the server's SQLSTATE and diagnostics"""
+
+    def __init__(self,
+                 message: str,
+                 sqlstate: Optional[str] = None,
+                 position: Optional[int] = None,
+                 hint: Optional[str] = None,
+                 detail: Optional[str] = None,
+                 attempts: int = 1):
+        super().__init__(f"Database error: {message}")
+        self.message = message
+        self.sqlstate = sqlstate
+        self.position = position
+        self.hint = hint
+        self.detail = detail
+        self.attempts = attempts
+
+    @classmethod
+    def from_psycopg2(cls, error: Exception, default_sqlstate: Optional[str] = None) -> "DatabaseError":
+        """Keep pgcode, cursor position, hint and detail from a psycopg2 error"""
+        diag = getattr(error, 'diag', None)
+        position = getattr(diag, 'statement_position', None)
+        sqlstate = getattr(error, 'pgcode', None)
+        if sqlstate is None and isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+            # Raised by libpq without a server response: the connection is gone
+            sqlstate = default_sqlstate or '08006'
+        return cls(
+            (getattr(diag, 'message_primary', None) or str(error)).strip(),
+            sqlstate=sqlstate,
+            position=int(position) if position else None,
+            hint=getattr(diag, 'message_hint', None),
+            detail=getattr(diag, 'message_detail', None)
+        )
+
+    def is_retryable(self, query: str = "") -> bool:
+        """Whether running the same statement again may succeed"""
+        if self.sqlstate in RETRYABLE_SQLSTATES:
+            return True
+        return (self.sqlstate in CONNECTION_LOST_SQLSTATES
+                and query.lstrip().upper().startswith(READ_ONLY_PREFIXES))
+
+
 class Database:
     """Database connection and query execution handler"""
 
-    def __init__(self):
-        self.conn_params = {
+    def __init__(self,
+                 min_connections: int = 1,
+                 max_connections: int = 10,
+                 max_retries: int = 3,
+                 retry_backoff: float = 0.05,
+                 max_backoff: float = 1.0,
+                 conn_params: Optional[Dict[str, Any]] = None,
+                 name: str = "default",
+                 prepared_cache_size: int = 100):
+        # Connection settings come from the PG* environment unless given explicitly
+        self.conn_params = conn_params or {
             'dbname': os.getenv('PGDATABASE'),
             'user': os.getenv('PGUSER'),
             'password': os.getenv('PGPASSWORD'),
             'host': os.getenv('PGHOST'),
             'port': os.getenv('PGPORT')
         }
+        self.name = name
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._pool_lock = threading.Lock()
+        # Callers wait for a free connection instead of hitting PoolError
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        # Server-side prepared statements: connection id -> LRU of statement names.
+        # Each connection is used by one thread at a time, so only the outer
+        # dict and the counters need the lock.
+        self.prepared_cache_size = prepared_cache_size
+        self._prepared: Dict[int, "OrderedDict[str, None]"] = {}
+        self._unpreparable: set = set()
+        self._prepared_lock = threading.Lock()
+        self.prepared_stats = {"prepared": 0, "reused": 0, "evicted": 0, "unpreparable": 0,
+                               "execute_fallbacks": 0}
+
+    @staticmethod
+    def profile_params(profile: Dict[str, Any]) -> Dict[str, Any]:
+        """psycopg2 connection parameters for a saved connection profile"""
+        return {
+            'dbname': profile.get('database') or None,
+            'user': profile.get('username') or None,
+            'password': profile.get('password') or None,
+            'host': profile.get('host') or None,
+            'port': profile.get('port') or None
+        }
+
+    @classmethod
+    def from_profile(cls, profile: Dict[str, Any], **options) -> "Database":
+        """Database for a connection profile saved in UserPreferences"""
+        return cls(conn_params=cls.profile_params(profile), name=profile.get('name', 'profile'), **options)
+
+    def _get_pool(self) -> ThreadedConnectionPool:
+        """Create the connection pool on first use"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(
+                        self.min_connections,
+                        self.max_connections,
+                        **self.conn_params
+                    )
+        return self._pool
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a pooled connection for one transaction.
+        Commits on success, rolls back on error, and discards broken connections.
+        """
+        with self._slots:
+            try:
+                pool = self._get_pool()
+                conn = pool.getconn()
+            except psycopg2.Error as e:
+                raise DatabaseError.from_psycopg2(e, default_sqlstate='08001')
+            try:
+                with conn:
+                    yield conn
+            except BaseException:
+                # The rollback may have undone PREPAREs from this transaction, so
+                # relearn them (re-preparing an existing one is harmless, see 42P05)
+                with self._prepared_lock:
+                    self._prepared.pop(id(conn), None)
+                raise
+            finally:
+                if conn.closed:
+                    # Its prepared statements died with the session
+                    with self._prepared_lock:
+                        self._prepared.pop(id(conn), None)
+                pool.putconn(conn, close=bool(conn.closed))
+
+    def close(self) -> None:
+        """Close every pooled connection"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+        with self._prepared_lock:
+            self._prepared.clear()
 
     def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
-        """Execute a query and return results as a list of dictionaries"""
+        """
+        Execute a query and return results as a list of dictionaries.
+        Transient failures (serialization failures, deadlocks, server restarts,
+        lost connections) are retried with capped exponential backoff.
+        Raises: DatabaseError
+        """
+        return self._with_retries(query, lambda: self._execute_once(query, params))
+
+    def execute_query_rows(self,
+                           query: str,
+                           params: Optional[tuple] = None,
+                           timeout_ms: Optional[int] = None) -> Tuple[List[Tuple[str, int]], List[tuple]]:
+        """
+        Like execute_query, but returns plain row tuples and the column
+        descriptions instead of one dictionary per row, which is far lighter
+        for large results (see utils.result_frame). timeout_ms sets a
+        statement timeout for this query only.
+        Returns: ([(column_name, type_oid), ...], rows)
+        Raises: DatabaseError (57014 when the timeout hits)
+        """
+        return self._with_retries(
+            query, lambda: self._execute_once(query, params, as_rows=True, timeout_ms=timeout_ms)
+        )
+
+    def _with_retries(self, query: str, run: Callable[[], Any]) -> Any:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return run()
+            except DatabaseError as e:
+                error = e
+            except psycopg2.Error as e:
+                error = DatabaseError.from_psycopg2(e)
+            except Exception as e:
+                raise DatabaseError(str(e), attempts=attempt)
+
+            error.attempts = attempt
+            if attempt > self.max_retries or not error.is_retryable(query):
+                raise error
+            delay = min(self.max_backoff, self.retry_backoff * 2 ** (attempt - 1))
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def _execute_once(self,
+                      query: str,
+                      params: Optional[tuple],
+                      as_rows: bool = False,
+                      timeout_ms: Optional[int] = None):
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=None if as_rows else RealDictCursor) as cur:
+                if timeout_ms:
+                    cur.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+                if not (params is None and self._execute_prepared(conn, cur, query)):
+                    cur.execute(query, params)
+                if as_rows:
+                    if not cur.description:
+                        return [], []
+                    return [(col.name, col.type_code) for col in cur.description], cur.fetchall()
+                if cur.description:  # If query returns data
+                    return cur.fetchall()
+                return []
+
+    def _execute_prepared(self, conn, cur, query: str) -> bool:
+        """
+        Run a query through a server-side prepared statement named after its
+        normalised text, preparing it on this connection first if needed.
+        Returns: False if the query can't be prepared (the caller runs it as is)
+        """
+        if self.prepared_cache_size <= 0 or not query.lstrip().upper().startswith(PREPARABLE_PREFIXES):
+            return False
+        statement, values = parameterize(query)
+        if ";" in statement:
+            return False  # more than one statement
+        name = "sqlsage_" + hashlib.sha1(statement.encode("utf-8")).hexdigest()[:20]
+        if name in self._unpreparable:
+            return False
+
+        with self._prepared_lock:
+            statements = self._prepared.setdefault(id(conn), OrderedDict())
+        if name in statements:
+            statements.move_to_end(name)
+            self._count("reused")
+        else:
+            cur.execute("SAVEPOINT sqlsage_prepare")
+            try:
+                cur.execute(f"PREPARE {name} AS {statement}")
+            except psycopg2.Error as e:
+                cur.execute("ROLLBACK TO SAVEPOINT sqlsage_prepare")
+                if e.pgcode != '42P05':  # duplicate_prepared_statement: same text, reuse it
+                    # Don't try this shape again; any real error (unknown table, ...)
+                    # surfaces from the plain execution
+                    with self._prepared_lock:
+                        if len(self._unpreparable) > 10000:
+                            self._unpreparable.clear()
+                        self._unpreparable.add(name)
+                    self._count("unpreparable")
+                    return False
+            cur.execute("RELEASE SAVEPOINT sqlsage_prepare")
+            statements[name] = None
+            self._count("prepared")
+            while len(statements) > self.prepared_cache_size:
+                evicted, _ = statements.popitem(last=False)
+                cur.execute(f"DEALLOCATE {evicted}")
+                self._count("evicted")
+
+        # The savepoint rides along with the EXECUTE, so it costs no extra round trip
+        execute = f"SAVEPOINT sqlsage_execute; EXECUTE {name}"
+        try:
+            if values:
+                cur.execute(f"{execute} ({', '.join(['%s'] * len(values))})", values)
+            else:
+                cur.execute(execute)
+        except psycopg2.Error:
+            # e.g. a bound value the parameter's type rejects; the plain query may
+            # still run, and reports the real error if it doesn't
+            cur.execute("ROLLBACK TO SAVEPOINT sqlsage_execute")
+            self._count("execute_fallbacks")
+            return False
+        return True
+
+    def _count(self, counter: str) -> None:
+        with self._prepared_lock:
+            self.prepared_stats[counter] += 1
+
+    def get_prepared_stats(self) -> Dict[str, Any]:
+        """Prepared statement counters plus how many are currently cached"""
+        with self._prepared_lock:
+            cached = sum(len(statements) for statements in self._prepared.values())
+            stats = dict(self.prepared_stats)
+        executions = stats["prepared"] + stats["reused"]
+        stats["cached"] = cached
+        stats["reuse_ratio"] = stats["reused"] / executions if executions else 0.0
+        return stats
+
+    def stream_query(self,
+                     query: str,
+                     params: Optional[tuple] = None,
+                     chunk_size: int = 10000) -> Iterator[Tuple[List[Tuple[str, int]], List[tuple]]]:
+        """
+        Run a query through a server-side cursor and yield its rows in chunks,
+        so result sets larger than memory can be consumed.
+        Yields: ([(column_name, type_oid), ...], rows) per chunk
+        """
         try:
-            with psycopg2.connect(**self.conn_params) as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            with self.connection() as conn:
+                with conn.cursor(name=f"sqlsage_stream_{threading.get_ident()}") as cur:
+                    cur.itersize = chunk_size
                     cur.execute(query, params)
-                    if cur.description:  # If query returns data
-                        return cur.fetchall()
-                    return []
-        except Exception as e:
-            raise Exception(f"Database error: {str(e)}")
+                    columns = None
+                    while True:
+                        rows = cur.fetchmany(chunk_size)
+                        if columns is None:
+                            columns = [(col.name, col.type_code) for col in cur.description]
+                        if not rows:
+                            break
+                        yield columns, rows
+                    if columns is not None and cur.rownumber == 0:
+                        yield columns, []
+        except psycopg2.Error as e:
+            raise DatabaseError.from_psycopg2(e)
+
+    def copy_to_csv(self, query: str, output: IO[bytes]) -> int:
+        """
+        Stream a query's result into a binary file object as CSV with a header
+        using COPY, without materialising rows in Python.
+        Returns: number of rows copied
+        """
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.copy_expert(
+                        f"COPY ({query.strip().rstrip(';')}) TO STDOUT WITH (FORMAT csv, HEADER true)",
+                        output
+                    )
+                    return cur.rowcount
+        except psycopg2.Error as e:
+            raise DatabaseError.from_psycopg2(e)
+
+    def explain_query(self, query: str, timeout_ms: int = 2000) -> Dict[str, Any]:
+        """
+        Plan a query without executing it: EXPLAIN inside a read-only
+        transaction with a statement timeout, always rolled back
+        Returns: the top plan node of EXPLAIN (FORMAT JSON)
+        Raises: DatabaseError (57014 when the timeout hits)
+        """
+        return self._explain(query, timeout_ms)[0]["Plan"]
+
+    def _explain(self, query: str, timeout_ms: int) -> List[Dict[str, Any]]:
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    try:
+                        cur.execute("SET TRANSACTION READ ONLY")
+                        cur.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+                        cur.execute("EXPLAIN (FORMAT JSON) " + query.strip().rstrip(';'))
+                        plan = cur.fetchone()[0]
+                    finally:
+                        conn.rollback()
+            return json.loads(plan) if isinstance(plan, str) else plan
+        except psycopg2.Error as e:
+            raise DatabaseError.from_psycopg2(e)
 
     def test_query(self, query: str) -> bool:
         """Test if a query is valid without executing it"""
         try:
-            with psycopg2.connect(**self.conn_params) as conn:
-                with conn.cursor() as cur:
-                    cur.execute("EXPLAIN " + query)
-                    return True
+            self.explain_query(query)
+            return True
         except Exception:
             return False
 
-    def get_table_schema(self) -> Dict[str, Any]:
-        """Get the database schema information"""
+    def get_table_versions(self, schema_name: str = 'public') -> Dict[str, str]:
+        """
+        Catalog version of every table and view, without introspecting any:
+        a hash of the xmin of its pg_class, pg_attribute, pg_attrdef and key
+        pg_constraint rows, which changes whenever DDL touches the table.
+        Cheap even for catalogs with tens of thousands of tables.
+        Returns: {table_name: version}
+        """
+        versions_query = """
+        SELECT
+            c.relname AS table_name,
+            md5(concat_ws(':', c.oid, c.xmin,
+                (SELECT string_agg(a.attnum || '@' || a.xmin::text, ',' ORDER BY a.attnum)
+                 FROM pg_attribute a WHERE a.attrelid = c.oid AND a.attnum > 0),
+                (SELECT string_agg(d.xmin::text, ',' ORDER BY d.oid)
+                 FROM pg_attrdef d WHERE d.adrelid = c.oid),
+                (SELECT string_agg(con.xmin::text, ',' ORDER BY con.oid)
+                 FROM pg_constraint con WHERE con.conrelid = c.oid AND con.contype IN ('p', 'f'))
+            )) AS version
+        FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %s
+            AND c.relkind IN ('r', 'p', 'v', 'f')
+        """
+        try:
+            return {row['table_name']: row['version']
+                    for row in self.execute_query(versions_query, (schema_name,))}
+        except Exception as e:
+            raise Exception(f"Error getting table versions: {str(e)}")
+
+    def get_table_schema(self, tables: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Get the database schema information, for every table in public or
+        only the given ones (see SchemaCache for incremental refreshes)
+        """
+        relationship_filter = "AND tc.table_name = ANY(%s)" if tables is not None else ""
+        table_filter = "AND t.table_name = ANY(%s)" if tables is not None else ""
         schema_query = """
         WITH relationships AS (
             SELECT
@@ -58,6 +444,7 @@ class Database:
                 JOIN information_schema.constraint_column_usage AS ccu
                     ON ccu.constraint_name = tc.constraint_name
             WHERE tc.constraint_type = 'FOREIGN KEY'
+            {relationship_filter}
         )
         SELECT 
             t.table_name,
@@ -94,14 +481,17 @@ class Database:
             ) as table_info
         FROM 
             information_schema.tables t
-            JOIN information_schema.columns c ON t.table_name = c.table_name
+            JOIN information_schema.columns c
+                ON t.table_name = c.table_name AND t.table_schema = c.table_schema
         WHERE 
             t.table_schema = 'public'
+            {table_filter}
         GROUP BY 
             t.table_name;
-        """
+        """.format(relationship_filter=relationship_filter, table_filter=table_filter)
+        params = (list(tables), list(tables)) if tables is not None else None
         try:
-            results = self.execute_query(schema_query)
+            results = self.execute_query(schema_query, params)
             schema = {}
             for row in results:
                 schema[row['table_name']] = row['table_info']
@@ -109,10 +499,10 @@ class Database:
         except Exception as e:
             raise Exception(f"Error getting schema: {str(e)}")
 
-    def get_query_explain_plan(self, query: str) -> List[Dict[str, Any]]:
-        """Get query execution plan for optimization"""
+    def get_query_explain_plan(self, query: str, timeout_ms: int = 2000) -> List[Dict[str, Any]]:
+        """Get query execution plan for optimization (planned only, never executed)"""
         try:
-            return self.execute_query(f"EXPLAIN (FORMAT JSON) {query}")
+            return [{"QUERY PLAN": self._explain(query, timeout_ms)}]
         except Exception as e:
             raise Exception(f"Error getting query plan: {str(e)}")
 
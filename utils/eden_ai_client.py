@@ -1,31 +1,98 @@
 import os
+import json
+import hashlib
 import requests
-from typing import Optional, Dict
+from typing import Callable, Iterator, Optional, Dict
+from .join_paths import JoinPathIndex, get_join_path_index
+from .llm_gateway import SingleFlight, TokenBucket
 
 EDEN_AI_API_KEY = os.getenv("EDEN_AI_API_KEY")
 EDEN_AI_ENDPOINT = "https://api.edenai.run/v2/text/generation"
+EDEN_AI_STREAM_ENDPOINT = "https://api.edenai.run/v2/text/chat/stream"
+# Provider calls allowed per minute (process-wide), how many may burst at
+# once, and how long a request may queue for its turn before giving up
+EDEN_AI_RATE_PER_MINUTE = float(os.getenv("EDEN_AI_RATE_PER_MINUTE", "60"))
+EDEN_AI_BURST = int(os.getenv("EDEN_AI_BURST", "5"))
+EDEN_AI_QUEUE_TIMEOUT = float(os.getenv("EDEN_AI_QUEUE_TIMEOUT", "30"))
 
-def generate_sql_query(
-    natural_language_query: str,
-    schema: Optional[Dict] = None
-) -> str:
-    """
-    Generate SQL query from natural language using Eden AI API
-    """
-    if not EDEN_AI_API_KEY:
-        raise ValueError("EDEN AI API key not found in environment variables")
+# Identical prompts in flight at the same time share one provider call
+llm_calls = SingleFlight()
+rate_limiter = TokenBucket(EDEN_AI_RATE_PER_MINUTE / 60.0, EDEN_AI_BURST)
 
-    # Prepare the prompt with schema context if available
+def get_llm_stats() -> Dict[str, Dict]:
+    """Coalescing and rate limiter counters, including the current queue depth"""
+    return {"single_flight": llm_calls.get_stats(), "rate_limiter": rate_limiter.get_stats()}
+
+def _flight_key(prompt: str) -> str:
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+def _throttle() -> None:
+    """Wait for the rate limiter before a provider call"""
+    if not rate_limiter.acquire(timeout=EDEN_AI_QUEUE_TIMEOUT):
+        raise Exception("Too many SQL generation requests right now; please try again shortly")
+
+def _check_throttled(response: requests.Response) -> None:
+    """On 429, hold back every caller for as long as the provider asks"""
+    if response.status_code == 429:
+        try:
+            retry_after = float(response.headers.get("Retry-After", "5"))
+        except ValueError:
+            retry_after = 5.0
+        rate_limiter.pause(retry_after)
+
+def _build_prompt(natural_language_query: str,
+                  schema: Optional[Dict] = None,
+                  schema_fingerprint: Optional[str] = None,
+                  join_index: Optional[JoinPathIndex] = None) -> str:
+    """Question plus schema context and join hints"""
     prompt = natural_language_query
     if schema:
         schema_context = "\nDatabase Schema:\n" + str(schema)
         prompt = prompt + schema_context
 
-    headers = {
+        # Point the model at FK join paths between tables the question mentions
+        join_index = join_index or get_join_path_index(schema, schema_fingerprint)
+        join_hints = join_index.join_hints(
+            join_index.mentioned_tables(natural_language_query)
+        )
+        if join_hints:
+            prompt = prompt + "\nJoin paths:\n" + "\n".join(join_hints)
+    return prompt
+
+def _headers() -> Dict[str, str]:
+    if not EDEN_AI_API_KEY:
+        raise ValueError("EDEN AI API key not found in environment variables")
+    return {
         "Authorization": f"Bearer {EDEN_AI_API_KEY}",
         "Content-Type": "application/json"
     }
-    
+
+def _clean_sql(sql_query: str) -> str:
+    """Basic cleanup of generated SQL: whitespace and markdown code fences"""
+    sql_query = sql_query.strip()
+    if sql_query.startswith('```'):
+        sql_query = sql_query.split('\n', 1)[1] if '\n' in sql_query else ''
+    if sql_query.rstrip().endswith('```'):
+        sql_query = sql_query.rstrip()[:-3]
+    return sql_query.strip()
+
+def generate_sql_query(
+    natural_language_query: str,
+    schema: Optional[Dict] = None,
+    schema_fingerprint: Optional[str] = None,
+    join_index: Optional[JoinPathIndex] = None
+) -> str:
+    """
+    Generate SQL query from natural language using Eden AI API.
+    schema_fingerprint (see schema_hash) saves hashing the schema again, and
+    the schema's join_index (see get_join_path_index) looking it up again.
+    """
+    headers = _headers()
+    prompt = _build_prompt(natural_language_query, schema, schema_fingerprint, join_index)
+    return llm_calls.run(_flight_key(prompt), lambda publish: _complete(prompt, headers))[0]
+
+def _complete(prompt: str, headers: Dict[str, str]) -> str:
+    """One request/response provider call"""
     payload = {
         "providers": "google",  # Using Google's model through Eden AI
         "text": f"Convert this to SQL query: {prompt}",
@@ -33,25 +100,138 @@ def generate_sql_query(
         "max_tokens": 300
     }
 
+    _throttle()
     try:
         response = requests.post(
             EDEN_AI_ENDPOINT,
             headers=headers,
             json=payload
         )
+        _check_throttled(response)
         response.raise_for_status()
-        
+
         result = response.json()
-        sql_query = result['google']['generated_text']
-        
-        # Basic cleanup of the generated SQL
-        sql_query = sql_query.strip()
-        if sql_query.startswith('```sql'):
-            sql_query = sql_query[6:-3]  # Remove markdown code blocks if present
-            
-        return sql_query.strip()
-        
+        return _clean_sql(result['google']['generated_text'])
+
     except requests.exceptions.RequestException as e:
         raise Exception(f"API request failed: {str(e)}")
     except KeyError as e:
         raise Exception(f"Unexpected API response format: {str(e)}")
+
+def _chunk_text(line: str) -> str:
+    """Text carried by one line of a streamed response (SSE or JSON lines)"""
+    if line.startswith("data:"):
+        line = line[5:].strip()
+    if not line or line == "[DONE]":
+        return ""
+    try:
+        event = json.loads(line)
+    except json.JSONDecodeError:
+        return line + "\n"
+    if not isinstance(event, dict):
+        return ""
+    if "choices" in event:  # OpenAI-style delta
+        return "".join((choice.get("delta") or {}).get("content") or "" for choice in event["choices"])
+    return event.get("text") or event.get("generated_text") or ""
+
+def stream_completion(prompt: str) -> Iterator[str]:
+    """
+    Yield generated text as the provider sends it. Closing the iterator
+    closes the HTTP response, which stops the generation.
+    """
+    payload = {
+        "providers": "google",
+        "text": f"Convert this to SQL query: {prompt}",
+        "temperature": 0.1,
+        "max_tokens": 300
+    }
+    headers = _headers()
+    _throttle()
+    response = requests.post(EDEN_AI_STREAM_ENDPOINT, headers=headers, json=payload, stream=True)
+    try:
+        _check_throttled(response)
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            text = _chunk_text(line or "")
+            if text:
+                yield text
+    finally:
+        response.close()
+
+def statement_end(text: str) -> Optional[int]:
+    """
+    Index just past the first ; that ends a statement, ignoring ones inside
+    string literals, quoted identifiers and comments; None if there is none yet
+    """
+    i, quote = 0, None
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if text.startswith(quote, i):
+                if quote in ("'", '"') and text.startswith(quote * 2, i):
+                    i += 2  # doubled quote is an escaped quote
+                    continue
+                i += len(quote)
+                quote = None
+                continue
+        elif char in ("'", '"'):
+            quote = char
+        elif text.startswith("--", i):
+            quote = "\n"
+        elif text.startswith("/*", i):
+            quote = "*/"
+            i += 1
+        elif char == ";":
+            return i + 1
+        i += 1
+    return None
+
+def stream_sql_query(
+    natural_language_query: str,
+    schema: Optional[Dict] = None,
+    on_chunk: Optional[Callable[[str], None]] = None,
+    chunk_source: Optional[Callable[[str], Iterator[str]]] = None,
+    schema_fingerprint: Optional[str] = None,
+    join_index: Optional[JoinPathIndex] = None
+) -> str:
+    """
+    Generate SQL like generate_sql_query, but consume the provider's output
+    as a stream: on_chunk gets the text so far after every chunk, and the
+    stream is cut off as soon as a complete statement and its terminator
+    have arrived. chunk_source(prompt) replaces the provider (e.g. a stub).
+    Falls back to the non-streaming endpoint if the provider can't stream.
+    """
+    prompt = _build_prompt(natural_language_query, schema, schema_fingerprint, join_index)
+    return llm_calls.run(
+        _flight_key(prompt),
+        lambda publish: _stream_statement(prompt, publish, chunk_source),
+        on_chunk
+    )[0]
+
+def _stream_statement(
+    prompt: str,
+    on_chunk: Callable[[str], None],
+    chunk_source: Optional[Callable[[str], Iterator[str]]] = None
+) -> str:
+    chunks = (chunk_source or stream_completion)(prompt)
+    text = ""
+    try:
+        for chunk in chunks:
+            text += chunk
+            end = statement_end(_clean_sql(text))
+            if end is not None:
+                text = _clean_sql(text)[:end]
+                on_chunk(text)
+                break
+            on_chunk(text)
+    except requests.exceptions.HTTPError as e:
+        if text or (e.response is not None and e.response.status_code == 429):
+            raise Exception(f"API request failed: {str(e)}")
+        return _complete(prompt, _headers())
+    except requests.exceptions.RequestException as e:
+        raise Exception(f"API request failed: {str(e)}")
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()  # stops the provider generating the rest
+    return _clean_sql(text)
@@ -1,11 +1,38 @@
 """SQL error handling and formatting"""
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Union
 import sqlparse
 import re
 
 class SQLErrorHandler:
     """Handles SQL error formatting and suggestions"""
-    
+
+    # Exact SQLSTATE -> (error type, color)
+    SQLSTATE_TYPES = {
+        '42601': ('syntax', 'red'),
+        '42P01': ('missing_table', 'orange'),
+        '42703': ('missing_column', 'yellow'),
+        '42702': ('ambiguous', 'purple'),
+        '42P09': ('ambiguous', 'purple'),
+        '42804': ('data_type', 'blue'),
+        '42883': ('data_type', 'blue'),
+        '42803': ('grouping', 'purple'),
+        '42501': ('permission', 'orange'),
+        '40001': ('transient', 'gray'),
+        '40P01': ('transient', 'gray'),
+        '57014': ('timeout', 'orange'),
+        '57P01': ('connection', 'gray'),
+        '57P02': ('connection', 'gray'),
+        '57P03': ('connection', 'gray'),
+    }
+    # SQLSTATE class (first two characters) -> (error type, color)
+    SQLSTATE_CLASS_TYPES = {
+        '08': ('connection', 'gray'),
+        '22': ('data_type', 'blue'),
+        '23': ('constraint', 'orange'),
+        '42': ('syntax', 'red'),
+        '53': ('resources', 'gray'),
+    }
+
     ERROR_PATTERNS = {
         'syntax': (r'syntax error', 'red'),
         'missing_table': (r'table .* does not exist', 'orange'),
@@ -15,22 +42,47 @@ class SQLErrorHandler:
     }
 
     @staticmethod
-    def format_error(error_message: str) -> Tuple[str, str, str]:
+    def classify(error: Union[str, Exception]) -> Tuple[str, str]:
+        """
+        Classify an error by its SQLSTATE, falling back to message patterns
+        for errors that don't carry one
+        Returns: (error_type, color)
+        """
+        sqlstate = getattr(error, 'sqlstate', None)
+        if sqlstate:
+            found = (SQLErrorHandler.SQLSTATE_TYPES.get(sqlstate) or
+                     SQLErrorHandler.SQLSTATE_CLASS_TYPES.get(sqlstate[:2]))
+            if found:
+                return found
+
+        error_message = str(error).lower()
+        for err_type, (pattern, err_color) in SQLErrorHandler.ERROR_PATTERNS.items():
+            if re.search(pattern, error_message):
+                return err_type, err_color
+        return 'unknown', 'gray'
+
+    @staticmethod
+    def format_error(error: Union[str, Exception]) -> Tuple[str, str, str]:
         """
         Format error message with color coding and suggestions
         Returns: (formatted_message, color, suggestion)
         """
-        error_type = 'unknown'
-        color = 'gray'
+        error_type, color = SQLErrorHandler.classify(error)
+        error_message = str(error)
         suggestion = "No specific suggestion available"
+        if error_type != 'unknown':
+            suggestion = SQLErrorHandler._get_suggestion(error_type)
 
-        # Match error patterns
-        for err_type, (pattern, err_color) in SQLErrorHandler.ERROR_PATTERNS.items():
-            if re.search(pattern, error_message.lower()):
-                error_type = err_type
-                color = err_color
-                suggestion = SQLErrorHandler._get_suggestion(err_type)
-                break
+        sqlstate = getattr(error, 'sqlstate', None)
+        if sqlstate:
+            error_message = f"{error_message} (SQLSTATE {sqlstate})"
+        if getattr(error, 'position', None):
+            error_message += f" at character {error.position}"
+        if getattr(error, 'detail', None):
+            error_message += f"\nDetail: {error.detail}"
+        if getattr(error, 'hint', None):
+            # The server's own hint beats a generic one
+            suggestion = error.hint
 
         return error_message, color, suggestion
 
@@ -42,7 +94,14 @@ class SQLErrorHandler:
             'missing_table': "Verify table name and ensure it exists in the database",
             'missing_column': "Verify column name and check table schema",
             'ambiguous': "Specify table name for ambiguous column references",
-            'data_type': "Ensure data types match in comparisons and assignments"
+            'data_type': "Ensure data types match in comparisons and assignments",
+            'grouping': "Add non-aggregated columns to GROUP BY or wrap them in an aggregate",
+            'permission': "Check that your database user has access to these tables",
+            'constraint': "The data violates a table constraint; check keys and NOT NULL columns",
+            'transient': "The database was busy; the query was retried automatically, try again shortly",
+            'timeout': "The query took too long; add filters or a LIMIT",
+            'connection': "Could not reach the database; check the connection settings",
+            'resources': "The database is out of resources; try again later"
         }
         return suggestions.get(error_type, "Review the query syntax and schema")
 
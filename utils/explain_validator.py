@@ -0,0 +1,103 @@
+"""Validate SQL against the live database with EXPLAIN, caching the verdicts
+
+validate_sql_query only checks that a query parses. Here the database plans
+it (EXPLAIN without ANALYZE, in a read-only transaction that is rolled back,
+under a short statement timeout), which catches unknown tables and columns,
+type mismatches and the like before anyone runs the query. Verdicts are
+cached by the exact query text and schema version, so a query is planned
+again only after the schema changes. Not by shape: data errors (class 22)
+and the plan estimates depend on the literal values.
+"""
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from .database import Database, DatabaseError
+
+# Errors that say something about the query itself rather than the
+# connection or the server's load; only these verdicts are cached
+DEFINITIVE_SQLSTATE_CLASSES = ('42', '22', '0A', '2B', '44')
+
+
+class ExplainVerdict:
+    """Whether the database accepted a query's plan"""
+
+    def __init__(self,
+                 valid: Optional[bool],
+                 error: Optional[str] = None,
+                 sqlstate: Optional[str] = None,
+                 plan: Optional[Dict[str, Any]] = None):
+        # None: couldn't tell (timeout, database unreachable)
+        self.valid = valid
+        self.error = error
+        self.sqlstate = sqlstate
+        self.plan = plan
+        self.checked_at = time.time()
+        self.cached = False
+
+    @property
+    def estimated_cost(self) -> Optional[float]:
+        return self.plan.get("Total Cost") if self.plan else None
+
+    @property
+    def estimated_rows(self) -> Optional[int]:
+        return self.plan.get("Plan Rows") if self.plan else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"valid": self.valid, "error": self.error, "sqlstate": self.sqlstate,
+                "estimated_cost": self.estimated_cost, "estimated_rows": self.estimated_rows,
+                "cached": self.cached}
+
+
+class ExplainValidator:
+    """EXPLAINs queries on a database and remembers the verdicts"""
+
+    def __init__(self, schema_cache=None, timeout_ms: int = 2000, cache_size: int = 1000):
+        self.schema_cache = schema_cache
+        self.timeout_ms = timeout_ms
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str, str], ExplainVerdict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _schema_version(self, db: Database) -> str:
+        if self.schema_cache is None:
+            return ""
+        try:
+            return self.schema_cache.version(db)
+        except Exception:
+            return ""
+
+    def validate(self, query: str, db: Database) -> ExplainVerdict:
+        """Plan a (PostgreSQL) query on db, using a cached verdict when the schema is unchanged"""
+        text = query.strip().rstrip(';').strip()
+        key = (db.name, self._schema_version(db), hashlib.sha1(text.encode("utf-8")).hexdigest())
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+            self.stats["hits" if cached is not None else "misses"] += 1
+        if cached is not None:
+            verdict = ExplainVerdict(cached.valid, cached.error, cached.sqlstate, cached.plan)
+            verdict.checked_at = cached.checked_at
+            verdict.cached = True
+            return verdict
+
+        try:
+            verdict = ExplainVerdict(True, plan=db.explain_query(query, self.timeout_ms))
+        except DatabaseError as e:
+            definitive = bool(e.sqlstate) and e.sqlstate.startswith(DEFINITIVE_SQLSTATE_CLASSES)
+            verdict = ExplainVerdict(False if definitive else None, e.message, e.sqlstate)
+            if not definitive:
+                return verdict
+
+        with self._lock:
+            self._cache[key] = verdict
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return verdict
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,76 @@
+"""Run one query concurrently against several databases and compare the results"""
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from .database import Database
+
+MAX_FAN_OUT_WORKERS = 16
+
+
+class TargetResult:
+    """Outcome of a query on one fan-out target"""
+
+    def __init__(self, target: str):
+        self.target = target
+        self.rows: Optional[List[Dict[str, Any]]] = None
+        self.error: Optional[str] = None
+        self.sqlstate: Optional[str] = None
+        self.elapsed = 0.0
+
+    @property
+    def checksum(self) -> Optional[str]:
+        """Order-insensitive hash of the rows, for spotting targets that disagree"""
+        if self.rows is None:
+            return None
+        encoded = sorted(json.dumps(row, sort_keys=True, default=str) for row in self.rows)
+        return hashlib.sha1("\n".join(encoded).encode("utf-8")).hexdigest()
+
+
+def _run_on_target(target: str, db: Database, query: str) -> TargetResult:
+    result = TargetResult(target)
+    start = time.perf_counter()
+    try:
+        result.rows = [dict(row) for row in db.execute_query(query)]
+    except Exception as e:
+        result.error = str(e)
+        result.sqlstate = getattr(e, 'sqlstate', None)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def fan_out_query(query: str,
+                  targets: Dict[str, Database],
+                  max_workers: Optional[int] = None) -> List[TargetResult]:
+    """
+    Execute the same query on every target at once. Each target uses its own
+    connection pool; a failing target doesn't affect the others.
+    Returns: one TargetResult per target, in the order given
+    """
+    if not targets:
+        return []
+    workers = min(max_workers or MAX_FAN_OUT_WORKERS, len(targets))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sqlsage-fanout") as executor:
+        futures = [executor.submit(_run_on_target, name, db, query) for name, db in targets.items()]
+        return [future.result() for future in futures]
+
+
+def merge_results(results: List[TargetResult]) -> List[Dict[str, Any]]:
+    """Rows of every successful target, each tagged with a _target column"""
+    return [{"_target": result.target, **row}
+            for result in results if result.rows is not None
+            for row in result.rows]
+
+
+def compare_results(results: List[TargetResult]) -> List[Dict[str, Any]]:
+    """Per-target row count, timing and whether its rows match the first successful target"""
+    reference = next((r.checksum for r in results if r.rows is not None), None)
+    return [{
+        "target": result.target,
+        "status": "error" if result.error else "ok",
+        "rows": len(result.rows) if result.rows is not None else None,
+        "elapsed_ms": round(result.elapsed * 1000, 1),
+        "matches_first": None if result.rows is None else result.checksum == reference,
+        "error": result.error,
+    } for result in results]
@@ -0,0 +1,211 @@
+"""Concurrent orchestration of the Generate stages
+
+Stages that don't depend on each other run at the same time on a shared
+thread pool, so a request takes about as long as its slowest stage chain
+rather than the sum of all stages:
+
+    context     join path index                       ┐ the LLM call starts
+    generate    LLM call, streamed                    ┘ once the index is ready
+    validate, optimize                                  once the SQL is back
+    convert:<dialect>  every supported dialect          ┐ concurrently,
+    explain            EXPLAIN on the database          ┘ speculatively
+
+Progress is reported through on_stage(stage, value) as each stage finishes,
+plus a "stream" stage with the SQL received so far while the LLM is still
+answering. Callbacks always run on the thread that called run(), so they
+may safely update Streamlit elements.
+"""
+import time
+import queue
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+from .database import Database
+from .sql_dialects import SQLDialectConverter
+from .query_optimizer import QueryOptimizer
+from .sql_validator import validate_sql_query
+from .eden_ai_client import generate_sql_query, stream_sql_query
+from .join_paths import JoinPathIndex, get_join_path_index
+from .schema_validator import schema_hash
+from .explain_validator import ExplainValidator, ExplainVerdict
+
+# on_stage(stage, value)
+StageCallback = Callable[[str, Any], None]
+
+
+class GenerationResult:
+    """Everything the Generate stages produced for one question"""
+
+    def __init__(self, natural_query: str, dialect: str):
+        self.natural_query = natural_query
+        self.dialect = dialect
+        self.sql: Optional[str] = None
+        self.valid = False
+        self.optimized_query: Optional[str] = None
+        self.suggestions: List[str] = []
+        # Optimized query in every supported dialect
+        self.conversions: Dict[str, str] = {}
+        self.schema_fingerprint: Optional[str] = None
+        # None when the query wasn't EXPLAINed (no database, or it didn't answer in time)
+        self.explain: Optional[ExplainVerdict] = None
+        self.timings: Dict[str, float] = {}
+        self.time_to_first_chunk: Optional[float] = None
+        self.elapsed = 0.0
+
+    @property
+    def final_query(self) -> Optional[str]:
+        return self.conversions.get(self.dialect)
+
+    @property
+    def explain_ok(self) -> Optional[bool]:
+        return self.explain.valid if self.explain else None
+
+    @property
+    def serial_time(self) -> float:
+        """What the stages would have taken back to back"""
+        return sum(self.timings.values())
+
+
+class GenerationPipeline:
+    """Runs the Generate stages, overlapping the independent ones"""
+
+    def __init__(self,
+                 db: Optional[Database] = None,
+                 dialect_converter: Optional[SQLDialectConverter] = None,
+                 query_optimizer: Optional[QueryOptimizer] = None,
+                 generate: Callable[..., str] = generate_sql_query,
+                 stream: Optional[Callable[..., str]] = stream_sql_query,
+                 explain_validator: Optional[ExplainValidator] = None,
+                 max_workers: int = 8,
+                 explain_wait: float = 2.0):
+        self.db = db
+        self.dialect_converter = dialect_converter or SQLDialectConverter()
+        self.query_optimizer = query_optimizer or QueryOptimizer()
+        # Both are called with schema_fingerprint=... and join_index=..., so the
+        # schema is hashed and its join path index looked up only once
+        self.generate = generate
+        # stream(question, schema, on_chunk=...) is used when given (see stream_sql_query)
+        self.stream = stream
+        self.explain_validator = explain_validator or ExplainValidator()
+        # How long to wait for the EXPLAIN check before answering without it
+        self.explain_wait = explain_wait
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generate")
+
+    def _submit(self, result: GenerationResult, stage: str, func: Callable, *args):
+        def timed():
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                result.timings[stage] = time.perf_counter() - started
+        future = self._executor.submit(timed)
+        future.stage = stage
+        return future
+
+    @staticmethod
+    def _warm_context(schema: Dict[str, Any], fingerprint: str) -> JoinPathIndex:
+        return get_join_path_index(schema, fingerprint)  # the LLM prompt builds join hints from it
+
+    @staticmethod
+    def _future_value(future, wait: bool = False) -> Any:
+        """Result of a best-effort stage; None if it failed"""
+        try:
+            return future.result(timeout=None if wait else 0)
+        except Exception:
+            return None
+
+    def _explain(self, optimized_query: str) -> ExplainVerdict:
+        return self.explain_validator.validate(
+            self.dialect_converter.convert_query(optimized_query, 'postgresql'), self.db
+        )
+
+    def run(self,
+            natural_query: str,
+            schema: Optional[Dict[str, Any]] = None,
+            dialect: str = 'postgresql',
+            on_stage: Optional[StageCallback] = None,
+            schema_fingerprint: Optional[str] = None) -> GenerationResult:
+        """
+        Generate, validate, optimize and convert SQL for a question.
+        schema_fingerprint is the schema's schema_hash, if the caller has it
+        (e.g. from when it was uploaded); otherwise it is computed once here.
+        Raises: whatever the LLM call raises; the other stages never fail the request
+        """
+        started = time.perf_counter()
+        result = GenerationResult(natural_query, dialect)
+        report = on_stage or (lambda stage, value: None)
+
+        # Streamed chunks are handed over to the calling thread through a queue
+        chunks: "queue.Queue[str]" = queue.Queue()
+
+        def on_chunk(text: str) -> None:
+            if result.time_to_first_chunk is None:
+                result.time_to_first_chunk = time.perf_counter() - started
+            chunks.put(text)
+
+        fingerprint = (schema_fingerprint or schema_hash(schema)) if schema else None
+        # Submitted first, so a worker is already on it when the generate stage waits for it
+        context = self._submit(result, "context", self._warm_context, schema, fingerprint) if schema else None
+        if self.stream is not None:
+            call = functools.partial(self.stream, natural_query, schema, on_chunk)
+        else:
+            call = functools.partial(self.generate, natural_query, schema)
+
+        def generate():
+            join_index = self._future_value(context, wait=True) if context is not None else None
+            return call(schema_fingerprint=fingerprint, join_index=join_index)
+        generation = self._submit(result, "generate", generate)
+
+        while not generation.done() or not chunks.empty():
+            try:
+                report("stream", chunks.get(timeout=0.05))
+            except queue.Empty:
+                pass
+            if context is not None and context.done():
+                result.schema_fingerprint = fingerprint if self._future_value(context) else None
+                report("context", result.schema_fingerprint)
+                context = None
+        result.sql = generation.result()
+        report("generate", result.sql)
+        if context is not None:
+            result.schema_fingerprint = fingerprint if self._future_value(context, wait=True) else None
+            report("context", result.schema_fingerprint)
+
+        result.valid = bool(validate_sql_query(result.sql))
+        report("validate", result.valid)
+        if not result.valid:
+            result.elapsed = time.perf_counter() - started
+            return result
+
+        optimize_started = time.perf_counter()
+        result.optimized_query, result.suggestions = self.query_optimizer.optimize_query(
+            result.sql, schema, fingerprint
+        )
+        result.timings["optimize"] = time.perf_counter() - optimize_started
+        report("optimize", (result.optimized_query, result.suggestions))
+
+        # Convert to every dialect up front, so switching dialects later is instant
+        second_wave = [
+            self._submit(result, f"convert:{target}", self.dialect_converter.convert_query,
+                         result.optimized_query, target)
+            for target in SQLDialectConverter.SUPPORTED_DIALECTS
+        ]
+        explain = self._submit(result, "explain", self._explain, result.optimized_query) if self.db else None
+
+        for future in as_completed(second_wave):
+            try:
+                value = future.result()
+            except Exception:
+                value = None
+            if value is not None:
+                result.conversions[future.stage.split(":", 1)[1]] = value
+            report(future.stage, value)
+        if explain is not None:
+            try:
+                result.explain = explain.result(timeout=self.explain_wait)
+            except Exception:
+                pass  # failed, or the database is slow to answer; don't hold the query back for it
+            report("explain", result.explain)
+
+        result.elapsed = time.perf_counter() - started
+        return result
@@ -0,0 +1,210 @@
+"""Precomputed foreign-key join paths over a schema"""
+import re
+import threading
+from collections import OrderedDict, deque
+from itertools import combinations
+from typing import Dict, List, Optional, Any, Tuple
+from .schema_validator import schema_hash, schema_tables
+
+# Schemas with at most this many tables get all-pairs BFS trees up front
+# (EAGER_TABLE_LIMIT ** 2 parent entries); larger ones compute (and keep)
+# BFS trees per source table on first use
+EAGER_TABLE_LIMIT = 200
+# BFS trees kept for lazily indexed schemas
+LAZY_TREE_CACHE_SIZE = 256
+# Indexes kept in the process-wide cache, keyed by schema fingerprint
+INDEX_CACHE_SIZE = 8
+
+_index_cache: "OrderedDict[str, JoinPathIndex]" = OrderedDict()
+_index_lock = threading.Lock()
+
+
+class JoinPathIndex:
+    """Answers shortest FK join path and k-hop neighbourhood queries between tables"""
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.tables = list(schema_tables(schema).keys())
+        # table -> {neighbour: (local_column, neighbour_column)}
+        self.adjacency: Dict[str, Dict[str, Tuple[str, str]]] = {t: {} for t in self.tables}
+        self._build_adjacency(schema_tables(schema))
+
+        self.component: Dict[str, int] = {}
+        self._label_components()
+
+        # source -> BFS predecessor tree (parent map); shared by the API's worker threads
+        self._trees_lock = threading.Lock()
+        self._trees: "OrderedDict[str, Dict[str, Optional[str]]]" = OrderedDict()
+        self.eager = len(self.tables) <= EAGER_TABLE_LIMIT
+        if self.eager:
+            for table in self.tables:
+                self._trees[table] = self._bfs(table)
+
+    def _build_adjacency(self, tables: Dict[str, Any]) -> None:
+        """Undirected FK edges; the first FK seen between two tables wins"""
+        for table_name, table_info in tables.items():
+            for rel in (table_info or {}).get('relationships') or []:
+                target = rel.get('references_table') or rel.get('referenced_table')
+                if target not in self.adjacency or target == table_name:
+                    continue
+                column = rel.get('column', '')
+                target_column = rel.get('references_column') or rel.get('referenced_column', '')
+                self.adjacency[table_name].setdefault(target, (column, target_column))
+                self.adjacency[target].setdefault(table_name, (target_column, column))
+
+    def _label_components(self) -> None:
+        """Connected component id per table, so unreachable pairs answer in O(1)"""
+        label = 0
+        for start in self.tables:
+            if start in self.component:
+                continue
+            self.component[start] = label
+            queue = deque([start])
+            while queue:
+                current = queue.popleft()
+                for neighbour in self.adjacency[current]:
+                    if neighbour not in self.component:
+                        self.component[neighbour] = label
+                        queue.append(neighbour)
+            label += 1
+
+    def _bfs(self, source: str, max_hops: Optional[int] = None) -> Dict[str, Optional[str]]:
+        """Predecessor tree of the tables within max_hops of source (all reachable ones by default)"""
+        parents: Dict[str, Optional[str]] = {source: None}
+        frontier = [source]
+        hops = 0
+        while frontier and (max_hops is None or hops < max_hops):
+            next_frontier = []
+            for current in frontier:
+                for neighbour in self.adjacency[current]:
+                    if neighbour not in parents:
+                        parents[neighbour] = current
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+            hops += 1
+        return parents
+
+    def _tree(self, source: str) -> Dict[str, Optional[str]]:
+        with self._trees_lock:
+            tree = self._trees.get(source)
+            if tree is not None:
+                if not self.eager:
+                    self._trees.move_to_end(source)
+                return tree
+        tree = self._bfs(source)
+        with self._trees_lock:
+            self._trees[source] = tree
+            if len(self._trees) > LAZY_TREE_CACHE_SIZE:
+                self._trees.popitem(last=False)
+        return tree
+
+    def shortest_path(self, source: str, target: str) -> Optional[List[Dict[str, str]]]:
+        """
+        Shortest FK join path from source to target.
+        Returns a list of join steps (empty when source == target), or None when
+        either table is unknown or no FK path connects them.
+        """
+        if source not in self.component or target not in self.component:
+            return None
+        if self.component[source] != self.component[target]:
+            return None
+
+        # Paths are undirected, so reuse the target's BFS tree when only it is cached
+        if source not in self._trees and target in self._trees:
+            reverse = self.shortest_path(target, source)
+            return [{
+                "from_table": s["to_table"],
+                "from_column": s["to_column"],
+                "to_table": s["from_table"],
+                "to_column": s["from_column"],
+            } for s in reversed(reverse)]
+
+        parents = self._tree(source)
+        steps = []
+        current = target
+        while parents[current] is not None:
+            previous = parents[current]
+            from_column, to_column = self.adjacency[previous][current]
+            steps.append({
+                "from_table": previous,
+                "from_column": from_column,
+                "to_table": current,
+                "to_column": to_column,
+            })
+            current = previous
+        steps.reverse()
+        return steps
+
+    def distance(self, source: str, target: str) -> Optional[int]:
+        """Number of joins between two tables, or None if unreachable"""
+        if source not in self.component or target not in self.component:
+            return None
+        if self.component[source] != self.component[target]:
+            return None
+        parents = self._tree(source)
+        joins = 0
+        while parents[target] is not None:
+            target = parents[target]
+            joins += 1
+        return joins
+
+    def tables_within(self, source: str, hops: int) -> List[str]:
+        """Tables reachable from source in at most `hops` joins (excluding source)"""
+        if source not in self.component:
+            return []
+        return [t for t in self._bfs(source, hops) if t != source]
+
+    def join_clause(self, source: str, target: str) -> Optional[str]:
+        """Render the shortest path as SQL JOIN clauses starting from source"""
+        steps = self.shortest_path(source, target)
+        if not steps:
+            return None
+        return "\n".join(
+            f"JOIN {s['to_table']} ON {s['from_table']}.{s['from_column']} = "
+            f"{s['to_table']}.{s['to_column']}"
+            for s in steps
+        )
+
+    def mentioned_tables(self, text: str) -> List[str]:
+        """Tables whose names (or simple singular forms) appear in free text"""
+        words = set(re.findall(r"[a-z_][a-z0-9_]*", text.lower()))
+        found = []
+        for table in self.tables:
+            name = table.lower()
+            if name in words or name.rstrip('s') in words or f"{name}s" in words:
+                found.append(table)
+        return found
+
+    def join_hints(self, tables: List[str]) -> List[str]:
+        """Human readable join paths between every pair of the given tables"""
+        hints = []
+        for source, target in combinations(tables, 2):
+            steps = self.shortest_path(source, target)
+            if steps:
+                hints.append(", ".join(
+                    f"{s['from_table']}.{s['from_column']} = {s['to_table']}.{s['to_column']}"
+                    for s in steps
+                ))
+        return hints
+
+
+def get_join_path_index(schema: Dict[str, Any],
+                        fingerprint: Optional[str] = None) -> JoinPathIndex:
+    """
+    Get the join path index for a schema, building it once per fingerprint.
+    Pass a precomputed fingerprint to skip hashing the schema on hot paths.
+    """
+    fingerprint = fingerprint or schema_hash(schema)
+    with _index_lock:
+        index = _index_cache.get(fingerprint)
+        if index is not None:
+            _index_cache.move_to_end(fingerprint)
+            return index
+
+    index = JoinPathIndex(schema)
+    with _index_lock:
+        # Another thread may have built it meanwhile; keep a single copy
+        index = _index_cache.setdefault(fingerprint, index)
+        _index_cache.move_to_end(fingerprint)
+        if len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
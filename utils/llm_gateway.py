@@ -0,0 +1,145 @@
+"""Process-wide controls for LLM provider calls
+
+SingleFlight coalesces concurrent identical requests (several sessions
+asking the same question, a double-clicked Generate) into one provider call
+whose result every caller shares. TokenBucket spaces the calls that do go
+out, so a burst of sessions queues briefly instead of earning a storm of
+429s; its queue depth is exposed as a metric.
+"""
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class TokenBucket:
+    """Blocking token-bucket rate limiter"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self.stats = {"acquired": 0, "waited": 0, "wait_time": 0.0, "timeouts": 0,
+                      "queue_depth": 0, "max_queue_depth": 0}
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take a token, waiting up to timeout seconds; False if none became available"""
+        started = time.monotonic()
+        deadline = started + timeout if timeout is not None else None
+        waited = False
+        with self._cond:
+            self.stats["queue_depth"] += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.stats["queue_depth"])
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._tokens >= 1 and now >= self._paused_until:
+                        self._tokens -= 1
+                        self.stats["acquired"] += 1
+                        if waited:
+                            self.stats["waited"] += 1
+                            self.stats["wait_time"] += now - started
+                        return True
+                    wait = max((1 - self._tokens) / self.rate, self._paused_until - now)
+                    if deadline is not None:
+                        if now >= deadline:
+                            self.stats["timeouts"] += 1
+                            return False
+                        wait = min(wait, deadline - now)
+                    waited = True
+                    self._cond.wait(wait)
+            finally:
+                self.stats["queue_depth"] -= 1
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller back for a while, e.g. after a 429 with Retry-After"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {**self.stats, "tokens": round(self._tokens, 2)}
+
+
+class _Call:
+    """One in-flight call and everyone waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.listeners: List[Callable[[str], None]] = []
+        self.last_chunk: Optional[str] = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share its outcome"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0, "in_flight": 0}
+
+    def run(self,
+            key: str,
+            func: Callable[[Callable[[str], None]], Any],
+            on_chunk: Optional[Callable[[str], None]] = None) -> Tuple[Any, bool]:
+        """
+        Call func(publish) unless a call for key is already running, in which
+        case wait for that one. Chunks the leader publishes (the text so far)
+        reach every caller's on_chunk, late joiners starting from the latest.
+        Returns: (result, shared) where shared is True for callers that joined
+        Raises: whatever func raised, in every caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["calls"] += 1
+                self.stats["in_flight"] += 1
+            else:
+                self.stats["coalesced"] += 1
+            if on_chunk:
+                call.listeners.append(on_chunk)
+            last_chunk = call.last_chunk
+
+        if not leader:
+            if on_chunk and last_chunk is not None:
+                on_chunk(last_chunk)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        def publish(chunk: str) -> None:
+            with self._lock:
+                call.last_chunk = chunk
+                listeners = list(call.listeners)
+            for listener in listeners:
+                listener(chunk)
+
+        try:
+            call.result = func(publish)
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self.stats["in_flight"] -= 1
+            call.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats)
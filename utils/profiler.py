@@ -0,0 +1,187 @@
+"""Opt-in request profiling with cProfile and tracemalloc
+
+Every Streamlit session has its own RequestProfiler, but they all run in one
+process: only one request is profiled at a time (Python allows a single active
+cProfile profiler), tracemalloc runs while any capture needs it, and the
+shared output directory keeps only the newest captures.
+"""
+import os
+import glob
+import cProfile
+import pstats
+import itertools
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+PROFILE_ENV_VAR = "SQLSAGE_PROFILE"
+PROFILE_MEMORY_ENV_VAR = "SQLSAGE_PROFILE_MEMORY"
+
+# Held while a request is being profiled, by whichever session profiles it
+_profile_lock = threading.Lock()
+# Captures that need tracemalloc; it is stopped when the last one finishes
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False
+_files_lock = threading.Lock()
+# Unique capture ids, e.g. for widget keys
+_capture_ids = itertools.count(1)
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _acquire_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_started = True
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc() -> None:
+    """Stop tracemalloc after its last user, unless something else started it"""
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+
+
+class RequestProfiler:
+    """Captures cProfile (and optionally tracemalloc) data for a single request"""
+
+    def __init__(self,
+                 output_dir: str = "profiles",
+                 enabled: Optional[bool] = None,
+                 trace_memory: Optional[bool] = None,
+                 top_n: int = 15,
+                 max_captures: int = 20,
+                 max_files: int = 100):
+        self.output_dir = output_dir
+        self.enabled = _env_flag(PROFILE_ENV_VAR) if enabled is None else enabled
+        self.trace_memory = (_env_flag(PROFILE_MEMORY_ENV_VAR)
+                             if trace_memory is None else trace_memory)
+        self.top_n = top_n
+        # Captures kept for this session, and capture files kept in output_dir
+        self.captures: "deque[Dict[str, Any]]" = deque(maxlen=max_captures)
+        self.max_files = max_files
+
+    @contextmanager
+    def capture(self, label: str):
+        """
+        Profile the wrapped block when profiling is enabled.
+        Yields the capture record (or None when disabled); it is filled in on exit.
+        While another request is being profiled the block runs unprofiled and
+        the record only carries a "skipped" reason.
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        record: Dict[str, Any] = {
+            "id": next(_capture_ids),
+            "label": label,
+            "timestamp": datetime.now().isoformat(),
+        }
+        if not _profile_lock.acquire(blocking=False):
+            record["skipped"] = "another request was being profiled"
+            yield record
+            return
+
+        try:
+            profiler = cProfile.Profile()
+            trace_memory = self.trace_memory
+            if trace_memory:
+                _acquire_tracemalloc()
+            try:
+                profiler.enable()
+                try:
+                    yield record
+                finally:
+                    profiler.disable()
+                snapshot = tracemalloc.take_snapshot() if trace_memory else None
+            finally:
+                if trace_memory:
+                    _release_tracemalloc()
+            self._save(record, profiler, snapshot)
+            self.captures.append(record)
+        finally:
+            _profile_lock.release()
+
+    def _save(self,
+              record: Dict[str, Any],
+              profiler: cProfile.Profile,
+              snapshot: Optional[tracemalloc.Snapshot]) -> None:
+        """Write capture artifacts to disk and summarise the hotspots"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        stem = "{}_{}".format(
+            record["label"].lower().replace(" ", "_"),
+            datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        )
+
+        prof_path = os.path.join(self.output_dir, f"{stem}.prof")
+        profiler.dump_stats(prof_path)
+        record["prof_file"] = prof_path
+
+        stats = pstats.Stats(profiler)
+        record["total_time"] = stats.total_tt
+        record["hotspots"] = self._summarise_stats(stats)
+
+        if snapshot is not None:
+            snapshot_path = os.path.join(self.output_dir, f"{stem}.tracemalloc")
+            snapshot.dump(snapshot_path)
+            record["snapshot_file"] = snapshot_path
+            record["memory_hotspots"] = self._summarise_snapshot(snapshot)
+        self._prune_files()
+
+    def _prune_files(self) -> None:
+        """Delete all but the newest max_files captures in output_dir"""
+        with _files_lock:
+            stems: Dict[str, float] = {}
+            for path in glob.glob(os.path.join(self.output_dir, "*.prof")):
+                try:
+                    stems[path[:-len(".prof")]] = os.path.getmtime(path)
+                except OSError:
+                    continue
+            for stem in sorted(stems, key=stems.get, reverse=True)[self.max_files:]:
+                for path in (f"{stem}.prof", f"{stem}.tracemalloc"):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+    def _summarise_stats(self, stats: pstats.Stats) -> List[Dict[str, Any]]:
+        """Top-N functions by cumulative time"""
+        rows = []
+        for func, (cc, nc, tt, ct, _callers) in stats.stats.items():
+            filename, line, name = func
+            rows.append({
+                "function": f"{name} ({os.path.basename(filename)}:{line})",
+                "calls": nc,
+                "total_time": tt,
+                "cumulative_time": ct,
+            })
+        rows.sort(key=lambda r: r["cumulative_time"], reverse=True)
+        return rows[:self.top_n]
+
+    def _summarise_snapshot(self, snapshot: tracemalloc.Snapshot) -> List[Dict[str, Any]]:
+        """Top-N allocation sites by size"""
+        return [
+            {
+                "location": str(stat.traceback[0]),
+                "size_kb": stat.size / 1024,
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics("lineno")[:self.top_n]
+        ]
+
+    def get_recent_captures(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get the most recent captures, newest first"""
+        return list(reversed(self.captures))[:limit]
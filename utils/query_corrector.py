@@ -0,0 +1,299 @@
+"""Token-based SQL query correction with a learned correction cache"""
+import os
+import re
+import json
+import difflib
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from sqlparse import lexer
+from sqlparse import tokens as T
+from .schema_validator import schema_tables
+from .rotating_log import RotatingLog
+
+KEYWORDS = [
+    "SELECT", "FROM", "WHERE", "GROUP", "ORDER", "BY", "HAVING", "LIMIT",
+    "OFFSET", "JOIN", "INNER", "LEFT", "RIGHT", "OUTER", "FULL", "CROSS", "ON",
+    "AND", "OR", "NOT", "NULL", "IN", "IS", "LIKE", "BETWEEN", "DISTINCT",
+    "UNION", "INSERT", "INTO", "VALUES", "UPDATE", "SET", "DELETE", "AS",
+    "CASE", "WHEN", "THEN", "ELSE", "END", "EXISTS", "ASC", "DESC",
+]
+# Keywords that begin a clause and are often glued to the next identifier
+_CLAUSE_KEYWORDS = ["SELECT", "FROM", "WHERE", "JOIN"]
+
+Token = List  # [ttype, value]
+
+
+def error_fingerprint(query: str, error_message: str = "") -> str:
+    """
+    Fingerprint of a failing query: whitespace and case normalised query text plus
+    the error message with positions and numbers stripped
+    """
+    normalised_query = " ".join(query.split()).lower()
+    normalised_error = re.sub(r"\d+", "#", " ".join(error_message.split()).lower())
+    return hashlib.sha1(f"{normalised_query}\n{normalised_error}".encode("utf-8")).hexdigest()
+
+
+def _is_name(token: Token) -> bool:
+    return token[0] in T.Name
+
+
+def _is_space(token: Token) -> bool:
+    return token[0] in T.Whitespace or token[0] in T.Newline
+
+
+class QueryCorrector:
+    """Repairs common SQL mistakes and remembers fixes that worked"""
+
+    def __init__(self,
+                 log_file: Optional[str] = "query_corrections.jsonl",
+                 max_log_entries: int = 500,
+                 max_log_archives: int = 20,
+                 cache_size: int = 1000,
+                 legacy_log_file: Optional[str] = "query_corrections.json"):
+        self.log_file = log_file
+        self.max_log_entries = max_log_entries
+        self.max_log_archives = max_log_archives
+        self.legacy_log_file = legacy_log_file
+        self.cache_size = cache_size
+        # No log file: corrections are only cached in memory (e.g. for benchmarks)
+        self.log = (RotatingLog(log_file, max_records=max_log_entries, max_archives=max_log_archives)
+                    if log_file else None)
+        self._cache: "OrderedDict[str, Tuple[str, List[str]]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.load_corrections()
+
+    # ------------------------------------------------------------------ cache
+
+    def lookup(self, fingerprint: str) -> Optional[Tuple[str, List[str]]]:
+        """Known fix for a failure fingerprint, if any"""
+        with self._lock:
+            cached = self._cache.get(fingerprint)
+            if cached is not None:
+                self._cache.move_to_end(fingerprint)
+            return cached
+
+    def learn(self, fingerprint: str, corrected_query: str, messages: List[str]) -> None:
+        """Remember a fix that worked so the same failure is corrected instantly"""
+        with self._lock:
+            self._cache[fingerprint] = (corrected_query, messages)
+            self._cache.move_to_end(fingerprint)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # ------------------------------------------------------------- correction
+
+    def correct(self,
+                query: str,
+                error_message: str = "",
+                schema: Optional[Dict] = None) -> Tuple[str, List[str]]:
+        """
+        Correct a failing query
+        Returns: (corrected_query, list of correction messages)
+        """
+        cached = self.lookup(error_fingerprint(query, error_message))
+        if cached is not None:
+            return cached[0], cached[1] + ["(reused a previously successful correction)"]
+
+        tables, columns = self._schema_identifiers(schema)
+        tokens = [[ttype, value] for ttype, value in lexer.tokenize(query)]
+        messages: List[str] = []
+
+        messages += self._split_glued_keywords(tokens, tables | columns)
+        messages += self._fix_keyword_typos(tokens, tables | columns)
+        messages += self._fix_identifiers(tokens, tables, columns)
+        messages += self._add_missing_commas(tokens, columns)
+        messages += self._fix_quotes(tokens, tables | columns)
+        messages += self._add_semicolon(tokens)
+
+        return "".join(value for _, value in tokens), messages
+
+    @staticmethod
+    def _schema_identifiers(schema: Optional[Dict]) -> Tuple[Set[str], Set[str]]:
+        if not schema:
+            return set(), set()
+        tables = schema_tables(schema)
+        columns = set()
+        for table_info in tables.values():
+            columns.update((table_info or {}).get('columns', {}).keys())
+        return set(tables.keys()), columns
+
+    @staticmethod
+    def _significant(tokens: List[Token]) -> List[int]:
+        return [i for i, token in enumerate(tokens) if not _is_space(token)]
+
+    def _split_glued_keywords(self, tokens: List[Token], identifiers: Set[str]) -> List[str]:
+        """SELECTproduct_id -> SELECT product_id"""
+        messages = []
+        for token in tokens:
+            if not _is_name(token):
+                continue
+            for keyword in _CLAUSE_KEYWORDS:
+                rest = token[1][len(keyword):]
+                if (token[1].upper().startswith(keyword) and rest
+                        and (rest in identifiers or not identifiers and token[1][:len(keyword)].isupper())):
+                    messages.append(f"Added missing space after {keyword}")
+                    token[1] = f"{token[1][:len(keyword)]} {rest}"
+                    break
+        return messages
+
+    def _fix_keyword_typos(self, tokens: List[Token], identifiers: Set[str]) -> List[str]:
+        """FORM -> FROM, SELEC -> SELECT (only for names that aren't schema identifiers)"""
+        messages = []
+        lowered = {i.lower() for i in identifiers}
+        for token in tokens:
+            if (not _is_name(token) or len(token[1]) < 4 or token[1].lower() in lowered
+                    or not token[1].isalpha()):
+                continue
+            word = token[1].upper()
+            match = difflib.get_close_matches(word, KEYWORDS, n=1, cutoff=0.75)
+            # A keyword prefix ("orders", "selected") is a real name, not a typo
+            if (match and match[0] != word and not word.startswith(match[0])
+                    and abs(len(word) - len(match[0])) <= 1):
+                replacement = match[0] if token[1].isupper() else match[0].lower()
+                messages.append(f"Corrected keyword '{token[1]}' to '{replacement}'")
+                token[0], token[1] = T.Keyword, replacement
+        return messages
+
+    def _aliases(self, tokens: List[Token], tables: Set[str]) -> Set[str]:
+        """Names introduced as table or column aliases"""
+        aliases = set()
+        significant = self._significant(tokens)
+        for position, index in enumerate(significant):
+            if position == 0 or not _is_name(tokens[index]):
+                continue
+            previous = tokens[significant[position - 1]]
+            if previous[0] in T.Keyword and previous[1].upper() == "AS":
+                aliases.add(tokens[index][1])
+            elif _is_name(previous) and previous[1] in tables:
+                aliases.add(tokens[index][1])
+        return aliases
+
+    def _fix_identifiers(self, tokens: List[Token], tables: Set[str], columns: Set[str]) -> List[str]:
+        """Repair misspelt table and column names against the schema"""
+        if not tables:
+            return []
+        messages = []
+        # Tables first so that alias detection sees the corrected table names
+        for candidates, is_table in ((tables, True), (columns, False)):
+            aliases = self._aliases(tokens, tables)
+            significant = self._significant(tokens)
+            for position, index in enumerate(significant):
+                token = tokens[index]
+                if not _is_name(token) or token[1] in tables or token[1] in columns or token[1] in aliases:
+                    continue
+                previous = tokens[significant[position - 1]] if position else None
+                follows_table_keyword = (previous is not None and previous[0] in T.Keyword
+                                         and previous[1].upper() in ("FROM", "JOIN", "UPDATE", "INTO"))
+                if follows_table_keyword != is_table:
+                    continue
+                match = difflib.get_close_matches(token[1], list(candidates), n=1, cutoff=0.8)
+                if match:
+                    kind = "table" if is_table else "column"
+                    messages.append(f"Replaced unknown {kind} '{token[1]}' with '{match[0]}'")
+                    token[1] = match[0]
+        return messages
+
+    def _add_missing_commas(self, tokens: List[Token], columns: Set[str]) -> List[str]:
+        """SELECT a b c FROM -> SELECT a, b, c FROM"""
+        significant = self._significant(tokens)
+        in_select = False
+        run: List[int] = []
+        runs: List[List[int]] = []
+        for index in significant:
+            ttype, value = tokens[index]
+            if ttype in T.Keyword.DML and value.upper() == "SELECT":
+                in_select, run = True, []
+                continue
+            if not in_select:
+                continue
+            if _is_name(tokens[index]) or (ttype in T.Keyword and value in columns):
+                run.append(index)
+                continue
+            if run:
+                runs.append(run)
+            run = []
+            if ttype in T.Keyword and value.upper() == "FROM":
+                in_select = False
+
+        inserted = False
+        for run in runs:
+            for first, second in zip(run, run[1:]):
+                # Two names in a row may be "column alias"; three or more, or a
+                # known column in second place, means a comma is missing
+                if len(run) >= 3 or tokens[second][1] in columns:
+                    between = range(first + 1, second)
+                    if all(_is_space(tokens[i]) for i in between):
+                        tokens[first][1] += ","
+                        inserted = True
+        return ["Added missing commas in SELECT clause"] if inserted else []
+
+    def _fix_quotes(self, tokens: List[Token], identifiers: Set[str]) -> List[str]:
+        messages = []
+        significant = self._significant(tokens)
+        for position, index in enumerate(significant):
+            ttype, value = tokens[index]
+            # "value" after a comparison is a string literal, not an identifier
+            if (ttype in T.Literal.String.Symbol and position > 0
+                    and tokens[significant[position - 1]][0] in T.Operator.Comparison
+                    and value.strip('"') not in identifiers):
+                tokens[index] = [T.String.Single, "'" + value.strip('"').replace("'", "''") + "'"]
+                messages.append(f"Replaced double quotes with single quotes around {value}")
+
+        if any(ttype in T.Error and value == "'" for ttype, value in tokens):
+            # Close the unterminated literal before any trailing semicolon/whitespace
+            last = max(i for i in significant if not (tokens[i][0] in T.Punctuation and tokens[i][1] == ";"))
+            tokens[last][1] += "'"
+            messages.append("Closed unterminated string literal")
+        return messages
+
+    def _add_semicolon(self, tokens: List[Token]) -> List[str]:
+        # Goes after the last piece of code, never after a trailing -- comment
+        code = [i for i in self._significant(tokens) if tokens[i][0] not in T.Comment]
+        if code and tokens[code[-1]][1] != ";":
+            tokens.insert(code[-1] + 1, [T.Punctuation, ";"])
+            return ["Added missing semicolon"]
+        return []
+
+    # -------------------------------------------------------------------- log
+
+    def record_correction(self,
+                          original_query: str,
+                          corrected_query: str,
+                          correction_message: str,
+                          fingerprint: Optional[str] = None) -> None:
+        """Append to the correction log (see utils.rotating_log for retention)"""
+        if self.log is None:
+            return
+        self.log.append({
+            "timestamp": datetime.now().isoformat(),
+            "original_query": original_query,
+            "corrected_query": corrected_query,
+            "correction_message": correction_message,
+            "fingerprint": fingerprint,
+        })
+
+    def get_recent_corrections(self, limit: int = 50) -> List[Dict]:
+        """Most recent corrections, newest first"""
+        return self.log.recent(limit) if self.log else []
+
+    def get_corrections_page(self, page: int = 1, page_size: int = 20) -> Tuple[List[Dict], int]:
+        """One page of the correction log, newest first, and the total number of corrections"""
+        return self.log.read_page(page, page_size) if self.log else ([], 0)
+
+    def load_corrections(self) -> None:
+        """Warm the cache from the log's active segment, importing a legacy JSON log once"""
+        if self.log is None:
+            return
+        if self.legacy_log_file and os.path.exists(self.legacy_log_file) and not os.path.exists(self.log_file):
+            try:
+                with open(self.legacy_log_file, 'r') as f:
+                    self.log.extend(json.load(f))
+            except (OSError, json.JSONDecodeError):
+                pass
+        for entry in self.log.records:
+            if entry.get("fingerprint"):
+                self.learn(entry["fingerprint"], entry["corrected_query"],
+                           entry["correction_message"].split("; "))
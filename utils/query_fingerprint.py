@@ -0,0 +1,141 @@
+"""Query fingerprinting and normalisation
+
+Two queries that differ only in literal values, whitespace, comments, keyword
+case or the length of an IN list have the same shape. normalize() produces a
+canonical text for that shape (literals become ?), and fingerprint() a short
+stable hash of it, much like pg_stat_statements' queryid. Everything that
+groups or caches queries (history, metrics, prepared statements) should key
+on these rather than on the raw SQL text.
+"""
+import re
+import hashlib
+from functools import lru_cache
+from typing import List, Tuple
+from sqlparse import lexer
+from sqlparse import tokens as T
+
+PLACEHOLDER = "?"
+_CACHE_SIZE = 4096
+_IN_LIST = re.compile(r"\bIN \(\?(?:, \?)+\)")
+# Keywords that may be followed by "(" without being a function call
+_CLAUSE_KEYWORDS = {
+    "IN", "VALUES", "EXISTS", "AS", "ON", "USING", "OVER", "FROM", "JOIN", "WHERE",
+    "AND", "OR", "NOT", "ANY", "ALL", "SOME", "SELECT", "INTO", "LATERAL", "WITH",
+    "UNION", "INTERSECT", "EXCEPT", "BY", "HAVING", "THEN", "ELSE", "WHEN", "RETURNING",
+}
+
+
+def _is_literal(ttype) -> bool:
+    return (ttype in T.String.Single or ttype in T.Number
+            or ttype is T.Literal)  # dollar-quoted strings
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def normalize(query: str) -> str:
+    """
+    Canonical form of a query: comments dropped, keywords upper-cased,
+    unquoted identifiers and function names lower-cased, literals replaced
+    by ?, IN lists collapsed and whitespace made uniform
+    """
+    tokens = [(ttype, value) for ttype, value in lexer.tokenize(query)
+              if not (ttype in T.Whitespace or ttype in T.Newline or ttype in T.Comment)]
+    parts: List[str] = []
+    previous_value, previous_is_call = "", False
+    for index, (ttype, value) in enumerate(tokens):
+        next_value = tokens[index + 1][1] if index + 1 < len(tokens) else ""
+        is_word = ttype in T.Keyword or ttype in T.Name
+        # "count(" lexes as a name but "COUNT (" as a keyword; both are calls
+        is_call = (is_word and next_value == "(" and ttype not in T.Name.Placeholder
+                   and value.upper() not in _CLAUSE_KEYWORDS)
+        if _is_literal(ttype):
+            value = PLACEHOLDER
+        elif is_call or (ttype in T.Name and ttype not in T.Name.Builtin):
+            value = value.lower()
+        elif is_word or ttype in T.Operator.Comparison:
+            value = value.upper()
+
+        glue = (not parts
+                or previous_value in ("(", ".")
+                or value in (")", ",", ".", ";")
+                or (value == "(" and previous_is_call))
+        parts.append(value if glue else " " + value)
+        previous_value, previous_is_call = value, is_call
+
+    normalised = "".join(parts).rstrip(";").strip()
+    return _IN_LIST.sub("IN (...)", normalised)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def fingerprint(query: str) -> str:
+    """Stable 16 hex digit id of a query's shape"""
+    return hashlib.sha1(normalize(query).encode("utf-8")).hexdigest()[:16]
+
+
+def _is_plain_string(value: str) -> bool:
+    """A standard '...' literal whose only escape is a doubled quote"""
+    return (len(value) >= 2 and value[0] == value[-1] == "'" and "\\" not in value
+            and "'" not in value[1:-1].replace("''", ""))
+
+
+def _literal_cast(ttype, value: str) -> str:
+    """Cast giving a bound number its literal's own type; strings stay untyped, like the literal"""
+    if ttype in T.Number.Integer:
+        number = int(value)
+        if -2 ** 31 <= number < 2 ** 31:
+            return "::integer"
+        if -2 ** 63 <= number < 2 ** 63:
+            return "::bigint"
+        return "::numeric"
+    if ttype in T.Number.Float:
+        return "::numeric"
+    return ""
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def parameterize(query: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Replace the literals of a query that are safe to bind ($1, $2, ...) and
+    return them as text: values compared against, IN lists, BETWEEN bounds,
+    LIMIT and OFFSET. Literals elsewhere (select list, ORDER BY positions,
+    typed literals such as DATE '...') change meaning as parameters, so they
+    stay in the statement text, as do strings other than a plain '...'
+    (E'...', $$...$$, anything with a backslash) whose value isn't just the
+    quoted text. Numbers are cast to the type PostgreSQL gives
+    the literal ($1::numeric for 10.5), so the planner doesn't infer integer
+    from the other side of the comparison. Used for server-side prepared
+    statements.
+    Returns: (statement, parameter values)
+    """
+    parts: List[str] = []
+    values: List[str] = []
+    previous_type, previous_value = None, ""
+    paren_is_in_list: List[bool] = []
+    in_between = False
+    for ttype, value in lexer.tokenize(query.strip().rstrip(';')):
+        if ttype in T.Whitespace or ttype in T.Newline or ttype in T.Comment:
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+            continue
+
+        is_literal = ((ttype in T.String.Single and _is_plain_string(value))
+                      or ttype in T.Number.Integer or ttype in T.Number.Float)
+        keyword = previous_value.upper() if previous_type in T.Keyword else ""
+        bindable = is_literal and (
+            previous_type in T.Operator.Comparison
+            or keyword in ("LIMIT", "OFFSET", "BETWEEN")
+            or (keyword == "AND" and in_between)
+            or (previous_value in ("(", ",") and paren_is_in_list and paren_is_in_list[-1])
+        )
+        if bindable:
+            values.append(value[1:-1].replace("''", "'") if ttype in T.String.Single else value)
+            parts.append(f"${len(values)}{_literal_cast(ttype, value)}")
+            in_between = keyword == "BETWEEN"
+        else:
+            parts.append(value)
+
+        if value == "(":
+            paren_is_in_list.append(keyword == "IN")
+        elif value == ")" and paren_is_in_list:
+            paren_is_in_list.pop()
+        previous_type, previous_value = ttype, value
+    return "".join(parts).strip(), tuple(values)
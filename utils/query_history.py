@@ -1,14 +1,19 @@
 """Query history management"""
 import json
+import threading
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from .query_fingerprint import fingerprint
 
 class QueryHistory:
-    """Manages SQL query history and favorites"""
+    """Manages SQL query history and favorites (safe to share between sessions)"""
     
     def __init__(self, storage_file: str = "query_history.json"):
         self.storage_file = storage_file
         self.history: List[Dict] = []
+        # (fingerprint, dialect) -> record, so re-running a query shape updates one entry
+        self._by_shape: Dict[Tuple[str, str], Dict] = {}
+        self._lock = threading.RLock()
         self.load_history()
 
     def add_query(self, 
@@ -16,23 +21,47 @@ class QueryHistory:
                  sql_query: str, 
                  dialect: str = "mysql",
                  tags: List[str] = None) -> None:
-        """Add a query to history"""
-        query_record = {
-            "timestamp": datetime.now().isoformat(),
-            "natural_query": natural_query,
-            "sql_query": sql_query,
-            "dialect": dialect,
-            "tags": tags or [],
-            "favorite": False
-        }
-        self.history.append(query_record)
-        self.save_history()
+        """
+        Add a query to history. A query with the same shape (see
+        query_fingerprint) and dialect as an earlier one keeps that entry's
+        original text, bumps its run count and last-used time, and records a
+        differently worded question alongside the first.
+        """
+        query_fingerprint = fingerprint(sql_query)
+        now = datetime.now().isoformat()
+        with self._lock:
+            existing = self._by_shape.get((query_fingerprint, dialect))
+            if existing is not None:
+                questions = existing.setdefault("natural_queries", [existing["natural_query"]])
+                if natural_query not in questions:
+                    questions.append(natural_query)
+                existing.update({
+                    "last_used": now,
+                    "tags": sorted(set(existing.get("tags", [])) | set(tags or [])),
+                    "run_count": existing.get("run_count", 1) + 1
+                })
+            else:
+                query_record = {
+                    "timestamp": now,
+                    "last_used": now,
+                    "natural_query": natural_query,
+                    "natural_queries": [natural_query],
+                    "sql_query": sql_query,
+                    "dialect": dialect,
+                    "tags": tags or [],
+                    "favorite": False,
+                    "fingerprint": query_fingerprint,
+                    "run_count": 1
+                }
+                self.history.append(query_record)
+                self._by_shape[(query_fingerprint, dialect)] = query_record
+            self.save_history()
 
     def get_recent_queries(self, limit: int = 10) -> List[Dict]:
-        """Get recent queries"""
+        """Get the most recently used queries"""
         return sorted(
             self.history,
-            key=lambda x: x["timestamp"],
+            key=lambda x: x.get("last_used", x["timestamp"]),
             reverse=True
         )[:limit]
 
@@ -42,11 +71,12 @@ class QueryHistory:
 
     def toggle_favorite(self, query_timestamp: str) -> bool:
         """Toggle favorite status of a query"""
-        for query in self.history:
-            if query["timestamp"] == query_timestamp:
-                query["favorite"] = not query.get("favorite", False)
-                self.save_history()
-                return query["favorite"]
+        with self._lock:
+            for query in self.history:
+                if query["timestamp"] == query_timestamp:
+                    query["favorite"] = not query.get("favorite", False)
+                    self.save_history()
+                    return query["favorite"]
         return False
 
     def search_queries(self, 
@@ -55,7 +85,8 @@ class QueryHistory:
         """Search queries by keyword and dialect"""
         results = []
         for query in self.history:
-            if (keyword.lower() in query["natural_query"].lower() or
+            questions = query.get("natural_queries") or [query["natural_query"]]
+            if (any(keyword.lower() in q.lower() for q in questions) or
                 keyword.lower() in query["sql_query"].lower()):
                 if not dialect or query["dialect"] == dialect:
                     results.append(query)
@@ -63,8 +94,9 @@ class QueryHistory:
 
     def save_history(self) -> None:
         """Save query history to file"""
-        with open(self.storage_file, 'w') as f:
-            json.dump(self.history, f, indent=2)
+        with self._lock:
+            with open(self.storage_file, 'w') as f:
+                json.dump(self.history, f, indent=2)
 
     def load_history(self) -> None:
         """Load query history from file"""
@@ -73,3 +105,10 @@ class QueryHistory:
                 self.history = json.load(f)
         except (FileNotFoundError, json.JSONDecodeError):
             self.history = []
+
+        self._by_shape = {}
+        for record in self.history:
+            if "fingerprint" not in record:
+                record["fingerprint"] = fingerprint(record.get("sql_query", ""))
+            # The first entry of a shape is the one add_query keeps updating
+            self._by_shape.setdefault((record["fingerprint"], record.get("dialect")), record)
@@ -1,6 +1,8 @@
 """SQL query optimization utilities"""
+import re
 import sqlparse
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+from .join_paths import get_join_path_index
 
 class QueryOptimizer:
     """Optimizes SQL queries for better performance"""
@@ -13,9 +15,13 @@ class QueryOptimizer:
             self._add_indexes_hint
         ]
 
-    def optimize_query(self, query: str, schema: Dict = None) -> Tuple[str, List[str]]:
+    def optimize_query(self,
+                       query: str,
+                       schema: Dict = None,
+                       schema_fingerprint: Optional[str] = None) -> Tuple[str, List[str]]:
         """
-        Optimize the given SQL query
+        Optimize the given SQL query. Pass the schema's fingerprint when it is
+        already known, so the join path index is found without hashing the schema.
         Returns: (optimized_query, list of optimization suggestions)
         """
         suggestions = []
@@ -23,12 +29,15 @@ class QueryOptimizer:
 
         # Apply each optimization rule
         for rule in self.optimization_rules:
-            optimized, rule_suggestions = rule(optimized, schema)
+            optimized, rule_suggestions = rule(optimized, schema, schema_fingerprint)
             suggestions.extend(rule_suggestions)
 
         return optimized, suggestions
 
-    def _optimize_select_columns(self, query: str, schema: Dict) -> Tuple[str, List[str]]:
+    def _optimize_select_columns(self,
+                                 query: str,
+                                 schema: Dict,
+                                 schema_fingerprint: Optional[str] = None) -> Tuple[str, List[str]]:
         """Optimize SELECT clause"""
         suggestions = []
         
@@ -37,17 +46,41 @@ class QueryOptimizer:
         
         return query, suggestions
 
-    def _optimize_joins(self, query: str, schema: Dict) -> Tuple[str, List[str]]:
+    def _optimize_joins(self,
+                        query: str,
+                        schema: Dict,
+                        schema_fingerprint: Optional[str] = None) -> Tuple[str, List[str]]:
         """Optimize JOIN operations"""
         suggestions = []
         
         # Check for proper join conditions
         if 'JOIN' in query.upper() and 'ON' not in query.upper():
             suggestions.append("Add proper JOIN conditions using ON clause")
+
+        # Check joined tables against the schema's foreign key graph
+        if schema:
+            join_index = get_join_path_index(schema, schema_fingerprint)
+            tables = re.findall(r'\b(?:FROM|JOIN)\s+([A-Za-z_][A-Za-z0-9_]*)', query, re.IGNORECASE)
+            tables = [t for t in tables if t in join_index.component]
+            for source, target in zip(tables, tables[1:]):
+                distance = join_index.distance(source, target)
+                if distance is None:
+                    suggestions.append(
+                        f"No foreign key path between {source} and {target}; "
+                        "check for an accidental cross join"
+                    )
+                elif distance > 1:
+                    suggestions.append(
+                        f"{source} and {target} are joined through intermediate tables:\n"
+                        + join_index.join_clause(source, target)
+                    )
             
         return query, suggestions
 
-    def _optimize_where_conditions(self, query: str, schema: Dict) -> Tuple[str, List[str]]:
+    def _optimize_where_conditions(self,
+                                   query: str,
+                                   schema: Dict,
+                                   schema_fingerprint: Optional[str] = None) -> Tuple[str, List[str]]:
         """Optimize WHERE conditions"""
         suggestions = []
         
@@ -56,7 +89,10 @@ class QueryOptimizer:
             
         return query, suggestions
 
-    def _add_indexes_hint(self, query: str, schema: Dict) -> Tuple[str, List[str]]:
+    def _add_indexes_hint(self,
+                          query: str,
+                          schema: Dict,
+                          schema_fingerprint: Optional[str] = None) -> Tuple[str, List[str]]:
         """Suggest indexes based on query patterns"""
         suggestions = []
         
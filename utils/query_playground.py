@@ -1,57 +1,167 @@
 """Interactive SQL Query Testing Playground"""
 import pandas as pd
 from typing import Dict, Any, Tuple, Optional
+from sqlparse import lexer
+from sqlparse import tokens as T
 from .database import Database
 from .error_handler import SQLErrorHandler
 from .sql_dialects import SQLDialectConverter
 from .query_optimizer import QueryOptimizer
+from .query_corrector import QueryCorrector, error_fingerprint
+from .fan_out import fan_out_query, merge_results, compare_results
+from .result_frame import frame_from_rows, shrink_frame
+from .cost_guard import CostGuard, QueryRefused
+
+
+def with_limit(query: str, limit_rows: int) -> str:
+    """
+    query with LIMIT limit_rows appended, unless it already has a LIMIT of
+    its own (not just in a subquery). Trailing comments and semicolons are
+    dropped first, so the LIMIT can't end up inside a -- comment.
+    """
+    tokens = list(lexer.tokenize(query))
+    while tokens and (tokens[-1][0] in T.Whitespace or tokens[-1][0] in T.Newline
+                      or tokens[-1][0] in T.Comment or tokens[-1][1] == ';'):
+        tokens.pop()
+    depth = 0
+    for ttype, value in tokens:
+        if value == '(':
+            depth += 1
+        elif value == ')':
+            depth -= 1
+        elif depth == 0 and ttype in T.Keyword and value.upper() == 'LIMIT':
+            return query
+    return "".join(value for _, value in tokens) + f" LIMIT {limit_rows}"
+
 
 class QueryPlayground:
-    def __init__(self):
-        self.db = Database()
-        self.dialect_converter = SQLDialectConverter()
-        self.query_optimizer = QueryOptimizer()
+    CORRECTABLE_ERRORS = {'syntax', 'missing_table', 'missing_column', 'ambiguous', 'data_type', 'unknown'}
+
+    def __init__(self,
+                 db: Optional[Database] = None,
+                 dialect_converter: Optional[SQLDialectConverter] = None,
+                 query_optimizer: Optional[QueryOptimizer] = None,
+                 corrector: Optional[QueryCorrector] = None,
+                 schema_cache=None,
+                 cost_guard: Optional[CostGuard] = None):
+        # Components can be shared across sessions (see utils.services)
+        self.db = db or Database()
+        self.dialect_converter = dialect_converter or SQLDialectConverter()
+        self.query_optimizer = query_optimizer or QueryOptimizer()
+        self.corrector = corrector or QueryCorrector()
+        self.schema_cache = schema_cache
+        # Checks the planner's estimate before anything runs (None: run everything)
+        self.cost_guard = cost_guard
 
     def execute_test_query(self, 
                          query: str,
                          dialect: str = 'postgresql',
-                         limit_rows: int = 100) -> Tuple[Optional[pd.DataFrame], str, list]:
+                         limit_rows: int = 100,
+                         schema: Optional[Dict] = None,
+                         db: Optional[Database] = None) -> Tuple[Optional[pd.DataFrame], str, list]:
         """
-        Execute a test query and return results with optimization suggestions
+        Execute a test query and return results with optimization suggestions.
+        A failing query is passed through the corrector and retried once.
+        With a cost guard, an expensive query is sampled, timed out sooner
+        or refused, and the planner's estimate leads the suggestions.
+        db routes the query to another connection profile (default: self.db).
         Returns: (results_df, error_message, optimization_suggestions)
         """
+        db = db or self.db
         try:
             # Convert query to PostgreSQL dialect if needed
             if dialect != 'postgresql':
                 query = self.dialect_converter.convert_query(query, 'postgresql')
+            return self._run(query, limit_rows, db)
 
-            # Get optimization suggestions
-            optimized_query, suggestions = self.query_optimizer.optimize_query(query)
+        except QueryRefused as e:
+            return None, str(e), [e.suggestion]
+        except Exception as e:
+            first_error = str(e)
+            error_msg, color, suggestion = SQLErrorHandler.format_error(e)
+            error_type, _ = SQLErrorHandler.classify(e)
 
-            # Add LIMIT clause if not present
-            if 'LIMIT' not in optimized_query.upper():
-                optimized_query = f"{optimized_query} LIMIT {limit_rows}"
+        # Only mistakes in the query itself are worth correcting
+        if error_type not in self.CORRECTABLE_ERRORS:
+            return None, error_msg, [suggestion]
 
-            # Execute query
-            results = self.db.execute_query(optimized_query)
-            
-            # Convert to DataFrame
-            if results:
-                df = pd.DataFrame(results)
-                return df, "", suggestions
-            return pd.DataFrame(), "", suggestions
+        fingerprint = error_fingerprint(query, first_error)
+        corrected_query, corrections = self.corrector.correct(
+            query, first_error, schema or self._cached_schema(db)
+        )
+        if not corrections or corrected_query == query:
+            return None, error_msg, [suggestion]
 
+        correction_message = "; ".join(corrections)
+        try:
+            df, _, suggestions = self._run(corrected_query, limit_rows, db)
+        except QueryRefused as e:
+            return None, str(e), [f"Attempted corrections: {correction_message}", e.suggestion]
         except Exception as e:
-            error_msg, color, suggestion = SQLErrorHandler.format_error(str(e))
-            return None, error_msg, [suggestion]
+            retry_msg, color, retry_suggestion = SQLErrorHandler.format_error(e)
+            return None, retry_msg, [f"Attempted corrections: {correction_message}", retry_suggestion]
+
+        self.corrector.learn(fingerprint, corrected_query, corrections)
+        self.corrector.record_correction(query, corrected_query, correction_message, fingerprint)
+        return df, "", [f"Query was automatically corrected: {correction_message}"] + suggestions
+
+    def _prepare(self, query: str, limit_rows: int) -> Tuple[str, list]:
+        # Get optimization suggestions
+        optimized_query, suggestions = self.query_optimizer.optimize_query(query)
+
+        return with_limit(optimized_query, limit_rows), suggestions
+
+    def _run(self, query: str, limit_rows: int, db: Database) -> Tuple[pd.DataFrame, str, list]:
+        optimized_query, suggestions = self._prepare(query, limit_rows)
+
+        timeout_ms = None
+        if self.cost_guard is not None:
+            decision = self.cost_guard.check(optimized_query, db)  # may raise QueryRefused
+            optimized_query, timeout_ms = decision.query, decision.timeout_ms
+            if decision.message:
+                suggestions = [decision.message] + suggestions
+
+        # Execute query and build typed columns straight from the row tuples
+        columns, rows = db.execute_query_rows(optimized_query, timeout_ms=timeout_ms)
+        return frame_from_rows(columns, rows), "", suggestions
+
+    def _cached_schema(self, db: Database) -> Optional[Dict]:
+        """Live database schema for identifier repair, if a schema cache is attached"""
+        if self.schema_cache is None:
+            return None
+        try:
+            return self.schema_cache.get(db)
+        except Exception:
+            return None
+
+    def execute_fan_out(self,
+                        query: str,
+                        targets: Dict[str, Database],
+                        dialect: str = 'postgresql',
+                        limit_rows: int = 100) -> Tuple[pd.DataFrame, pd.DataFrame, list]:
+        """
+        Execute one query concurrently on several databases (replicas, shards, regions)
+        Returns: (merged_df with a _target column, per-target comparison_df, optimization_suggestions)
+        """
+        if dialect != 'postgresql':
+            query = self.dialect_converter.convert_query(query, 'postgresql')
+        optimized_query, suggestions = self._prepare(query, limit_rows)
+
+        results = fan_out_query(optimized_query, targets)
+        return (shrink_frame(pd.DataFrame(merge_results(results))),
+                pd.DataFrame(compare_results(results)),
+                suggestions)
 
-    def get_table_preview(self, table_name: str, limit: int = 5) -> Optional[pd.DataFrame]:
+    def get_table_preview(self,
+                          table_name: str,
+                          limit: int = 5,
+                          db: Optional[Database] = None) -> Optional[pd.DataFrame]:
         """Get a preview of table data"""
+        db = db or self.db
         try:
-            if self.db.validate_table_exists(table_name):
+            if db.validate_table_exists(table_name):
                 query = f"SELECT * FROM {table_name} LIMIT {limit}"
-                results = self.db.execute_query(query)
-                return pd.DataFrame(results) if results else pd.DataFrame()
+                return frame_from_rows(*db.execute_query_rows(query))
         except Exception:
             return None
         return None
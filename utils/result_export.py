@@ -0,0 +1,219 @@
+"""Streaming export of query results to CSV, Parquet and Excel
+
+Rows are pulled from Postgres in chunks and written straight to disk, so
+memory use stays flat regardless of result size:
+    CSV      COPY ... TO STDOUT piped into the file
+    Parquet  one row group per fetched chunk (pyarrow)
+    Excel    openpyxl write-only workbook, one row at a time
+Export files that nobody collected are deleted after EXPORT_TTL_SECONDS.
+"""
+import os
+import json
+import time
+import uuid
+import datetime
+from typing import Any, Callable, List, Optional
+from .database import Database
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+EXPORT_DIR = "exports"
+EXCEL_MAX_ROWS = 1048576 - 1  # one row is the header
+EXPORT_TTL_SECONDS = int(os.getenv("EXPORT_TTL_SECONDS", "3600"))
+# Largest export the app offers as an in-browser download (it is read into memory)
+INLINE_DOWNLOAD_MAX_BYTES = 100 * 1024 * 1024
+
+# progress(rows_written, bytes_written); rows is None while COPY is still running
+ProgressCallback = Callable[[Optional[int], int], None]
+
+
+class ExportResult:
+    """A finished export file"""
+
+    def __init__(self, path: str, export_format: str, rows: int, size: int):
+        self.path = path
+        self.format = export_format
+        self.rows = rows
+        self.bytes = size
+
+    @property
+    def file_name(self) -> str:
+        return os.path.basename(self.path)
+
+    @property
+    def mime_type(self) -> str:
+        return EXPORT_FORMATS[self.format][1]
+
+
+class _CountingWriter:
+    """Binary file wrapper that reports bytes written to a progress callback"""
+
+    def __init__(self, f, progress: Optional[ProgressCallback], report_every: int = 4 * 1024 * 1024):
+        self._f = f
+        self._progress = progress
+        self._report_every = report_every
+        self._next_report = report_every
+        self.bytes = 0
+
+    def write(self, data) -> int:
+        written = self._f.write(data)
+        self.bytes += len(data)
+        if self._progress and self.bytes >= self._next_report:
+            self._progress(None, self.bytes)
+            self._next_report = self.bytes + self._report_every
+        return written
+
+
+def _arrow_type(type_oid: int):
+    import pyarrow as pa
+    return {
+        16: pa.bool_(),
+        20: pa.int64(),
+        21: pa.int16(),
+        23: pa.int32(),
+        700: pa.float32(),
+        701: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp("us"),
+        1184: pa.timestamp("us", tz="UTC"),
+        # numeric, text, varchar, json, uuid and anything else: kept as text
+        # so no precision is lost
+    }.get(type_oid, pa.string())
+
+
+def _text_value(value: Any) -> str:
+    """Text form of a value; json/jsonb and arrays are written as JSON"""
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _excel_value(value: Any) -> Any:
+    """Values openpyxl can write; everything else becomes text"""
+    if value is None or isinstance(value, (str, int, float, bool, datetime.date, datetime.time)):
+        if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+            return value.replace(tzinfo=None)
+        return value
+    return _text_value(value)
+
+
+class ResultExporter:
+    """Exports full query results to files without building a DataFrame"""
+
+    def __init__(self,
+                 db: Optional[Database] = None,
+                 export_dir: str = EXPORT_DIR,
+                 chunk_size: int = 50000):
+        self.db = db or Database()
+        self.export_dir = export_dir
+        self.chunk_size = chunk_size
+
+    def export(self,
+               query: str,
+               export_format: str = "CSV",
+               progress: Optional[ProgressCallback] = None) -> ExportResult:
+        """
+        Run a PostgreSQL query and stream its full result to a file
+        Returns: ExportResult with the file path, row count and size
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise Exception(f"Unsupported export format: {export_format}")
+        os.makedirs(self.export_dir, exist_ok=True)
+        self.prune()
+        extension = EXPORT_FORMATS[export_format][0]
+        path = os.path.join(self.export_dir, f"query_result_{uuid.uuid4().hex[:12]}.{extension}")
+
+        writer = {
+            "CSV": self._write_csv,
+            "Parquet": self._write_parquet,
+            "Excel": self._write_excel,
+        }[export_format]
+        try:
+            rows = writer(query, path, progress)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+
+        size = os.path.getsize(path)
+        if progress:
+            progress(rows, size)
+        return ExportResult(path, export_format, rows, size)
+
+    def prune(self, max_age: float = EXPORT_TTL_SECONDS) -> List[str]:
+        """Delete export files older than max_age seconds"""
+        cutoff = time.time() - max_age
+        removed = []
+        for name in os.listdir(self.export_dir):
+            path = os.path.join(self.export_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed.append(path)
+            except OSError:
+                continue  # removed meanwhile
+        return removed
+
+    def _write_csv(self, query: str, path: str, progress: Optional[ProgressCallback]) -> int:
+        with open(path, "wb") as f:
+            return self.db.copy_to_csv(query, _CountingWriter(f, progress))
+
+    def _write_parquet(self, query: str, path: str, progress: Optional[ProgressCallback]) -> int:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        rows_written = 0
+        try:
+            for columns, rows in self.db.stream_query(query, chunk_size=self.chunk_size):
+                if writer is None:
+                    schema = pa.schema([(name, _arrow_type(oid)) for name, oid in columns])
+                    writer = pq.ParquetWriter(path, schema, compression="snappy")
+                batch = self._arrow_batch(schema, rows)
+                writer.write_table(pa.Table.from_batches([batch], schema=schema))
+                rows_written += len(rows)
+                if progress:
+                    progress(rows_written, os.path.getsize(path))
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows_written
+
+    @staticmethod
+    def _arrow_batch(schema, rows: List[tuple]):
+        import pyarrow as pa
+        arrays = []
+        for index, field in enumerate(schema):
+            values = [row[index] for row in rows]
+            if pa.types.is_string(field.type):
+                values = [None if v is None else _text_value(v) for v in values]
+            arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def _write_excel(self, query: str, path: str, progress: Optional[ProgressCallback]) -> int:
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Results")
+        rows_written = 0
+        header_written = False
+        for columns, rows in self.db.stream_query(query, chunk_size=self.chunk_size):
+            if not header_written:
+                sheet.append([name for name, _ in columns])
+                header_written = True
+            if rows_written + len(rows) > EXCEL_MAX_ROWS:
+                raise Exception(
+                    f"Result has more than {EXCEL_MAX_ROWS} rows, which Excel cannot hold; "
+                    "export to CSV or Parquet instead"
+                )
+            for row in rows:
+                sheet.append([_excel_value(value) for value in row])
+            rows_written += len(rows)
+            if progress:
+                progress(rows_written, 0)
+        workbook.save(path)
+        return rows_written
+
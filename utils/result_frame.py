@@ -0,0 +1,131 @@
+"""Memory-lean DataFrames for query results
+
+Building a frame from a list of row dictionaries keeps every value as a
+Python object. Here frames are built column by column from row tuples and
+the cursor description instead: each column gets a dtype from its Postgres
+type, integers are downcast to the smallest type that holds them, floats to
+float32 where that is lossless, and low-cardinality text becomes categorical.
+numeric stays as exact Decimal objects, and dates or timestamps pandas
+can't represent stay as Python objects rather than turning into NaT.
+"""
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Tuple
+
+INTEGER_OIDS = {20, 21, 23, 26}       # int8, int2, int4, oid
+FLOAT_OIDS = {700, 701}               # float4, float8 (numeric is left as Decimal)
+BOOL_OIDS = {16}
+DATETIME_OIDS = {1082, 1114}          # date, timestamp
+DATETIME_TZ_OIDS = {1184}             # timestamptz
+TEXT_OIDS = {18, 19, 25, 1042, 1043}  # char, name, text, bpchar, varchar
+
+CATEGORY_MIN_ROWS = 100
+CATEGORY_MAX_RATIO = 0.5  # distinct values / rows
+PAGE_SIZE = 1000
+
+
+def _unique_names(names: List[str]) -> List[str]:
+    """Suffix repeated column names (SELECT a.id, b.id) so none is lost"""
+    seen: Dict[str, int] = {}
+    unique = []
+    for name in names:
+        if name in seen:
+            seen[name] += 1
+            unique.append(f"{name}_{seen[name]}")
+        else:
+            seen[name] = 0
+            unique.append(name)
+    return unique
+
+
+def _typed_column(values: List[Any], type_oid: int) -> pd.Series:
+    try:
+        if type_oid in INTEGER_OIDS:
+            return pd.Series(values, dtype="Int64")
+        if type_oid in FLOAT_OIDS:
+            return pd.Series(values, dtype="float64")
+        if type_oid in BOOL_OIDS:
+            return pd.Series(values, dtype="boolean")
+        if type_oid in DATETIME_OIDS:
+            return pd.Series(pd.to_datetime(values))
+        if type_oid in DATETIME_TZ_OIDS:
+            return pd.Series(pd.to_datetime(values, utc=True))
+        if type_oid in TEXT_OIDS:
+            return pd.Series(values, dtype="str")
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return pd.Series(values, dtype="object")
+
+
+def shrink_column(series: pd.Series) -> pd.Series:
+    """Smallest dtype that holds a column's values without losing any"""
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        if not series.hasnans:
+            series = series.astype("int64")  # plain numpy ints are leaner than nullable ones
+        return pd.to_numeric(series, downcast="integer")
+    if pd.api.types.is_float_dtype(series):
+        narrow = series.astype("float32")
+        wide = series.to_numpy(dtype="float64", na_value=np.nan)
+        if np.array_equal(narrow.to_numpy(dtype="float64", na_value=np.nan), wide, equal_nan=True):
+            return narrow
+        return series
+    if pd.api.types.is_string_dtype(series) and len(series) >= CATEGORY_MIN_ROWS:
+        if (not pd.api.types.is_object_dtype(series)
+                or pd.api.types.infer_dtype(series, skipna=True) == "string"):
+            if series.nunique(dropna=True) <= len(series) * CATEGORY_MAX_RATIO:
+                return series.astype("category")
+    return series
+
+
+def frame_from_rows(columns: List[Tuple[str, int]], rows: List[tuple]) -> pd.DataFrame:
+    """Typed, downcast DataFrame from Database.execute_query_rows output"""
+    names = _unique_names([name for name, _ in columns])
+    if not rows:
+        return pd.DataFrame(columns=names)
+    data = {}
+    for index, (values, (_, type_oid)) in enumerate(zip(zip(*rows), columns)):
+        data[index] = shrink_column(_typed_column(list(values), type_oid))
+    frame = pd.DataFrame(data, copy=False)
+    frame.columns = names
+    return frame
+
+
+def shrink_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Downcast an already built frame (e.g. one made from row dictionaries)"""
+    if frame.empty:
+        return frame
+    shrunk = {}
+    for name in frame.columns:
+        column = frame[name]
+        if pd.api.types.is_object_dtype(column):
+            column = column.infer_objects()  # Decimals stay objects
+        shrunk[name] = shrink_column(column)
+    return pd.DataFrame(shrunk, index=frame.index, copy=False)
+
+
+def frame_memory(frame: pd.DataFrame) -> Dict[str, Any]:
+    """Memory footprint of a frame, in total and per column (bytes)"""
+    usage = frame.memory_usage(deep=True, index=True)
+    return {
+        "bytes": int(usage.sum()),
+        "rows": len(frame),
+        "columns": {str(name): int(size) for name, size in usage.items() if name != "Index"},
+        "dtypes": {str(name): str(dtype) for name, dtype in frame.dtypes.items()},
+    }
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def frame_window(frame: pd.DataFrame, page: int, page_size: int = PAGE_SIZE) -> pd.DataFrame:
+    """One page of rows (page counts from 1), the only part sent to the browser"""
+    page_count = max(1, -(-len(frame) // page_size))
+    page = min(max(page, 1), page_count)
+    start = (page - 1) * page_size
+    return frame.iloc[start:start + page_size]
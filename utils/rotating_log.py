@@ -0,0 +1,205 @@
+"""Append-only record log with size/age rotation and compressed archives
+
+Records are appended one JSON object per line to an active segment, so an
+append never rewrites the file. Once the segment holds max_records records,
+grows past max_bytes, or was opened more than max_age_days ago, it is
+gzipped into the archive directory and a new segment starts. Segment age
+is measured from when it was opened, not from record timestamps, so a bulk
+import of old records doesn't rotate once per record. Archives are
+pruned by count and age. Only the active segment is kept in memory; reads
+page backwards through the archives on demand, and archive file names carry
+their record count, so totals don't require decompressing anything.
+
+    query_corrections.jsonl                                  active segment
+    query_corrections_archive/
+        query_corrections-20250101T120000000000-500.jsonl.gz  <rotated at>-<records>
+"""
+import os
+import re
+import gzip
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_ARCHIVE_NAME = re.compile(r"^(?P<stem>.+)-(?P<rotated>\d{8}T\d{12})-(?P<count>\d+)\.jsonl\.gz$")
+_TIME_FORMAT = "%Y%m%dT%H%M%S%f"
+
+
+class RotatingLog:
+    """Bounded, rotating JSON Lines log of dictionaries"""
+
+    def __init__(self,
+                 path: str,
+                 archive_dir: Optional[str] = None,
+                 max_records: int = 500,
+                 max_bytes: int = 1024 * 1024,
+                 max_age_days: Optional[float] = 30,
+                 max_archives: int = 20,
+                 archive_retention_days: Optional[float] = 365):
+        self.path = path
+        self.stem = os.path.splitext(os.path.basename(path))[0]
+        self.archive_dir = archive_dir or os.path.join(os.path.dirname(path), f"{self.stem}_archive")
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.max_archives = max_archives
+        self.archive_retention_days = archive_retention_days
+        self.records: List[Dict[str, Any]] = []
+        self._bytes = 0
+        # When the active segment got its first record
+        self._opened_at: Optional[datetime] = None
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self) -> None:
+        self.records, self._bytes = [], 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self._bytes += len(line.encode('utf-8'))
+                    try:
+                        self.records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # torn write from a crash; drop the line
+        except FileNotFoundError:
+            pass
+        if self.records:
+            # Segment left by an earlier process: count its age from the last write,
+            # never from the records' own (possibly imported, old) timestamps
+            self._opened_at = datetime.fromtimestamp(os.path.getmtime(self.path))
+
+    # ----------------------------------------------------------------- writes
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Append one record, rotating the active segment first if it is full or old"""
+        self.extend([record])
+
+    def extend(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Append several records with a single write per segment"""
+        with self._lock:
+            pending: List[str] = []
+            for record in records:
+                if self._segment_full():
+                    self._write(pending)
+                    pending = []
+                    self.rotate()
+                line = json.dumps(record, default=str) + "\n"
+                if not self.records:
+                    self._opened_at = datetime.now()
+                pending.append(line)
+                self.records.append(record)
+                self._bytes += len(line.encode('utf-8'))
+            self._write(pending)
+
+    def _segment_full(self) -> bool:
+        if not self.records:
+            return False
+        if len(self.records) >= self.max_records or self._bytes >= self.max_bytes:
+            return True
+        if self.max_age_days is not None and self._opened_at is not None:
+            return datetime.now() - self._opened_at > timedelta(days=self.max_age_days)
+        return False
+
+    def _write(self, lines: List[str]) -> None:
+        if lines:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write("".join(lines))
+
+    def rotate(self) -> Optional[str]:
+        """
+        Compress the active segment into the archive directory and start a new one
+        Returns: the archive path, or None if the segment was empty
+        """
+        with self._lock:
+            if not self.records:
+                return None
+            os.makedirs(self.archive_dir, exist_ok=True)
+            name = f"{self.stem}-{datetime.now().strftime(_TIME_FORMAT)}-{len(self.records)}.jsonl.gz"
+            archive = os.path.join(self.archive_dir, name)
+            with gzip.open(archive + ".tmp", 'wt', encoding='utf-8') as f:
+                for record in self.records:
+                    f.write(json.dumps(record, default=str) + "\n")
+            os.replace(archive + ".tmp", archive)
+            open(self.path, 'w').close()
+            self.records, self._bytes, self._opened_at = [], 0, None
+            self.prune()
+            return archive
+
+    def prune(self) -> List[str]:
+        """Delete archives beyond max_archives or older than the retention period"""
+        with self._lock:
+            archives = self._archives()  # newest first
+            cutoff = (datetime.now() - timedelta(days=self.archive_retention_days)
+                      if self.archive_retention_days is not None else None)
+            removed = []
+            for index, (path, rotated_at, _) in enumerate(archives):
+                if index >= self.max_archives or (cutoff and rotated_at < cutoff):
+                    os.remove(path)
+                    removed.append(path)
+            return removed
+
+    # ------------------------------------------------------------------ reads
+
+    def _archives(self) -> List[Tuple[str, datetime, int]]:
+        """(path, rotated_at, record count) of every archive, newest first"""
+        try:
+            names = os.listdir(self.archive_dir)
+        except FileNotFoundError:
+            return []
+        archives = []
+        for name in names:
+            match = _ARCHIVE_NAME.match(name)
+            if match and match.group("stem") == self.stem:
+                archives.append((os.path.join(self.archive_dir, name),
+                                 datetime.strptime(match.group("rotated"), _TIME_FORMAT),
+                                 int(match.group("count"))))
+        return sorted(archives, key=lambda archive: archive[1], reverse=True)
+
+    @staticmethod
+    def _read_archive(path: str) -> List[Dict[str, Any]]:
+        records = []
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return records
+
+    def count(self) -> int:
+        """Records in the active segment and all archives"""
+        with self._lock:
+            return len(self.records) + sum(count for _, _, count in self._archives())
+
+    def read_page(self, page: int = 1, page_size: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        One page of records, newest first (page counts from 1). Archives
+        before the requested page are skipped without being decompressed.
+        Returns: (records, total record count)
+        """
+        with self._lock:
+            segments = [(None, len(self.records))] + [(path, count) for path, _, count in self._archives()]
+            active = list(self.records)
+        start = max(page - 1, 0) * page_size
+        end = start + page_size
+        total = sum(count for _, count in segments)
+
+        result: List[Dict[str, Any]] = []
+        offset = 0
+        for path, count in segments:
+            if offset >= end:
+                break
+            if offset + count > start:
+                try:
+                    records = active if path is None else self._read_archive(path)
+                except (OSError, EOFError):
+                    records = []  # pruned or damaged meanwhile
+                newest_first = records[::-1]
+                result.extend(newest_first[max(start - offset, 0):end - offset])
+            offset += count
+        return result, total
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """The newest records, newest first"""
+        return self.read_page(1, limit)[0]
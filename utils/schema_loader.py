@@ -0,0 +1,265 @@
+"""Streaming loader for large uploaded schema JSON files"""
+import re
+import sys
+import json
+import codecs
+from typing import Dict, Any, List, IO, Optional, Union
+from .schema_validator import validate_table
+
+# Bytes read from the upload per refill
+CHUNK_SIZE = 64 * 1024
+# Largest single table definition accepted, in characters of JSON text
+MAX_TABLE_CHARS = 8 * 1024 * 1024
+# Stop collecting after this many errors
+MAX_ERRORS = 200
+
+_COLUMN_KEYS = ('type', 'nullable', 'default', 'is_primary')
+_RELATIONSHIP_KEYS = ('column', 'references_table', 'references_column',
+                      'referenced_table', 'referenced_column')
+
+# Characters that matter when looking for the end of a JSON value
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_STRING_END = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[,:\]}\s]')
+
+
+class SchemaLoadError(Exception):
+    """Raised when the upload cannot be parsed any further"""
+
+
+class _JsonStream:
+    """
+    Minimal pull parser: walks object structure and decodes one value at a time.
+    A value is only handed to the JSON decoder once it is complete in the
+    buffer; the scan for its end resumes where it stopped after each refill,
+    so a large value is read in linear time.
+    """
+
+    def __init__(self, source: IO, chunk_size: int = CHUNK_SIZE):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        # utf-8-sig drops a leading byte order mark
+        self.text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.consumed = 0
+        # Scan state of the value being decoded; offsets are relative to pos
+        self._scan = 0
+        self._depth = 0
+        self._in_string = False
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer; returns False at end of input"""
+        if self.eof:
+            return False
+        chunk = self.source.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            self.buffer += self.text_decoder.decode(b"", final=True)
+            return False
+        if isinstance(chunk, bytes):
+            chunk = self.text_decoder.decode(chunk)
+        elif not self.consumed and not self.buffer:
+            chunk = chunk.lstrip('\ufeff')
+        # Drop the consumed prefix so the buffer only holds unparsed text
+        self.consumed += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise SchemaLoadError(
+                f"expected '{char}' at offset {self.consumed + self.pos}, found {found or 'end of file'!r}"
+            )
+        self.pos += 1
+
+    def decode_key(self, max_chars: int) -> str:
+        key = self.decode_value(max_chars)
+        if not isinstance(key, str):
+            raise SchemaLoadError(f"expected an object key, found {key!r}")
+        self.expect(':')
+        return key
+
+    def _value_end(self) -> Optional[int]:
+        """End of the value starting at pos, or None if it isn't all in the buffer yet"""
+        buffer = self.buffer
+        i = self.pos + self._scan
+        if buffer[self.pos] not in '{["':
+            # A number or literal; at the end of the buffer it may continue in the next chunk
+            match = _SCALAR_END.search(buffer, max(i, self.pos + 1))
+            if match:
+                return match.start()
+            self._scan = len(buffer) - self.pos
+            return None
+        while True:
+            match = (_STRING_END if self._in_string else _STRUCTURE).search(buffer, i)
+            if match is None:
+                break
+            char, i = match.group(), match.end()
+            if self._in_string:
+                if char == '\\':
+                    i += 1  # skip the escaped character
+                    continue
+                self._in_string = False
+                if self._depth == 0:
+                    return i
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    return i
+        self._scan = max(i, len(buffer)) - self.pos
+        return None
+
+    def decode_value(self, max_chars: int) -> Any:
+        """Decode the next complete JSON value, reading more input as needed"""
+        self.peek()
+        self._scan, self._depth, self._in_string = 0, 0, False
+        while True:
+            if self.eof or (self.pos < len(self.buffer) and self._value_end() is not None):
+                try:
+                    value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                except json.JSONDecodeError as e:
+                    raise SchemaLoadError(f"invalid JSON at offset {self.consumed + e.pos}: {e.msg}")
+                self.pos = end
+                return value
+            if len(self.buffer) - self.pos > max_chars:
+                raise SchemaLoadError(
+                    f"value at offset {self.consumed + self.pos} exceeds {max_chars} characters"
+                )
+            self._fill()
+
+
+class SchemaLoadResult:
+    """Tables parsed from an upload plus every validation error found"""
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        self.errors: List[Dict[str, str]] = []
+        self.truncated = False
+
+    @property
+    def is_valid(self) -> bool:
+        return not self.errors
+
+    @property
+    def schema(self) -> Dict[str, Any]:
+        """The loaded schema in the {'tables': {...}} format used across the app"""
+        return {"tables": self.tables}
+
+    def add_error(self, path: str, message: str) -> None:
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"path": path, "message": message})
+        else:
+            self.truncated = True
+
+
+def compact_table(table_info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Strip a table definition down to the keys the app uses and intern repeated
+    strings (column types, referenced table names) so duplicates share memory
+    """
+    columns = {}
+    for column_name, column_info in table_info.get('columns', {}).items():
+        columns[sys.intern(column_name)] = {
+            key: sys.intern(value) if isinstance(value, str) and key == 'type' else value
+            for key, value in column_info.items()
+            if key in _COLUMN_KEYS
+        }
+    compact: Dict[str, Any] = {"columns": columns}
+    relationships = table_info.get('relationships')
+    if relationships:
+        compact["relationships"] = [
+            {key: sys.intern(value) if isinstance(value, str) else value
+             for key, value in rel.items() if key in _RELATIONSHIP_KEYS}
+            for rel in relationships if isinstance(rel, dict)
+        ]
+    return compact
+
+
+def load_schema_stream(source: Union[IO[bytes], IO[str]],
+                       compact: bool = True,
+                       max_table_chars: int = MAX_TABLE_CHARS,
+                       chunk_size: int = CHUNK_SIZE) -> SchemaLoadResult:
+    """
+    Parse and validate an uploaded schema file one table at a time.
+    Only the current table's JSON text is held in memory besides the result,
+    and every error is collected with its path instead of stopping at the first.
+    """
+    result = SchemaLoadResult()
+    stream = _JsonStream(source, chunk_size)
+    found_tables = False
+
+    try:
+        stream.expect('{')
+        if stream.peek() == '}':
+            stream.pos += 1
+        else:
+            while True:
+                key = stream.decode_key(max_table_chars)
+                if key == 'tables':
+                    found_tables = True
+                    _load_tables(stream, result, compact, max_table_chars)
+                else:
+                    # Unknown top-level keys are parsed and discarded
+                    stream.decode_value(max_table_chars)
+                if stream.peek() == ',':
+                    stream.pos += 1
+                    continue
+                stream.expect('}')
+                break
+    except SchemaLoadError as e:
+        result.add_error("$", str(e))
+        return result
+
+    if not found_tables:
+        result.add_error("$", "missing 'tables'")
+    return result
+
+
+def _load_tables(stream: _JsonStream,
+                 result: SchemaLoadResult,
+                 compact: bool,
+                 max_table_chars: int) -> None:
+    if stream.peek() != '{':
+        result.add_error("tables", "'tables' must be an object")
+        stream.decode_value(max_table_chars)
+        return
+    stream.pos += 1
+    if stream.peek() == '}':
+        stream.pos += 1
+        return
+
+    while True:
+        table_name = stream.decode_key(max_table_chars)
+        table_info = stream.decode_value(max_table_chars)
+
+        errors = validate_table(table_name, table_info)
+        for error in errors:
+            result.add_error(error["path"], error["message"])
+        if not errors:
+            result.tables[sys.intern(table_name)] = (
+                compact_table(table_info) if compact else table_info
+            )
+
+        if stream.peek() == ',':
+            stream.pos += 1
+            continue
+        stream.expect('}')
+        return
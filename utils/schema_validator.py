@@ -1,32 +1,77 @@
-from typing import Dict, Any
+import json
+import hashlib
+from typing import Dict, Any, List
 
 def validate_schema(schema: Dict[str, Any]) -> bool:
     """
     Validate uploaded database schema format
     """
-    try:
-        # Check if schema has required structure
-        if not isinstance(schema, dict):
-            return False
-            
-        # Check if schema has tables
-        if 'tables' not in schema:
-            return False
-            
-        # Validate each table has required fields
-        for table_name, table_info in schema['tables'].items():
-            if not isinstance(table_info, dict):
-                return False
-                
-            if 'columns' not in table_info:
-                return False
-                
-            # Validate column structure
-            for column_name, column_info in table_info['columns'].items():
-                if 'type' not in column_info:
-                    return False
-                    
-        return True
-        
-    except Exception:
-        return False
+    return not collect_schema_errors(schema, max_errors=1)
+
+
+def collect_schema_errors(schema: Dict[str, Any], max_errors: int = 100) -> List[Dict[str, str]]:
+    """
+    Validate uploaded database schema format, collecting every problem found
+    Returns: list of {"path", "message"} dicts (empty if the schema is valid)
+    """
+    # Check if schema has required structure
+    if not isinstance(schema, dict):
+        return [{"path": "$", "message": "schema must be a JSON object"}]
+
+    # Check if schema has tables
+    if 'tables' not in schema:
+        return [{"path": "$", "message": "missing 'tables'"}]
+    if not isinstance(schema['tables'], dict):
+        return [{"path": "tables", "message": "'tables' must be an object"}]
+
+    errors: List[Dict[str, str]] = []
+    for table_name, table_info in schema['tables'].items():
+        errors.extend(validate_table(table_name, table_info))
+        if len(errors) >= max_errors:
+            return errors[:max_errors]
+    return errors
+
+
+def validate_table(table_name: str, table_info: Any) -> List[Dict[str, str]]:
+    """
+    Validate a single table entry
+    Returns: list of {"path", "message"} dicts
+    """
+    path = f"tables.{table_name}"
+
+    # Validate each table has required fields
+    if not isinstance(table_info, dict):
+        return [{"path": path, "message": "table must be an object"}]
+
+    if 'columns' not in table_info:
+        return [{"path": path, "message": "missing 'columns'"}]
+    if not isinstance(table_info['columns'], dict):
+        return [{"path": f"{path}.columns", "message": "'columns' must be an object"}]
+
+    # Validate column structure
+    errors = []
+    for column_name, column_info in table_info['columns'].items():
+        if not isinstance(column_info, dict) or 'type' not in column_info:
+            errors.append({
+                "path": f"{path}.columns.{column_name}",
+                "message": "missing 'type'"
+            })
+    return errors
+
+
+def schema_tables(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Table definitions of either an uploaded ({'tables': {...}}) or an
+    introspected ({table: {...}}, see Database.get_table_schema) schema
+    """
+    if isinstance(schema.get('tables'), dict):
+        return schema['tables']
+    return schema
+
+
+def schema_hash(schema: Dict[str, Any]) -> str:
+    """
+    Stable content hash of a schema dict, used as its fingerprint for caches
+    """
+    payload = json.dumps(schema, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
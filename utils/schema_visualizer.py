@@ -1,47 +1,151 @@
 """Schema visualization utilities"""
+import math
+import threading
+from collections import OrderedDict
 import networkx as nx
 import plotly.graph_objects as go
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Optional, Iterable
+from .schema_validator import schema_hash
+
+# Above this many nodes the figure is rendered with WebGL (Scattergl)
+WEBGL_NODE_THRESHOLD = 500
+# Components larger than this use a hierarchical (BFS shell) layout
+LARGE_COMPONENT_THRESHOLD = 200
+# Number of table-level layouts kept in the process-wide cache
+LAYOUT_CACHE_SIZE = 32
+
+_layout_cache: "OrderedDict[str, Dict[str, Tuple[float, float]]]" = OrderedDict()
+# Sessions share the cache; never held while a layout is computed
+_layout_lock = threading.Lock()
+
 
 class SchemaVisualizer:
     """Visualizes database schema and relationships"""
-    
-    def __init__(self, schema: Dict):
+
+    def __init__(self,
+                 schema: Dict,
+                 expanded_tables: Optional[Iterable[str]] = None,
+                 schema_fingerprint: Optional[str] = None):
         self.schema = schema
+        self.expanded_tables = set(expanded_tables or [])
+        # Pass the schema's fingerprint when it is known, to skip hashing the schema
+        self.schema_hash = (schema_fingerprint or schema_hash(schema)) if schema else ""
         self.graph = nx.Graph()
         self._build_graph()
 
     def _build_graph(self):
-        """Build network graph from schema"""
+        """
+        Build a table-level network graph from schema.
+        Column nodes are only added for tables listed in expanded_tables.
+        """
         if not self.schema or 'tables' not in self.schema:
             return
 
+        tables = self.schema['tables']
+
         # Add nodes for tables
-        for table_name, table_info in self.schema['tables'].items():
-            self.graph.add_node(table_name, type='table')
-            
-            # Add nodes for columns
-            if 'columns' in table_info:
-                for col_name, col_info in table_info['columns'].items():
+        for table_name, table_info in tables.items():
+            columns = table_info.get('columns', {})
+            self.graph.add_node(table_name, type='table', column_count=len(columns))
+
+            # Add nodes for columns on demand
+            if table_name in self.expanded_tables:
+                for col_name, col_info in columns.items():
                     node_id = f"{table_name}.{col_name}"
-                    self.graph.add_node(node_id, 
-                                      type='column',
-                                      data_type=col_info.get('type'))
+                    self.graph.add_node(node_id,
+                                        type='column',
+                                        table=table_name,
+                                        data_type=col_info.get('type'))
                     self.graph.add_edge(table_name, node_id)
 
-            # Add relationships
-            if 'relationships' in table_info:
-                for rel in table_info['relationships']:
-                    self.graph.add_edge(
-                        table_name,
-                        rel['referenced_table'],
-                        type='relationship'
-                    )
+        # Add relationships
+        for table_name, table_info in tables.items():
+            for rel in table_info.get('relationships') or []:
+                target = rel.get('referenced_table') or rel.get('references_table')
+                if target in tables:
+                    self.graph.add_edge(table_name, target, type='relationship')
+
+    def table_names(self) -> List[str]:
+        """Names of all table nodes"""
+        return [n for n, d in self.graph.nodes(data=True) if d.get('type') == 'table']
+
+    def get_table_layout(self) -> Dict[str, Tuple[float, float]]:
+        """Table-level positions, cached by schema hash"""
+        with _layout_lock:
+            cached = _layout_cache.get(self.schema_hash)
+            if cached is not None:
+                _layout_cache.move_to_end(self.schema_hash)
+                return cached
+
+        table_graph = self.graph.subgraph(self.table_names())
+        pos = self._component_layout(table_graph)
+
+        with _layout_lock:
+            _layout_cache[self.schema_hash] = pos
+            _layout_cache.move_to_end(self.schema_hash)
+            while len(_layout_cache) > LAYOUT_CACHE_SIZE:
+                _layout_cache.popitem(last=False)
+        return pos
+
+    @staticmethod
+    def _component_layout(graph: nx.Graph) -> Dict[str, Tuple[float, float]]:
+        """
+        Lay out each connected component independently and pack them on a grid.
+        Isolated tables skip force-directed layout entirely, and large components
+        use a hierarchical layout so the cost stays close to linear in table count.
+        """
+        components = sorted(nx.connected_components(graph), key=len, reverse=True)
+        if not components:
+            return {}
+
+        pos: Dict[str, Tuple[float, float]] = {}
+        grid_size = math.ceil(math.sqrt(len(components)))
+        for index, component in enumerate(components):
+            cell_x, cell_y = index % grid_size, index // grid_size
+            nodes = sorted(component)
+            if len(nodes) == 1:
+                local = {nodes[0]: (0.0, 0.0)}
+            elif len(nodes) > LARGE_COMPONENT_THRESHOLD:
+                local = SchemaVisualizer._hierarchical_layout(graph.subgraph(nodes))
+            else:
+                local = nx.spring_layout(graph.subgraph(nodes), seed=42)
+            # Bigger components get a bigger share of their cell
+            scale = 0.45 * min(1.0, math.sqrt(len(nodes) / len(components[0])))
+            for node, (x, y) in local.items():
+                pos[node] = (cell_x + float(x) * scale, -cell_y + float(y) * scale)
+        return pos
+
+    @staticmethod
+    def _hierarchical_layout(graph: nx.Graph) -> Dict[str, Tuple[float, float]]:
+        """Concentric BFS layers rooted at the most connected table"""
+        root = max(graph.degree, key=lambda item: item[1])[0]
+        layers: List[List[str]] = []
+        for node, depth in nx.single_source_shortest_path_length(graph, root).items():
+            while len(layers) <= depth:
+                layers.append([])
+            layers[depth].append(node)
+        return nx.shell_layout(graph, nlist=layers)
+
+    def get_layout(self) -> Dict[str, Tuple[float, float]]:
+        """Full layout, seeding column nodes around their (cached) table position"""
+        pos = dict(self.get_table_layout())
+        for table_name in self.expanded_tables:
+            if table_name not in pos:
+                continue
+            tx, ty = pos[table_name]
+            columns = [n for n in self.graph.neighbors(table_name)
+                       if self.graph.nodes[n].get('type') == 'column']
+            for i, node in enumerate(columns):
+                angle = 2 * math.pi * i / len(columns)
+                pos[node] = (tx + 0.15 * math.cos(angle), ty + 0.15 * math.sin(angle))
+        return pos
 
     def get_plotly_figure(self) -> go.Figure:
         """Generate interactive Plotly figure"""
-        pos = nx.spring_layout(self.graph)
-        
+        pos = self.get_layout()
+        use_webgl = self.graph.number_of_nodes() > WEBGL_NODE_THRESHOLD
+        scatter = go.Scattergl if use_webgl else go.Scatter
+
         # Create edges trace
         edge_x = []
         edge_y = []
@@ -50,8 +154,8 @@ class SchemaVisualizer:
             x1, y1 = pos[edge[1]]
             edge_x.extend([x0, x1, None])
             edge_y.extend([y0, y1, None])
-            
-        edges_trace = go.Scatter(
+
+        edges_trace = scatter(
             x=edge_x, y=edge_y,
             line=dict(width=0.5, color='#888'),
             hoverinfo='none',
@@ -62,42 +166,51 @@ class SchemaVisualizer:
         node_x = []
         node_y = []
         node_text = []
+        node_hover = []
         node_color = []
-        
-        for node in self.graph.nodes():
+
+        for node, data in self.graph.nodes(data=True):
             x, y = pos[node]
             node_x.append(x)
             node_y.append(y)
             node_text.append(str(node))
-            node_color.append('#1f77b4' if self.graph.nodes[node]['type'] == 'table' 
-                            else '#ff7f0e')
+            if data['type'] == 'table':
+                node_hover.append(f"{node} ({data['column_count']} columns)")
+                node_color.append('#1f77b4')
+            else:
+                node_hover.append(f"{node}: {data.get('data_type')}")
+                node_color.append('#ff7f0e')
 
-        nodes_trace = go.Scatter(
+        nodes_trace = scatter(
             x=node_x, y=node_y,
-            mode='markers+text',
+            # Labels are dropped for large graphs; names remain available on hover
+            mode='markers' if use_webgl else 'markers+text',
             hoverinfo='text',
-            text=node_text,
+            text=node_text if not use_webgl else None,
+            hovertext=node_hover,
             textposition='bottom center',
             marker=dict(
-                size=20,
+                size=8 if use_webgl else 20,
                 color=node_color,
-                line_width=2
+                line_width=0 if use_webgl else 2
             )
         )
 
         # Create figure
         fig = go.Figure(data=[edges_trace, nodes_trace],
-                       layout=go.Layout(
-                           showlegend=False,
-                           hovermode='closest',
-                           margin=dict(b=20,l=5,r=5,t=40),
-                           title='Database Schema Visualization',
-                           annotations=[dict(
-                               text="Database Schema",
-                               showarrow=False,
-                               xref="paper", yref="paper",
-                               x=0, y=-0.1
-                           )]
-                       ))
-        
+                        layout=go.Layout(
+                            showlegend=False,
+                            hovermode='closest',
+                            margin=dict(b=20, l=5, r=5, t=40),
+                            title='Database Schema Visualization',
+                            xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+                            yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+                            annotations=[dict(
+                                text="Database Schema",
+                                showarrow=False,
+                                xref="paper", yref="paper",
+                                x=0, y=-0.1
+                            )]
+                        ))
+
         return fig
@@ -0,0 +1,319 @@
+"""Process-wide shared services
+
+Streamlit runs every browser session in the same process, so heavyweight,
+stateless-per-user components are built once here and handed out to all
+sessions. Sessions only keep their own lightweight state (selected dialect,
+current query, ...) in st.session_state.
+"""
+import os
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .database import Database
+from .sql_dialects import SQLDialectConverter
+from .query_optimizer import QueryOptimizer
+from .query_history import QueryHistory
+from .user_preferences import UserPreferences
+from .query_corrector import QueryCorrector
+from .result_export import ResultExporter
+from .generation_pipeline import GenerationPipeline
+from .explain_validator import ExplainValidator
+from .cost_guard import CostGuard
+from .rotating_log import RotatingLog
+
+# Connection profile pools kept open; the least recently used one is closed first
+MAX_PROFILE_DATABASES = 8
+# Preferences files of signed-in users, one per user
+USER_PREFERENCES_DIR = "user_preferences"
+
+
+class ServiceRegistry:
+    """Thread-safe registry of lazily created singletons"""
+
+    def __init__(self):
+        self._services: Dict[str, Any] = {}
+        # Re-entrant so factories can resolve the services they depend on
+        self._lock = threading.RLock()
+
+    def get(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Return the named service, creating it with factory on first use"""
+        service = self._services.get(name)
+        if service is None:
+            with self._lock:
+                service = self._services.get(name)
+                if service is None:
+                    service = factory()
+                    self._services[name] = service
+        return service
+
+    def reset(self, name: Optional[str] = None) -> None:
+        """Drop one (or every) service so it is rebuilt on next use"""
+        with self._lock:
+            if name is None:
+                self._services.clear()
+            else:
+                self._services.pop(name, None)
+
+
+class _SchemaEntry:
+    """What a SchemaCache knows about one database"""
+
+    def __init__(self):
+        # Introspected tables; replaced (never mutated) when anything changes
+        self.schema: Dict[str, Any] = {}
+        # Table -> catalog version it was introspected at
+        self.loaded: Dict[str, str] = {}
+        # Table -> current catalog version, for every table in the database
+        self.catalog: Dict[str, str] = {}
+        self.names: List[str] = []
+        self.version = ""
+        self.checked_at = 0.0
+        # Guards the fields above; never held while talking to the database
+        self.lock = threading.Lock()
+        # One catalog read and one introspection at a time per database; the
+        # others wait for it and use its result
+        self.catalog_lock = threading.Lock()
+        self.load_lock = threading.Lock()
+
+
+class SchemaCache:
+    """
+    Caches the introspected database schema. Once the ttl expires only the
+    catalog versions are re-read (see Database.get_table_versions), and only
+    tables that were added or changed are introspected again, batch_size at
+    a time; dropped ones are forgotten. Tables can also be loaded lazily,
+    page by page, without introspecting the whole catalog. Each database has
+    its own locks, so a slow introspection of one never holds up another,
+    and reading the catalog version never waits for an introspection.
+    """
+
+    def __init__(self, ttl: float = 300.0, batch_size: int = 500):
+        self.ttl = ttl
+        self.batch_size = batch_size
+        # Each connection profile has its own entry
+        self._entries: Dict[Database, _SchemaEntry] = {}
+        self._lock = threading.Lock()
+        self.stats = {"refreshes": 0, "tables_introspected": 0, "tables_dropped": 0}
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[counter] += amount
+
+    def _fresh(self, entry: _SchemaEntry) -> bool:
+        return time.time() - entry.checked_at <= self.ttl
+
+    def _entry(self, db: Database) -> _SchemaEntry:
+        """Entry for db with an up to date catalog"""
+        with self._lock:
+            entry = self._entries.get(db)
+            if entry is None:
+                entry = self._entries[db] = _SchemaEntry()
+        if self._fresh(entry):
+            return entry
+        with entry.catalog_lock:
+            if self._fresh(entry):
+                return entry  # refreshed while we waited
+            catalog = db.get_table_versions()
+            with entry.lock:
+                dropped = [name for name in entry.loaded if name not in catalog]
+                if dropped:
+                    entry.schema = {name: info for name, info in entry.schema.items() if name in catalog}
+                    for name in dropped:
+                        del entry.loaded[name]
+                if catalog != entry.catalog:
+                    entry.catalog = catalog
+                    entry.names = sorted(catalog)
+                    entry.version = hashlib.sha1(
+                        json.dumps(catalog, sort_keys=True).encode("utf-8")
+                    ).hexdigest()
+                entry.checked_at = time.time()
+            self._count("refreshes")
+            self._count("tables_dropped", len(dropped))
+        return entry
+
+    @staticmethod
+    def _stale(entry: _SchemaEntry, names: List[str]) -> Dict[str, str]:
+        with entry.lock:
+            return {name: entry.catalog[name] for name in names
+                    if name in entry.catalog and entry.loaded.get(name) != entry.catalog[name]}
+
+    def _load(self, db: Database, entry: _SchemaEntry, names: List[str]) -> None:
+        """Introspect the tables among names that are new or changed since they were loaded"""
+        if not self._stale(entry, names):
+            return
+        with entry.load_lock:
+            stale = self._stale(entry, names)  # another caller may have loaded them meanwhile
+            batch_names = list(stale)
+            for start in range(0, len(batch_names), self.batch_size):
+                batch = batch_names[start:start + self.batch_size]
+                tables = db.get_table_schema(batch)
+                with entry.lock:
+                    # Skip tables dropped or changed again while this batch was introspected
+                    current = [name for name in batch if entry.catalog.get(name) == stale[name]]
+                    # A changed table that no longer introspects (e.g. lost its columns) is dropped too
+                    replaced = set(current)
+                    entry.schema = {**{name: info for name, info in entry.schema.items() if name not in replaced},
+                                    **{name: tables[name] for name in current if name in tables}}
+                    for name in current:
+                        entry.loaded[name] = stale[name]
+                self._count("tables_introspected", len(batch))
+
+    def get(self, db: Database) -> Dict[str, Any]:
+        """Get the whole schema, re-introspecting changed tables once the cached copy has expired"""
+        entry = self._entry(db)
+        self._load(db, entry, entry.names)
+        with entry.lock:
+            return entry.schema
+
+    def get_tables(self, db: Database, names: List[str]) -> Dict[str, Any]:
+        """Schema of just the named tables, introspecting only those not loaded yet"""
+        entry = self._entry(db)
+        self._load(db, entry, list(names))
+        with entry.lock:
+            return {name: entry.schema[name] for name in names if name in entry.schema}
+
+    def table_names(self,
+                    db: Database,
+                    page: int = 1,
+                    page_size: Optional[int] = None,
+                    search: str = "") -> Tuple[List[str], int]:
+        """
+        One page (from 1) of the database's table names, optionally only
+        those containing search; nothing is introspected
+        Returns: (names, total matching)
+        """
+        names = self._entry(db).names
+        if search:
+            names = [name for name in names if search.lower() in name.lower()]
+        if page_size is None:
+            return list(names), len(names)
+        start = (page - 1) * page_size
+        return names[start:start + page_size], len(names)
+
+    def version(self, db: Database) -> str:
+        """Hash of the catalog versions; changes whenever a table or column does"""
+        return self._entry(db).version
+
+    def invalidate(self, db: Optional[Database] = None) -> None:
+        """Re-read the catalog on next use; loaded tables are kept unless they changed"""
+        with self._lock:
+            entries = list(self._entries.values()) if db is None else [self._entries.get(db)]
+        for entry in entries:
+            if entry is not None:
+                entry.checked_at = 0.0
+
+    def clear(self, db: Optional[Database] = None) -> None:
+        """Forget everything, so the next use introspects from scratch"""
+        with self._lock:
+            if db is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(db, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = list(self._entries.values())
+            stats = dict(self.stats)
+        stats["tables_cached"] = sum(len(entry.schema) for entry in entries)
+        return stats
+
+
+registry = ServiceRegistry()
+_profile_databases: "OrderedDict[str, Database]" = OrderedDict()
+_profile_databases_lock = threading.Lock()
+
+
+def get_database() -> Database:
+    return registry.get("database", Database)
+
+
+def get_profile_database(profile: Optional[Dict[str, Any]] = None) -> Database:
+    """
+    Pooled Database for a saved connection profile (None: the PG* environment).
+    Keyed by the connection settings, so editing a profile gets a fresh pool.
+    At most MAX_PROFILE_DATABASES are kept; the least recently used is closed.
+    """
+    if not profile:
+        return get_database()
+    params = json.dumps(Database.profile_params(profile), sort_keys=True)
+    key = hashlib.sha1(params.encode("utf-8")).hexdigest()
+    evicted = []
+    with _profile_databases_lock:
+        db = _profile_databases.get(key)
+        if db is None:
+            db = _profile_databases[key] = Database.from_profile(profile)
+            while len(_profile_databases) > MAX_PROFILE_DATABASES:
+                evicted.append(_profile_databases.popitem(last=False)[1])
+        else:
+            _profile_databases.move_to_end(key)
+    for old in evicted:
+        get_schema_cache().clear(old)
+        old.close()
+    return db
+
+
+def get_schema_cache() -> SchemaCache:
+    return registry.get("schema_cache", SchemaCache)
+
+
+def get_dialect_converter() -> SQLDialectConverter:
+    return registry.get("dialect_converter", SQLDialectConverter)
+
+
+def get_query_optimizer() -> QueryOptimizer:
+    return registry.get("query_optimizer", QueryOptimizer)
+
+
+def get_query_history() -> QueryHistory:
+    return registry.get("query_history", QueryHistory)
+
+
+def get_shared_queries() -> RotatingLog:
+    """Queries shared by anyone, the one part of preferences everybody sees"""
+    return registry.get("shared_queries", lambda: RotatingLog("shared_queries.jsonl"))
+
+
+def get_user_preferences(user_id: Optional[str] = None) -> UserPreferences:
+    """
+    Preferences of a signed-in user, shared by all of their sessions; without
+    a user_id, a new instance for the calling session alone
+    """
+    if user_id is None:
+        return UserPreferences(shared_queries=get_shared_queries())
+    key = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+    return registry.get(f"user_preferences:{key}", lambda: UserPreferences(
+        os.path.join(USER_PREFERENCES_DIR, f"{key}.json"),
+        shared_queries=get_shared_queries()
+    ))
+
+
+def get_query_corrector() -> QueryCorrector:
+    return registry.get("query_corrector", QueryCorrector)
+
+
+def get_result_exporter(db: Optional[Database] = None) -> ResultExporter:
+    """Exporter streaming from db (default: the PG* environment database)"""
+    if db is None:
+        return registry.get("result_exporter", lambda: ResultExporter(get_database()))
+    return ResultExporter(db)  # holds no state besides db
+
+
+def get_generation_pipeline() -> GenerationPipeline:
+    return registry.get("generation_pipeline", lambda: GenerationPipeline(
+        db=get_database(),
+        dialect_converter=get_dialect_converter(),
+        query_optimizer=get_query_optimizer(),
+        explain_validator=get_explain_validator()
+    ))
+
+
+def get_explain_validator() -> ExplainValidator:
+    return registry.get("explain_validator", lambda: ExplainValidator(schema_cache=get_schema_cache()))
+
+
+def get_cost_guard() -> CostGuard:
+    """Playground cost guard, configured by the COST_GUARD_* environment variables"""
+    return registry.get("cost_guard", CostGuard)
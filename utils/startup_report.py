@@ -0,0 +1,75 @@
+"""Import-time and rerun-time measurements for app.py
+
+Run `python -m utils.startup_report` to measure the cold import cost of each
+module app.py depends on (each in a fresh interpreter, via -X importtime).
+"""
+import re
+import sys
+import time
+import importlib
+import subprocess
+from typing import Dict, List
+
+# Modules app.py imports lazily or at startup, heaviest first
+APP_MODULES = [
+    "streamlit",
+    "pandas",
+    "plotly.graph_objects",
+    "networkx",
+    "psycopg2",
+    "sqlparse",
+    "requests",
+    "utils.schema_visualizer",
+    "utils.query_playground",
+    "utils.services",
+]
+
+# First-import durations (seconds) of modules loaded through timed_import
+IMPORT_TIMES: Dict[str, float] = {}
+
+
+def timed_import(module_name: str):
+    """Import a module on first use, recording how long the import took"""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_TIMES[module_name] = time.perf_counter() - start
+    return module
+
+
+def measure_cold_import(module_name: str) -> float:
+    """Cumulative import time of a module in a fresh interpreter, in seconds"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise Exception(f"Could not import {module_name}: {result.stderr.strip().splitlines()[-1]}")
+
+    # Lines look like: "import time:  self [us] | cumulative | imported package"
+    pattern = re.compile(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*" + re.escape(module_name) + r"\s*$")
+    for line in reversed(result.stderr.splitlines()):
+        match = pattern.match(line)
+        if match:
+            return int(match.group(1)) / 1e6
+    return 0.0
+
+
+def measure_cold_imports(modules: List[str] = None) -> Dict[str, float]:
+    """Cold import time of each module, skipping any that fail to import"""
+    timings = {}
+    for module_name in modules or APP_MODULES:
+        try:
+            timings[module_name] = measure_cold_import(module_name)
+        except Exception as e:
+            print(e, file=sys.stderr)
+    return timings
+
+
+if __name__ == "__main__":
+    timings = measure_cold_imports(sys.argv[1:] or None)
+    for module_name, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+        print(f"{seconds * 1000:9.1f} ms  {module_name}")
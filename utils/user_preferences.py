@@ -1,12 +1,37 @@
 """User preferences and settings management"""
+import os
 import json
-from typing import Dict, Any, Optional, List
+import threading
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
+from .query_fingerprint import fingerprint, normalize
+from .rotating_log import RotatingLog
+
+# Sessions may write the same preferences file
+_save_lock = threading.Lock()
+
 
 class UserPreferences:
-    def __init__(self, storage_file: str = "user_preferences.json"):
+    # Per-shape metrics kept at most; the least used shapes are dropped first
+    MAX_QUERY_SHAPES = 200
+
+    def __init__(self,
+                 storage_file: str = "user_preferences.json",
+                 shared_queries_file: Optional[str] = None,
+                 shared_queries: Optional[RotatingLog] = None):
         self.storage_file = storage_file
+        # A signed-in user's sessions share one instance, so writes are serialised
+        self._lock = threading.RLock()
         self.preferences = self.load_preferences()
+        # Shared queries grow without bound, so they live in their own rotating
+        # log; pass one in to share it between everyone's preferences
+        self.shared_queries = shared_queries or RotatingLog(
+            shared_queries_file or os.path.join(os.path.dirname(storage_file), "shared_queries.jsonl")
+        )
+        if self.preferences.get("shared_queries"):
+            with self._lock:
+                self.shared_queries.extend(self.preferences.pop("shared_queries"))
+                self.save_preferences()
 
     def load_preferences(self) -> Dict[str, Any]:
         """Load user preferences from file"""
@@ -22,7 +47,6 @@ class UserPreferences:
                 "auto_complete": True,
                 "connection_profiles": [],
                 "recent_connections": [],
-                "shared_queries": [],
                 "performance_metrics": {
                     "total_queries": 0,
                     "successful_queries": 0,
@@ -33,13 +57,18 @@ class UserPreferences:
 
     def save_preferences(self) -> None:
         """Save current preferences to file"""
-        with open(self.storage_file, 'w') as f:
-            json.dump(self.preferences, f, indent=2)
+        with self._lock, _save_lock:
+            directory = os.path.dirname(self.storage_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.storage_file, 'w') as f:
+                json.dump(self.preferences, f, indent=2)
 
     def update_preference(self, key: str, value: Any) -> None:
         """Update a single preference"""
-        self.preferences[key] = value
-        self.save_preferences()
+        with self._lock:
+            self.preferences[key] = value
+            self.save_preferences()
 
     def get_preference(self, key: str, default: Any = None) -> Any:
         """Get a preference value"""
@@ -47,10 +76,11 @@ class UserPreferences:
 
     def add_connection_profile(self, profile: Dict[str, str]) -> None:
         """Add a new database connection profile"""
-        if "connection_profiles" not in self.preferences:
-            self.preferences["connection_profiles"] = []
-        self.preferences["connection_profiles"].append(profile)
-        self.save_preferences()
+        with self._lock:
+            if "connection_profiles" not in self.preferences:
+                self.preferences["connection_profiles"] = []
+            self.preferences["connection_profiles"].append(profile)
+            self.save_preferences()
 
     def get_connection_profiles(self) -> List[Dict[str, str]]:
         """Get all saved connection profiles"""
@@ -58,36 +88,75 @@ class UserPreferences:
 
     def add_shared_query(self, query: Dict[str, Any]) -> None:
         """Add a shared query with annotations"""
-        if "shared_queries" not in self.preferences:
-            self.preferences["shared_queries"] = []
-        self.preferences["shared_queries"].append({
+        self.shared_queries.append({
             **query,
             "shared_at": datetime.now().isoformat()
         })
-        self.save_preferences()
-
-    def get_shared_queries(self) -> List[Dict[str, Any]]:
-        """Get all shared queries"""
-        return self.preferences.get("shared_queries", [])
-
-    def update_performance_metrics(self, execution_time: float, success: bool) -> None:
-        """Update query performance metrics"""
-        metrics = self.preferences.get("performance_metrics", {
-            "total_queries": 0,
-            "successful_queries": 0,
-            "average_execution_time": 0.0,
-            "last_updated": datetime.now().isoformat()
-        })
 
-        metrics["total_queries"] += 1
-        if success:
-            metrics["successful_queries"] += 1
+    def get_shared_queries(self, page: int = 1, page_size: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """One page of shared queries, newest first, and the total number shared"""
+        return self.shared_queries.read_page(page, page_size)
+
+    def update_performance_metrics(self,
+                                   execution_time: float,
+                                   success: bool,
+                                   query: Optional[str] = None) -> None:
+        """Update query performance metrics, per query shape too when the query is given"""
+        with self._lock:
+            metrics = self.preferences.get("performance_metrics", {
+                "total_queries": 0,
+                "successful_queries": 0,
+                "average_execution_time": 0.0,
+                "last_updated": datetime.now().isoformat()
+            })
 
-        # Update running average
-        prev_avg = metrics["average_execution_time"]
-        total = metrics["total_queries"]
-        metrics["average_execution_time"] = (prev_avg * (total - 1) + execution_time) / total
-        metrics["last_updated"] = datetime.now().isoformat()
+            metrics["total_queries"] += 1
+            if success:
+                metrics["successful_queries"] += 1
+
+            # Update running average
+            prev_avg = metrics["average_execution_time"]
+            total = metrics["total_queries"]
+            metrics["average_execution_time"] = (prev_avg * (total - 1) + execution_time) / total
+            metrics["last_updated"] = datetime.now().isoformat()
+            if query:
+                self._update_shape_metrics(metrics, query, execution_time, success)
+
+            self.preferences["performance_metrics"] = metrics
+            self.save_preferences()
+
+    def _update_shape_metrics(self,
+                              metrics: Dict[str, Any],
+                              query: str,
+                              execution_time: float,
+                              success: bool) -> None:
+        shapes = metrics.setdefault("query_shapes", {})
+        key = fingerprint(query)
+        if key not in shapes:
+            # Make room before inserting, so the incoming shape is never the one dropped
+            while len(shapes) >= self.MAX_QUERY_SHAPES:
+                least_used = min(shapes, key=lambda other: (shapes[other]["count"], shapes[other]["last_seen"]))
+                del shapes[least_used]
+        shape = shapes.setdefault(key, {
+            "query": normalize(query),
+            "count": 0,
+            "errors": 0,
+            "total_time": 0.0,
+            "max_time": 0.0
+        })
+        shape["count"] += 1
+        if not success:
+            shape["errors"] += 1
+        shape["total_time"] += execution_time
+        shape["max_time"] = max(shape["max_time"], execution_time)
+        shape["last_seen"] = datetime.now().isoformat()
 
-        self.preferences["performance_metrics"] = metrics
-        self.save_preferences()
\ No newline at end of file
+    def get_query_shape_metrics(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Query shapes with the most total execution time first"""
+        shapes = self.preferences.get("performance_metrics", {}).get("query_shapes", {})
+        rows = [{
+            "fingerprint": key,
+            **shape,
+            "avg_time": shape["total_time"] / shape["count"] if shape["count"] else 0.0
+        } for key, shape in list(shapes.items())]
+        return sorted(rows, key=lambda row: row["total_time"], reverse=True)[:limit]
\ No newline at end of file